@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import gc
+import glob
+import json
+import os
+import pathlib
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Make src and this directory importable without PYTHONPATH
+HERE = pathlib.Path(__file__).resolve().parent
+ROOT = HERE.parent
+for _p in (ROOT / "src", HERE):
+    if str(_p) not in sys.path:
+        sys.path.insert(0, str(_p))
+
+# Benchmarks for the fxbot hot paths.
+#   run:     time each stage on synthetic (10k..10M bars) and shipped data/*.csv,
+#            one subprocess per (dataset, stage) so peak RSS is per stage.
+#   compare: diff two result files and exit 1 on regressions beyond a threshold.
+#   imports: CLI startup time against a budget (fresh interpreters, -X importtime).
+
+DEFAULT_STAGES = ("load", "signals", "backtest", "metrics", "blackout", "grid_search", "walkforward")
+# fxbot.lite (no pandas) counterparts; opt-in. Setup checks their results against the pandas path.
+LITE_STAGES = ("lite_load", "lite_backtest", "lite_grid_search", "lite_report_export")
+STAGES = DEFAULT_STAGES + LITE_STAGES
+# Small fixed grid: 4 combos per grid_search, 6 folds per walk-forward
+GRID = {"ema_fast_list": [10, 20], "ema_slow_list": [50], "atr_window_list": [14], "atr_k_list": [1.5, 2.0],
+        "vol_filter_min_atr_pct_list": [0.0]}
+COSTS = {"start_cash": 1_000_000.0, "slippage_pct": 0.0001, "fee_perc_roundturn": 0.0002,
+         "per_trade_risk_pct": 0.25, "daily_loss_stop_pct": 1.0}
+NUM_EVENTS = 250  # roughly one year of high-impact releases
+
+
+# -------- Memory helpers --------
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak-RSS mark (Linux >= 4.0), so VmHWM covers only what follows."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> Optional[float]:
+    # VmHWM honours _reset_peak_rss(); ru_maxrss does not (and survives exec from the parent)
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return _peak_rss_mb()
+
+
+# -------- Stages (setup is untimed; the returned callable is timed) --------
+
+def _setup(stage: str, csv_path: str) -> Tuple[Callable[[], Any], int]:
+    if stage in LITE_STAGES:
+        return _setup_lite(stage, csv_path)
+    from fxbot.data.csv_loader import load_ohlcv_csv
+
+    if stage == "load":
+        with open(csv_path, "rb") as f:
+            n = sum(1 for _ in f) - 1
+        return (lambda: load_ohlcv_csv(csv_path)), n
+
+    from fxbot.strategies.momo_atr import generate_signals
+    from fxbot.backtest import run_backtest
+
+    df = load_ohlcv_csv(csv_path)
+    n = len(df)
+    sig_kw = {"ema_fast": 10, "ema_slow": 50, "atr_window": 14, "vol_filter_min_atr_pct": 0.0}
+    if stage == "signals":
+        return (lambda: generate_signals(df, **sig_kw)), n
+    if stage == "blackout":
+        from fxbot.events import build_blackout_mask
+
+        step = max(1, n // NUM_EVENTS)
+        events = list(df.index[::step][:NUM_EVENTS])
+        return (lambda: build_blackout_mask(df.index, events, before_min=30, after_min=30)), n
+    if stage == "grid_search":
+        from fxbot.optimize import grid_search
+
+        return (lambda: grid_search(df, **GRID, **COSTS, top_n=10)), n
+    if stage == "walkforward":
+        from fxbot.walkforward import walk_forward
+
+        return (lambda: walk_forward(df, train_bars=n // 4, test_bars=n // 8, step_bars=None, **GRID, **COSTS,
+                                     periods_per_year=24 * 252)), n
+
+    sig = generate_signals(df, **sig_kw)
+    if stage == "backtest":
+        return (lambda: run_backtest(sig, atr_k_stop=1.5, **COSTS)), len(sig)
+    if stage == "metrics":
+        from fxbot.report import metrics_from_pnl
+
+        res = run_backtest(sig, atr_k_stop=1.5, **COSTS)
+        return (lambda: metrics_from_pnl(res["pnl_series"], COSTS["start_cash"], res["end_cash"])), len(sig)
+    raise ValueError(f"unknown stage: {stage}")
+
+
+def _setup_lite(stage: str, csv_path: str) -> Tuple[Callable[[], Any], int]:
+    from fxbot import lite
+
+    bars = lite.read_ohlcv_csv(csv_path)
+    n = len(bars)
+    if stage == "lite_load":
+        return (lambda: lite.read_ohlcv_csv(csv_path)), n
+    import pandas as pd
+    from fxbot.backtest import run_backtest
+    from fxbot.strategies.momo_atr import generate_signals
+
+    sig_kw = {"ema_fast": 10, "ema_slow": 50, "atr_window": 14, "vol_filter_min_atr_pct": 0.0}
+    # Same parsed values on both sides: pandas' C float parser may round 17-digit prices differently
+    df = pd.DataFrame({c: list(getattr(bars, c)) for c in ("open", "high", "low", "close", "volume")},
+                      index=pd.to_datetime(list(bars.t), utc=True))
+    if stage == "lite_backtest":
+        def fn() -> Any:
+            return lite.run_backtest(lite.generate_signals(bars, **sig_kw), atr_k_stop=1.5, **COSTS)
+
+        ref = run_backtest(generate_signals(df, **sig_kw), atr_k_stop=1.5, **COSTS)
+        if fn()["pnl_series"] != ref["pnl_series"].tolist():
+            raise ValueError("lite backtest differs from the pandas path")
+        return fn, n
+    if stage == "lite_grid_search":
+        return (lambda: lite.grid_search(bars, **GRID, **COSTS, top_n=10)), n
+    if stage == "lite_report_export":
+        # CLI `report-export` writes JSON reports with the lite exporter; its CSVs must stay
+        # byte-identical to fxbot.report's (e.g. when trades_frame columns change)
+        import atexit
+        import shutil
+        import tempfile
+
+        from fxbot.report import export_report_to_csvs, save_report
+
+        tmp = pathlib.Path(tempfile.mkdtemp(prefix="fxbot_bench_"))
+        atexit.register(shutil.rmtree, tmp, True)
+        src = tmp / "report.json"
+        save_report(str(src), run_backtest(generate_signals(df, **sig_kw), atr_k_stop=1.5, **COSTS))
+        ref = export_report_to_csvs(str(src), str(tmp / "pandas"))
+        got = lite.export_report_to_csvs(src, tmp / "lite")
+        if sorted(ref) != sorted(got):
+            raise ValueError(f"lite report export writes {sorted(got)}, fxbot.report {sorted(ref)}")
+        for name in ref:
+            if pathlib.Path(ref[name]).read_bytes() != pathlib.Path(got[name]).read_bytes():
+                raise ValueError(f"lite report export: {name}.csv differs from fxbot.report")
+        return (lambda: lite.export_report_to_csvs(src, tmp / "lite")), n
+    raise ValueError(f"unknown stage: {stage}")
+
+
+def run_stage(stage: str, csv_path: str, repeat: int) -> Dict[str, Any]:
+    fn, bars = _setup(stage, csv_path)
+    gc.collect()
+    _reset_peak_rss()
+    rss_before = _current_rss_mb()
+    times: List[float] = []
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    peak = _peak_rss_mb()
+    best = min(times)
+    return {
+        "stage": stage,
+        "bars": bars,
+        "repeat": len(times),
+        "wall_s": best,
+        "wall_mean_s": sum(times) / len(times),
+        "bars_per_s": bars / best if best > 0 else None,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak,
+        "peak_rss_delta_mb": (peak - rss_before) if peak is not None and rss_before is not None else None,
+    }
+
+
+def _run_stage_subprocess(stage: str, csv_path: str, repeat: int, timeout: Optional[float]) -> Dict[str, Any]:
+    cmd = [sys.executable, str(pathlib.Path(__file__).resolve()), "_stage", "--stage", stage, "--csv", csv_path,
+           "--repeat", str(repeat)]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"stage": stage, "error": f"timeout after {timeout}s"}
+    if proc.returncode != 0:
+        tail = (proc.stderr or "").strip().splitlines()[-1:] or ["failed"]
+        return {"stage": stage, "error": tail[0]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# -------- Metadata --------
+
+def _cpu_model() -> Optional[str]:
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or None
+
+
+def _total_mem_mb() -> Optional[float]:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (ValueError, AttributeError, OSError):
+        return None
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def machine_info() -> Dict[str, Any]:
+    import numpy as np
+    import pandas as pd
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_model": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "total_mem_mb": _total_mem_mb(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+# -------- Import-time budget --------
+
+# CLI startup: wall time of a few light invocations (best of N fresh interpreters),
+# plus modules that `import fxbot.cli` must not load eagerly.
+IMPORT_COMMANDS = {
+    "help": ["-m", "fxbot", "--help"],
+    "report_export_help": ["-m", "fxbot", "report-export", "--help"],
+    "import_cli": ["-c", "import fxbot.cli"],
+    "python": ["-c", "pass"],  # interpreter baseline
+}
+HEAVY_MODULES = ("pandas", "numpy", "yaml", "fxbot.backtest", "fxbot.report", "fxbot.optimize", "fxbot.walkforward")
+
+
+def _src_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT / "src"), env.get("PYTHONPATH")]))
+    return env
+
+
+def _best_wall_ms(argv: List[str], repeat: int) -> float:
+    env = _src_env()
+    times: List[float] = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, *argv], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000
+
+
+def import_times(code: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every import under `python -X importtime -c code`, by self time."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=_src_env(), capture_output=True,
+                          text=True, check=True)
+    out: List[Tuple[str, int, int]] = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            out.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+        except (IndexError, ValueError):
+            continue  # header line
+    return sorted(out, key=lambda r: r[1], reverse=True)
+
+
+def cmd_imports(args: argparse.Namespace) -> int:
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, fxbot.cli; print(' '.join(sys.modules))"],
+        env=_src_env(), capture_output=True, text=True, check=True,
+    ).stdout.split()
+    eager = sorted(m for m in HEAVY_MODULES if m in loaded)
+    walls = {name: _best_wall_ms(argv, args.repeat) for name, argv in IMPORT_COMMANDS.items()}
+    top = import_times("import fxbot.cli")[: args.top]
+    for name, ms in walls.items():
+        print(f"{name:<20} {ms:>8.1f} ms")
+    print("slowest imports under `import fxbot.cli` (self / cumulative):")
+    for mod, self_us, cum_us in top:
+        print(f"  {mod:<30} {self_us / 1000:>8.1f} {cum_us / 1000:>8.1f} ms")
+    ok = walls["help"] <= args.budget_ms and not eager
+    if eager:
+        print(f"`import fxbot.cli` loads heavy modules eagerly: {', '.join(eager)}")
+    if walls["help"] > args.budget_ms:
+        print(f"`fxbot --help` took {walls['help']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if args.out:
+        out = pathlib.Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "machine": machine_info(), "budget_ms": args.budget_ms, "wall_ms": walls,
+                       "eager_heavy_modules": eager, "top_imports_us": [{"module": m, "self": a, "cumulative": b} for m, a, b in top]}, f, ensure_ascii=False, indent=2)
+        print(f"Saved import timings to: {out}")
+    print("Within budget." if ok else "Import-time budget exceeded.")
+    return 0 if ok else 1
+
+
+# -------- run / compare --------
+
+def _datasets(args: argparse.Namespace) -> List[Tuple[str, str]]:
+    from synthetic import ensure_dataset, parse_size
+
+    out: List[Tuple[str, str]] = []
+    for s in [x for x in args.sizes.split(",") if x.strip()]:
+        n = parse_size(s)
+        print(f"[bench] preparing synthetic {s} ({n} bars)", file=sys.stderr)
+        out.append((f"synth_{s.strip().lower()}", str(ensure_dataset(n, args.cache_dir, seed=args.seed))))
+    if not args.no_shipped:
+        for p in sorted(glob.glob(args.data_glob)):
+            out.append((pathlib.Path(p).stem, p))
+    return out
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"unknown stages: {unknown} (choose from {', '.join(STAGES)})", file=sys.stderr)
+        return 2
+    results: List[Dict[str, Any]] = []
+    for name, path in _datasets(args):
+        for stage in stages:
+            if args.in_process:
+                try:
+                    r = run_stage(stage, path, args.repeat)
+                except Exception as e:  # keep going; record the failure
+                    r = {"stage": stage, "error": str(e)}
+            else:
+                r = _run_stage_subprocess(stage, path, args.repeat, args.timeout)
+            r = {"dataset": name, "path": path, **r}
+            results.append(r)
+            if "error" in r:
+                print(f"{name:<20} {stage:<18} ERROR {r['error']}", file=sys.stderr)
+            else:
+                rss = r.get("peak_rss_mb")
+                print(f"{name:<20} {stage:<18} {r['wall_s']:>9.4f}s {r['bars_per_s'] or 0:>14,.0f} bars/s "
+                      f"peak {rss if rss is not None else float('nan'):>8.1f} MB", file=sys.stderr)
+    out = pathlib.Path(args.out) if args.out else ROOT / "out" / "bench" / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    doc = {"version": 1, "machine": machine_info(), "config": {"repeat": args.repeat, "seed": args.seed, "stages": stages,
+                                                               "isolated": not args.in_process}, "results": results}
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    print(f"Saved benchmark results to: {out}")
+    # Failed stages include the lite_* checks against the pandas path
+    return 1 if any("error" in r for r in results) else 0
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], *, threshold: float, rss_threshold: float,
+            min_time: float) -> Tuple[List[Dict[str, Any]], bool]:
+    """Match (dataset, stage) rows; a row regresses when new/base - 1 exceeds the threshold."""
+    idx = {(r["dataset"], r["stage"]): r for r in base.get("results", []) if "error" not in r}
+    rows: List[Dict[str, Any]] = []
+    regressed = False
+    for r in new.get("results", []):
+        b = idx.get((r["dataset"], r["stage"]))
+        if b is None or "error" in r:
+            continue
+        ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] > 0 else float("inf")
+        status = "ok"
+        if max(b["wall_s"], r["wall_s"]) < min_time:
+            status = "noise"
+        elif ratio - 1.0 > threshold:
+            status = "REGRESSION"
+        elif 1.0 - ratio > threshold:
+            status = "improved"
+        rss_ratio = None
+        if b.get("peak_rss_mb") and r.get("peak_rss_mb"):
+            rss_ratio = r["peak_rss_mb"] / b["peak_rss_mb"]
+            if rss_ratio - 1.0 > rss_threshold and status != "REGRESSION":
+                status = "RSS REGRESSION"
+        regressed = regressed or status in ("REGRESSION", "RSS REGRESSION")
+        rows.append({"dataset": r["dataset"], "stage": r["stage"], "base_s": b["wall_s"], "new_s": r["wall_s"],
+                     "ratio": ratio, "rss_ratio": rss_ratio, "status": status})
+    return rows, regressed
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    mb, mn = base.get("machine", {}), new.get("machine", {})
+    for k in ("cpu_model", "python", "numpy", "pandas"):
+        if mb.get(k) != mn.get(k):
+            print(f"warning: {k} differs ({mb.get(k)} -> {mn.get(k)}); timings may not be comparable", file=sys.stderr)
+    rows, regressed = compare(base, new, threshold=args.threshold, rss_threshold=args.rss_threshold, min_time=args.min_time)
+    print(f"{'dataset':<20} {'stage':<18} {'base_s':>10} {'new_s':>10} {'ratio':>7} {'rss':>6}  status")
+    for r in rows:
+        rss = f"{r['rss_ratio']:.2f}" if r["rss_ratio"] is not None else "-"
+        print(f"{r['dataset']:<20} {r['stage']:<18} {r['base_s']:>10.4f} {r['new_s']:>10.4f} {r['ratio']:>7.2f} {rss:>6}  {r['status']}")
+    if regressed:
+        print(f"Regressions beyond {args.threshold:.0%} (time) / {args.rss_threshold:.0%} (RSS) detected.")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="bench", description="fxbot hot-path benchmarks")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run", help="Run the benchmark suite and write a JSON result file")
+    r.add_argument("--sizes", default="10k,100k", help="Synthetic sizes, e.g. 10k,100k,1m,10m ('' to skip)")
+    r.add_argument("--stages", default=",".join(DEFAULT_STAGES), help=f"Comma list of: {', '.join(STAGES)}")
+    r.add_argument("--data-glob", default=str(ROOT / "data" / "*.csv"), help="Shipped CSVs to include")
+    r.add_argument("--no-shipped", action="store_true", help="Only synthetic datasets")
+    r.add_argument("--repeat", type=int, default=5, help="Timed repetitions per stage (best is reported)")
+    r.add_argument("--seed", type=int, default=42)
+    r.add_argument("--cache-dir", default=str(ROOT / "out" / "bench_data"), help="Where synthetic CSVs are cached")
+    r.add_argument("--in-process", action="store_true", help="Run stages in this process (faster; RSS not per stage)")
+    r.add_argument("--timeout", type=float, default=None, help="Seconds per stage subprocess")
+    r.add_argument("--out", default=None, help="Result JSON (default: out/bench/bench_<time>.json)")
+    r.set_defaults(func=cmd_run)
+
+    c = sub.add_parser("compare", help="Compare two result files; exit 1 on regression")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = +10%%)")
+    c.add_argument("--rss-threshold", type=float, default=0.20, help="Allowed peak RSS growth")
+    # Stages of tens of ms swing 1.5x+ between identical runs (scheduler, caches)
+    c.add_argument("--min-time", type=float, default=0.05, help="Ignore stages faster than this (seconds)")
+    c.set_defaults(func=cmd_compare)
+
+    im = sub.add_parser("imports", help="CLI startup / import-time budget; exit 1 when exceeded")
+    im.add_argument("--budget-ms", type=float, default=100.0, help="Budget for `python -m fxbot --help` (best of --repeat)")
+    im.add_argument("--repeat", type=int, default=10)
+    im.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    im.add_argument("--out", default=None, help="Optional result JSON")
+    im.set_defaults(func=cmd_imports)
+
+    w = sub.add_parser("_stage", help=argparse.SUPPRESS)
+    w.add_argument("--stage", required=True, choices=STAGES)
+    w.add_argument("--csv", required=True)
+    w.add_argument("--repeat", type=int, default=3)
+    w.set_defaults(func=lambda a: print(json.dumps(run_stage(a.stage, a.csv, a.repeat))) or 0)
+    return p
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import pathlib
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+# Deterministic synthetic OHLCV for benchmarks.
+# Geometric random walk on 1-minute bars (10M bars ~ 19 years) with a slowly
+# varying volatility regime, so the momentum strategy actually trades and the
+# ATR/vol-filter paths are exercised. Same (n, seed) -> identical data.
+
+SIZES: Dict[str, int] = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower()
+    if s in SIZES:
+        return SIZES[s]
+    mult = 1
+    if s.endswith("k"):
+        mult, s = 1_000, s[:-1]
+    elif s.endswith("m"):
+        mult, s = 1_000_000, s[:-1]
+    return int(float(s) * mult)
+
+
+def synthetic_ohlcv(n: int, *, seed: int = 42, start: str = "2005-01-03", freq: str = "1min", price0: float = 110.0) -> pd.DataFrame:
+    """OHLCV frame shaped like load_ohlcv_csv output (UTC 'timestamp' index)."""
+    rng = np.random.default_rng(seed)
+    # Volatility regime: slow sine + noise, per-bar sigma ~ 2-8 bp
+    t = np.arange(n, dtype=float)
+    sigma = 0.0005 * (1.0 + 0.6 * np.sin(2 * np.pi * t / 20_000.0)) + 0.0001 * rng.random(n)
+    drift = 0.00002 * np.sin(2 * np.pi * t / 50_000.0)
+    close = price0 * np.exp(np.cumsum(drift + sigma * rng.standard_normal(n)))
+    open_ = np.empty(n)
+    open_[0] = price0
+    open_[1:] = close[:-1]
+    span = np.abs(rng.standard_normal((2, n))) * sigma * close
+    high = np.maximum(open_, close) + span[0]
+    low = np.minimum(open_, close) - span[1]
+    volume = rng.integers(50, 5_000, n).astype(float)
+    idx = pd.date_range(start=start, periods=n, freq=freq, tz="UTC", name="timestamp")
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close, "volume": volume}, index=idx)
+
+
+def ensure_dataset(n: int, cache_dir: str | pathlib.Path, *, seed: int = 42) -> pathlib.Path:
+    """Write synth_<n>_s<seed>.csv into cache_dir once and return its path."""
+    base = pathlib.Path(cache_dir)
+    base.mkdir(parents=True, exist_ok=True)
+    path = base / f"synth_{n}_s{seed}.csv"
+    if not path.exists():
+        tmp = path.with_suffix(".csv.tmp")
+        df = synthetic_ohlcv(n, seed=seed)
+        # Chunked write keeps peak memory moderate for the 10M-bar set
+        step = 1_000_000
+        for i in range(0, n, step):
+            part = df.iloc[i : i + step]
+            part.to_csv(tmp, mode="w" if i == 0 else "a", header=(i == 0), date_format="%Y-%m-%dT%H:%M:%SZ")
+        tmp.replace(path)
+    return path
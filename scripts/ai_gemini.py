@@ -6,36 +6,337 @@ Gemini adapter for the Web UI AI bridge.
 Usage (Windows PowerShell):
 - pip install google-generativeai
 - $env:GEMINI_API_KEY = "..."
-- In Web UI AI field: scripts.ai_gemini:gemini_score
+- In Web UI AI field: scripts.ai_gemini:gemini_score        (latest bar only)
+                      scripts.ai_gemini:gemini_batch_score  (history, for backtests)
 
 Notes:
 - This is best used as a coarse advisor or daily risk flag, not per-tick.
 - If library or API key is missing, falls back to a simple momentum score.
+- Every prompt/response pair is stored in an on-disk cache (FXBOT_LLM_CACHE,
+  default out/llm_cache.sqlite), so repeating a run sends no requests.
+- FXBOT_LLM_ENDPOINT=http://127.0.0.1:8765/generate sends prompts to an HTTP
+  endpoint instead ({"model", "prompt"} -> {"text"}); `python scripts/ai_gemini.py
+  stub-server` runs a deterministic local stub for tests (no key, no cost).
 """
 
+import argparse
+import hashlib
+import json
 import os
-from typing import Iterable
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
 import pandas as pd
 
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE = ROOT / "out" / "llm_cache.sqlite"
+PROMPT_HEADER = (
+    "You are a quantitative assistant. Given recent OHLC data, estimate the probability "
+    "that the next-bar close will be higher than the last close. Respond ONLY with a JSON object, "
+    "like {\"prob_up\": 0.63}.\n\n"
+)
+
+
+def _online_allowed() -> bool:
+    return os.environ.get("FXBOT_ALLOW_ONLINE", "0") in ("1", "true", "TRUE", "True")
+
 
 def _fallback_score(df: pd.DataFrame) -> pd.Series:
-    close = pd.to_numeric(df["close"], errors="coerce")
-    fast = close.rolling(10, min_periods=1).mean()
-    slow = close.rolling(30, min_periods=1).mean()
+    from fxbot.features import open_features
+
+    fs = open_features(df)  # rolling means/std shared with other users of this frame
+    fast = fs.series("sma_10")
+    slow = fs.series("sma_30")
     raw = (fast - slow)
-    vol = (close.rolling(30, min_periods=1).std() + 1e-9)
+    vol = (fs.series("std_30") + 1e-9)
     z = (raw / vol).clip(-3, 3)
     score = (z - z.min()) / (z.max() - z.min() + 1e-9)
     return score.fillna(0.5)
 
 
+def _prompt_lines(df: pd.DataFrame) -> List[str]:
+    """One 'ts,o,h,l,c' line per row, formatted once for all windows."""
+    cols = [np.char.mod("%.5f", pd.to_numeric(df[c], errors="coerce").to_numpy(dtype="float64"))
+            for c in ("open", "high", "low", "close")]
+    ts = [t.isoformat() for t in df.index]
+    return [",".join(parts) for parts in zip(ts, *cols)]
+
+
+def _window_prompt(lines: List[str], end: int, tail: int) -> str:
+    """Prompt for the window of up to `tail` rows ending at row `end` (inclusive)."""
+    body = "\n".join(["timestamp,open,high,low,close", *lines[max(0, end + 1 - tail): end + 1]])
+    return PROMPT_HEADER + body
+
+
 def _format_series_for_prompt(df: pd.DataFrame, tail: int = 128) -> str:
-    s = df.tail(tail)
     # Compact CSV lines: ts, o, h, l, c
-    lines: list[str] = ["timestamp,open,high,low,close"]
-    for ts, row in s.iterrows():
-        lines.append(f"{ts.isoformat()},{row['open']:.5f},{row['high']:.5f},{row['low']:.5f},{row['close']:.5f}")
-    return "\n".join(lines)
+    s = df.tail(tail)
+    return "\n".join(["timestamp,open,high,low,close", *_prompt_lines(s)])
+
+
+def _parse_prob(text: str) -> Optional[float]:
+    """prob_up from a reply (tolerates code fences / surrounding prose); None when absent or out of range."""
+    m = re.search(r'"prob_up"\s*:\s*(-?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)', text or "")
+    if not m:
+        return None
+    p = float(m.group(1))
+    return p if 0.0 <= p <= 1.0 else None
+
+
+# -------- backends: prompt -> reply text --------
+
+def gemini_backend(model: str) -> Optional[Callable[[str], str]]:
+    """google-generativeai backend, or None when online use is not allowed/possible."""
+    if not _online_allowed() or not os.environ.get("GEMINI_API_KEY"):
+        return None
+    try:
+        import google.generativeai as genai  # type: ignore
+    except Exception:
+        return None
+    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    model_obj = genai.GenerativeModel(model)
+
+    def call(prompt: str) -> str:
+        return (model_obj.generate_content(prompt).text or "").strip()
+
+    return call
+
+
+def http_backend(url: str, model: str, timeout: float = 60.0) -> Callable[[str], str]:
+    """POST {"model", "prompt"} to url, expect {"text": ...} (local stub or a proxy)."""
+
+    def call(prompt: str) -> str:
+        req = urllib.request.Request(url, data=json.dumps({"model": model, "prompt": prompt}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return str(json.loads(resp.read().decode("utf-8")).get("text", ""))
+
+    return call
+
+
+def _is_loopback(url: str) -> bool:
+    return (urllib.parse.urlparse(url).hostname or "") in ("127.0.0.1", "localhost", "::1")
+
+
+def default_backend(model: str) -> Optional[Callable[[str], str]]:
+    url = os.environ.get("FXBOT_LLM_ENDPOINT")
+    if url:
+        # Remote endpoints fall under the same cost guard as the Gemini API
+        return http_backend(url, model) if (_is_loopback(url) or _online_allowed()) else None
+    return gemini_backend(model)
+
+
+# -------- prompt -> response cache and client --------
+
+class PromptCache:
+    """SQLite prompt-hash -> reply table (safe to share between threads and processes)."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS replies (key TEXT PRIMARY KEY, model TEXT, reply TEXT, created_at REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        c = self._conn()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i: i + 500]
+            q = f"SELECT key, reply FROM replies WHERE key IN ({','.join('?' * len(chunk))})"
+            out.update(dict(c.execute(q, chunk).fetchall()))
+        return out
+
+    def put(self, key: str, model: str, reply: str) -> None:
+        with self._conn() as c:
+            c.execute("INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?)", (key, model, reply, time.time()))
+
+
+class _RateLimiter:
+    """At most `rps` request starts per second (shared by all worker threads)."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps and rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class PromptClient:
+    """
+    Bounded-concurrency, rate-limited prompt runner with retry/backoff.
+    Identical prompts in flight share one request; replies are written to the cache.
+    """
+
+    def __init__(self, backend: Callable[[str], str], *, model: str, cache: PromptCache | None,
+                 concurrency: int = 4, rps: float = 2.0, retries: int = 3, backoff_s: float = 1.0):
+        self.backend = backend
+        self.model = model
+        self.cache = cache
+        self.retries = max(0, int(retries))
+        self.backoff_s = float(backoff_s)
+        self._pool = ThreadPoolExecutor(max(1, int(concurrency)), thread_name_prefix="llm")
+        self._limiter = _RateLimiter(rps)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "cached": 0, "coalesced": 0, "retries": 0, "failed": 0}
+
+    def key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def map(self, prompts: List[str]) -> List[Optional[str]]:
+        """Replies in order (None for prompts that failed after all retries)."""
+        keys = [self.key(p) for p in prompts]
+        cached = self.cache.get_many(sorted(set(keys))) if self.cache is not None else {}
+        futs: Dict[str, Future] = {}
+        for k, p in zip(keys, prompts):
+            if k in cached:
+                self._count("cached")
+            elif k in futs:
+                self._count("coalesced")
+            else:
+                futs[k] = self.submit(p, k)
+        out: List[Optional[str]] = []
+        for k in keys:
+            if k in cached:
+                out.append(cached[k])
+                continue
+            try:
+                out.append(futs[k].result())
+            except Exception:
+                out.append(None)
+        return out
+
+    def submit(self, prompt: str, key: str | None = None) -> Future:
+        key = key or self.key(prompt)
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats["coalesced"] += 1
+                return fut
+            fut = self._pool.submit(self._fetch, key, prompt)
+            self._inflight[key] = fut
+        fut.add_done_callback(lambda _f, key=key: self._done(key))
+        return fut
+
+    def _count(self, name: str) -> None:
+        # Called from the pool's worker threads as well
+        with self._lock:
+            self.stats[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def _done(self, key: str) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _fetch(self, key: str, prompt: str) -> str:
+        for attempt in range(self.retries + 1):
+            self._limiter.wait()
+            self._count("requests")
+            try:
+                reply = self.backend(prompt)
+            except Exception:
+                if attempt == self.retries:
+                    self._count("failed")
+                    raise
+                self._count("retries")
+                time.sleep(self.backoff_s * (2 ** attempt) * (1.0 + 0.25 * random.random()))
+                continue
+            if self.cache is not None:
+                self.cache.put(key, self.model, reply)
+            return reply
+        raise RuntimeError("unreachable")
+
+
+_CLIENTS: Dict[tuple, PromptClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _client(model: str, *, concurrency: int, rps: float, retries: int, cache_path: str | Path | None) -> Optional[PromptClient]:
+    """Process-wide client per configuration (so concurrent callers coalesce); None when offline."""
+    key = (model, os.environ.get("FXBOT_LLM_ENDPOINT"), _online_allowed(), bool(os.environ.get("GEMINI_API_KEY")),
+           int(concurrency), float(rps), int(retries), str(cache_path or os.environ.get("FXBOT_LLM_CACHE") or DEFAULT_CACHE))
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            backend = default_backend(model)
+            if backend is None:
+                return None
+            client = _CLIENTS[key] = PromptClient(backend, model=model, cache=PromptCache(key[-1]),
+                                                  concurrency=concurrency, rps=rps, retries=retries)
+        return client
+
+
+# -------- scorers (ai_bridge callables) --------
+
+def gemini_batch_score(
+    df: pd.DataFrame,
+    *,
+    model: str = "gemini-1.5-flash",
+    tail: int = 128,
+    every: int = 1,
+    max_windows: int | None = None,
+    concurrency: int = 4,
+    rps: float = 2.0,
+    retries: int = 3,
+    cache_path: str | Path | None = None,
+) -> pd.Series:
+    """
+    Per-row score Series (0..1) from one prompt per historical window: the window of
+    `tail` bars ending at every `every`-th bar (only the last `max_windows` when set).
+    A window's probability holds until the next scored bar; bars before the first
+    scored bar, failed requests and offline runs keep the fallback score.
+    Stats (requests, cached, coalesced, retries, failed) are in result.attrs["llm"].
+    """
+    base = _fallback_score(df)
+    client = _client(model, concurrency=concurrency, rps=rps, retries=retries, cache_path=cache_path)
+    if client is None or len(df) == 0:
+        return base
+    ends = list(range(len(df) - 1, -1, -max(1, int(every))))[::-1]
+    if max_windows is not None:
+        ends = ends[-max(0, int(max_windows)):]
+    lines = _prompt_lines(df)
+    before = client.snapshot()
+    replies = client.map([_window_prompt(lines, e, tail) for e in ends])
+    probs = np.full(len(df), np.nan)
+    probs[ends] = [p if p is not None else np.nan for p in (_parse_prob(r) if r is not None else None for r in replies)]
+    held = pd.Series(probs, index=df.index)
+    if int(every) > 1:
+        held = held.ffill()  # hold each window's probability until the next scored bar (no look-ahead)
+    s = held.fillna(base)
+    s.attrs["llm"] = {k: v - before.get(k, 0) for k, v in client.snapshot().items()}  # approximate under concurrent callers
+    return s
 
 
 def gemini_score(df: pd.DataFrame, *, model: str = "gemini-1.5-flash", tail: int = 128) -> pd.Series:
@@ -44,43 +345,96 @@ def gemini_score(df: pd.DataFrame, *, model: str = "gemini-1.5-flash", tail: int
     - Ask Gemini for a single probability for the latest bar given last N bars.
     - Fill previous bars with a rolling fallback score to keep the same index length.
     """
-    # Hard safety gate: require explicit allowance
-    if os.environ.get("FXBOT_ALLOW_ONLINE", "0") not in ("1", "true", "TRUE", "True"):
-        return _fallback_score(df)
+    return gemini_batch_score(df, model=model, tail=tail, max_windows=1)
 
-    try:
-        import google.generativeai as genai  # type: ignore
-    except Exception:
-        return _fallback_score(df)
 
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return _fallback_score(df)
+# Depends on FXBOT_ALLOW_ONLINE / GEMINI_API_KEY and the remote model: keep out of the
+# ai_bridge score cache (replies are cached per prompt here instead)
+gemini_score.cacheable = False  # type: ignore[attr-defined]
+gemini_batch_score.cacheable = False  # type: ignore[attr-defined]
+
+
+# -------- local stub server and CLI --------
+
+def stub_reply(prompt: str) -> str:
+    """Deterministic stand-in for the model: prob_up from the window's last close vs its mean."""
+    closes = []
+    for line in prompt.splitlines():
+        parts = line.split(",")
+        if len(parts) == 5 and parts[0][:1].isdigit():
+            closes.append(float(parts[4]))
+    if not closes:
+        return '{"prob_up": 0.5}'
+    mean = sum(closes) / len(closes)
+    z = (closes[-1] - mean) / (abs(mean) * 0.01 + 1e-12)
+    return json.dumps({"prob_up": round(1.0 / (1.0 + np.exp(-z)), 4)})
+
 
-    genai.configure(api_key=api_key)
-    prompt = (
-        "You are a quantitative assistant. Given recent OHLC data, estimate the probability "
-        "that the next-bar close will be higher than the last close. Respond ONLY with a JSON object, "
-        "like {\"prob_up\": 0.63}.\n\n" + _format_series_for_prompt(df, tail=tail)
-    )
+def serve_stub(port: int, *, delay_s: float = 0.0, fail_rate: float = 0.0) -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-    prob = 0.5
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if delay_s:
+                time.sleep(delay_s)
+            if fail_rate and random.random() < fail_rate:
+                self.send_error(503, "stub: simulated failure")
+                return
+            data = json.dumps({"text": stub_reply(str(body.get("prompt", "")))}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *_args) -> None:
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"[stub] http://127.0.0.1:{port}/generate", file=sys.stderr)
     try:
-        model_obj = genai.GenerativeModel(model)
-        resp = model_obj.generate_content(prompt)
-        text = (resp.text or "").strip()
-        # naive parse
-        import json
-        j = json.loads(text) if text.startswith("{") else {}
-        prob = float(j.get("prob_up", 0.5))
-        if not (0.0 <= prob <= 1.0):
-            prob = 0.5
-    except Exception:
-        prob = 0.5
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
 
-    base = _fallback_score(df)
-    # Blend towards Gemini prob at the last index
-    s = base.copy()
-    if len(s) > 0:
-        s.iloc[-1] = prob
-    return s
+
+def main(argv: Iterable[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Batch LLM scoring for the AI bridge")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sc = sub.add_parser("score", help="Score CSV history windows and write timestamp,score")
+    sc.add_argument("--csv", required=True)
+    sc.add_argument("--out", required=True)
+    sc.add_argument("--model", default="gemini-1.5-flash")
+    sc.add_argument("--tail", type=int, default=128)
+    sc.add_argument("--every", type=int, default=1, help="Score every N-th bar (hold the value in between)")
+    sc.add_argument("--max-windows", type=int, default=None)
+    sc.add_argument("--concurrency", type=int, default=4)
+    sc.add_argument("--rps", type=float, default=2.0, help="Max requests started per second")
+    sc.add_argument("--retries", type=int, default=3)
+    sc.add_argument("--cache", default=None, help="Prompt cache (default: $FXBOT_LLM_CACHE or out/llm_cache.sqlite)")
+    st = sub.add_parser("stub-server", help="Deterministic local stand-in for FXBOT_LLM_ENDPOINT")
+    st.add_argument("--port", type=int, default=8765)
+    st.add_argument("--delay-s", type=float, default=0.0)
+    st.add_argument("--fail-rate", type=float, default=0.0)
+    args = ap.parse_args(list(argv) if argv is not None else None)
+
+    if args.cmd == "stub-server":
+        serve_stub(args.port, delay_s=args.delay_s, fail_rate=args.fail_rate)
+        return
+    sys.path.insert(0, str(ROOT / "src"))
+    from fxbot.data.csv_loader import load_ohlcv_csv
+
+    df = load_ohlcv_csv(args.csv)
+    t0 = time.perf_counter()
+    s = gemini_batch_score(df, model=args.model, tail=args.tail, every=args.every, max_windows=args.max_windows,
+                           concurrency=args.concurrency, rps=args.rps, retries=args.retries, cache_path=args.cache)
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    s.rename("score").to_csv(out, index_label="timestamp")
+    stats = s.attrs.get("llm") or {"offline": True}
+    print(json.dumps({"out": str(out), "rows": len(s), "seconds": round(time.perf_counter() - t0, 2), **stats}))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,28 +5,28 @@ import argparse
 import csv
 import json
 import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 from urllib.request import urlopen
 
-# Reuse the offline engine (no external deps)
-import importlib.util
-from types import ModuleType
+# Standard library only: the engine is fxbot.lite (same results as the pandas CLI)
+ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
 
+from fxbot import lite  # noqa: E402
 
-def _load_offline() -> ModuleType:
-    here = Path(__file__).resolve().parent
-    target = here / "offline_backtest.py"
-    spec = importlib.util.spec_from_file_location("offline_backtest", str(target))
-    if spec is None or spec.loader is None:
-        raise RuntimeError("failed to load offline_backtest")
-    import sys
-    mod = importlib.util.module_from_spec(spec)
-    sys.modules[spec.name] = mod  # ensure dataclasses see proper module
-    spec.loader.exec_module(mod)  # type: ignore[attr-defined]
-    return mod
 
-
-ob = _load_offline()
+COSTS = {
+    "start_cash": 1_000_000,
+    "slippage_pct": 0.0001,
+    "fee_perc_roundturn": 0.0002,
+    "per_trade_risk_pct": 0.25,
+    "daily_loss_stop_pct": 1.0,
+}
 
 
 def fetch_stooq_daily(symbol: str, out_csv: Path) -> Path:
@@ -38,94 +38,56 @@ def fetch_stooq_daily(symbol: str, out_csv: Path) -> Path:
     return out_csv
 
 
-def _build_blackout_set(rows, events_path: str | None, before_min: int, after_min: int):
-    if not events_path:
-        return None
-    try:
-        from datetime import datetime, timezone
-        import csv as _csv
-        ev = []
-        with open(events_path, "r", encoding="utf-8") as f:
-            r = _csv.DictReader(f)
-            for row in r:
-                low = {k.lower(): v for k, v in row.items()}
-                ts = low.get("timestamp") or low.get("date")
-                if not ts:
-                    continue
-                ev.append(datetime.fromisoformat(ts.replace("Z", "")).replace(tzinfo=timezone.utc))
-        dis = set()
-        for rr in rows:
-            t = rr["timestamp"]
-            for e in ev:
-                dtm = (t - e).total_seconds() / 60.0
-                if -before_min <= dtm <= after_min:
-                    dis.add(t.isoformat())
-        return dis
-    except Exception:
-        return None
+def csv_path_for(symbol: str) -> Path:
+    return Path("data") / f"{symbol.upper()}_1d.csv"
 
 
 def run_one(symbol: str, *, objective: str, min_trades: int, out_dir: Path, start: str | None, end: str | None, events: str | None, blackout_before: int, blackout_after: int) -> dict:
-    csv_path = Path("data") / f"{symbol.upper()}_1d.csv"
+    csv_path = csv_path_for(symbol)
     fetch_stooq_daily(symbol, csv_path)
-    rows = ob.parse_csv(str(csv_path))
-    rows = ob.filter_rows(rows, start, end)
+    return optimize_one(symbol, csv_path, objective=objective, min_trades=min_trades, out_dir=out_dir, start=start,
+                        end=end, events=events, blackout_before=blackout_before, blackout_after=blackout_after)
+
+
+def optimize_one(symbol: str, csv_path: Path, *, objective: str, min_trades: int, out_dir: Path, start: str | None, end: str | None, events: str | None, blackout_before: int, blackout_after: int) -> dict:
+    """Grid search + best-params rerun on an already fetched CSV (CPU only; runs in worker processes)."""
+    bars = lite.read_ohlcv_csv(csv_path).between(start, end)
 
     # Default grids matching offline_backtest
-    ef = [10, 20, 30]
-    es = [50, 80, 120]
-    aw = [10, 14, 20]
-    ak = [1.5, 2.0, 2.5]
-    vf = [0.0, 0.02, 0.03]
-
-    grid = ob.grid_search(
-        rows,
-        ema_fast_list=ef,
-        ema_slow_list=es,
-        atr_window_list=aw,
-        atr_k_list=ak,
-        vol_filter_list=vf,
-        start_cash=1_000_000,
-        slippage_pct=0.0001,
-        fee_perc_roundturn=0.0002,
-        per_trade_risk_pct=0.25,
-        daily_loss_stop_pct=1.0,
+    grid = lite.grid_search(
+        bars,
+        ema_fast_list=[10, 20, 30],
+        ema_slow_list=[50, 80, 120],
+        atr_window_list=[10, 14, 20],
+        atr_k_list=[1.5, 2.0, 2.5],
+        vol_filter_min_atr_pct_list=[0.0, 0.02, 0.03],
+        **COSTS,
+        top_n=None,
     )
-    filtered = [g for g in grid if g["metrics"].get("num_trades", 0) >= min_trades]
-    cand = filtered if filtered else grid
-    if not cand:
+    best = lite.select_best(grid, objective=objective, min_trades=min_trades)
+    if best is None:
         return {"symbol": symbol.upper(), "error": "no params"}
-    if objective == "sharpe":
-        cand.sort(key=lambda x: x["metrics"].get("sharpe_approx", 0.0), reverse=True)
-    else:
-        cand.sort(key=lambda x: x["metrics"].get("total_return", 0.0), reverse=True)
-    best = cand[0]
 
     # Re-run with best and export artifacts
-    disallow = _build_blackout_set(rows, events, blackout_before, blackout_after)
-    res = ob.run_backtest(
-        rows,
+    allow = None
+    if events:
+        allow = lite.blackout_allow(bars.t, lite.load_events_csv(events), before_min=blackout_before, after_min=blackout_after)
+    sig = lite.generate_signals(
+        bars,
         ema_fast=best["ema_fast"],
         ema_slow=best["ema_slow"],
         atr_window=best["atr_window"],
         vol_filter_min_atr_pct=best["vol_filter_min_atr_pct"],
-        start_cash=1_000_000,
-        atr_k_stop=best["atr_k"],
-        slippage_pct=0.0001,
-        fee_perc_roundturn=0.0002,
-        per_trade_risk_pct=0.25,
-        daily_loss_stop_pct=1.0,
-        entry_disallow_set=disallow,
     )
-    res["best_params"] = best
+    res = lite.run_backtest(sig, atr_k_stop=best["atr_k"], entry_allowed=allow, **COSTS)
 
     pair_dir = out_dir / f"{symbol.upper()}_free"
     out_json = pair_dir / f"{symbol.upper()}_opt.json"
     out_csv_dir = pair_dir / "csv"
-    ob.write_report(str(out_json), res)
-    ob.export_csvs(str(out_json), str(out_csv_dir))
+    lite.save_report(out_json, res)
+    lite.export_report_to_csvs(out_json, out_csv_dir)
 
-    met = ob.metrics_from_pnl(res.get("pnl_series", {}), res["start_cash"], res["end_cash"])
+    met = lite.metrics_from_pnl(res["pnl_series"], res["start_cash"], res["end_cash"])
     return {
         "symbol": symbol.upper(),
         "best_params": best,
@@ -135,6 +97,67 @@ def run_one(symbol: str, *, objective: str, min_trades: int, out_dir: Path, star
     }
 
 
+SUMMARY_COLUMNS = ["symbol", "total_return", "sharpe_approx", "max_drawdown", "num_trades", "profit_factor", "json", "csv"]
+
+
+def write_summary_csv(path: Path, results: List[dict]) -> None:
+    """Combined CSV summary (one row per symbol)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(SUMMARY_COLUMNS)
+        for r in results:
+            m = r.get("metrics", {}) if isinstance(r, dict) else {}
+            w.writerow([
+                r.get("symbol"),
+                m.get("total_return"),
+                m.get("sharpe_approx"),
+                m.get("max_drawdown"),
+                m.get("num_trades"),
+                m.get("profit_factor"),
+                r.get("json"),
+                r.get("csv"),
+            ])
+
+
+def _print_header() -> None:
+    print(f"{'symbol':<8} {'return':>9} {'sharpe':>8} {'max_dd':>8} {'trades':>6}", file=sys.stderr)
+
+
+def _print_row(r: dict) -> None:
+    m = r.get("metrics")
+    if not m:
+        print(f"{r.get('symbol'):<8} error: {r.get('error')}", file=sys.stderr)
+        return
+    print(f"{r['symbol']:<8} {m['total_return']:>9.4f} {m['sharpe_approx']:>8.3f} {m['max_drawdown']:>8.4f} {m['num_trades']:>6}",
+          file=sys.stderr, flush=True)
+
+
+def run_parallel(syms: List[str], opts: Dict[str, Any], *, jobs: int, skip_fetch: bool,
+                 on_result: Callable[[str, dict], None]) -> None:
+    """
+    Fetches overlap on a thread pool; each fetched CSV goes straight to a process
+    pool for the grid search, and on_result is called as each symbol finishes.
+    """
+    with ThreadPoolExecutor(max_workers=min(len(syms), 8)) as io_pool, ProcessPoolExecutor(max_workers=jobs) as cpu_pool:
+        pending: Dict[Any, tuple] = {}
+        for s in syms:
+            if skip_fetch:
+                pending[cpu_pool.submit(optimize_one, s, csv_path_for(s), **opts)] = ("compute", s)
+            else:
+                pending[io_pool.submit(fetch_stooq_daily, s, csv_path_for(s))] = ("fetch", s)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                kind, s = pending.pop(fut)
+                err: Optional[BaseException] = fut.exception()
+                if err is not None:
+                    on_result(s, {"symbol": s.upper(), "error": str(err)})
+                elif kind == "fetch":
+                    pending[cpu_pool.submit(optimize_one, s, fut.result(), **opts)] = ("compute", s)
+                else:
+                    on_result(s, fut.result())
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Free quickstart: fetch Stooq daily and optimize without external deps")
     ap.add_argument("--symbols", default="usdjpy,eurusd,xauusd")
@@ -146,37 +169,42 @@ def main() -> None:
     ap.add_argument("--events", default=None, help="CSV with timestamp column (UTC)")
     ap.add_argument("--blackout-before-min", type=int, default=30)
     ap.add_argument("--blackout-after-min", type=int, default=30)
+    ap.add_argument("--jobs", type=int, default=0, help="Worker processes (default: min(symbols, CPUs); 1 = serial)")
+    ap.add_argument("--skip-fetch", action="store_true", help="Use existing data/<SYMBOL>_1d.csv instead of fetching")
     args = ap.parse_args()
 
     syms = [s.strip() for s in args.symbols.split(",") if s.strip()]
     out_dir = Path(args.out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    results = []
-    for s in syms:
-        try:
-            r = run_one(s, objective=args.objective, min_trades=args.min_trades, out_dir=out_dir, start=args.start, end=args.end, events=args.events, blackout_before=args.blackout_before_min, blackout_after=args.blackout_after_min)
-        except Exception as e:
-            r = {"symbol": s.upper(), "error": str(e)}
-        results.append(r)
+    opts = dict(objective=args.objective, min_trades=args.min_trades, out_dir=out_dir, start=args.start, end=args.end,
+                events=args.events, blackout_before=args.blackout_before_min, blackout_after=args.blackout_after_min)
+    jobs = args.jobs or min(len(syms), os.cpu_count() or 1)
+    done: Dict[str, dict] = {}
+
+    def on_result(sym: str, r: dict) -> None:
+        # Partial summary in --symbols order (final file equals the serial run)
+        done[sym] = r
+        _print_row(r)
+        write_summary_csv(out_dir / "summary_all.csv", [done[x] for x in syms if x in done])
+
+    _print_header()
+    if jobs <= 1:
+        for s in syms:
+            try:
+                if args.skip_fetch:
+                    r = optimize_one(s, csv_path_for(s), **opts)
+                else:
+                    r = run_one(s, **opts)
+            except Exception as e:
+                r = {"symbol": s.upper(), "error": str(e)}
+            on_result(s, r)
+    else:
+        run_parallel(syms, opts, jobs=jobs, skip_fetch=args.skip_fetch, on_result=on_result)
+    results = [done[s] for s in syms]
 
-    # Write combined CSV summary
     summary_csv = out_dir / "summary_all.csv"
-    with open(summary_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["symbol", "total_return", "sharpe_approx", "max_drawdown", "num_trades", "profit_factor", "json", "csv"])
-        for r in results:
-            m = r.get("metrics", {}) if isinstance(r, dict) else {}
-            w.writerow([
-                r.get("symbol"),
-                m.get("total_return"),
-                m.get("sharpe_approx"),
-                m.get("max_drawdown"),
-                m.get("num_trades"),
-                m.get("profit_factor"),
-                r.get("json"),
-                r.get("csv"),
-            ])
+    write_summary_csv(summary_csv, results)
 
     # Write a simple Markdown report
     report_md = out_dir / "REPORT.md"
@@ -15,14 +15,16 @@ FX 一括実行パイプライン（ローカル専用）
   out-dir: out/pipeline
 
 備考:
-  - 内部で `python -m fxbot.cli` を順次呼び出します。
+  - 各ステップ（`fxbot.cli` の backtest / optimize / backtest-with-opt / report-export / walkforward と同じ出力）を
+    `fxbot.pipeline` で1プロセス内の依存グラフとして実行します。CSVの読込は1回、指標は共有、
+    独立なステップ（backtest / optimize / walkforward）は並行実行。
+  - 入力（CSV・設定・パラメータ）が前回と同じステップはスキップし、前回の出力をコピーします
+    （状態は <out-dir>/.pipeline_state.json）。`--force` で全ステップを再実行。
   - 事前に `pip install -r requirements.txt` を実行してください。
 """
 from __future__ import annotations
 
 import argparse
-import os
-import subprocess
 from datetime import datetime
 from pathlib import Path
 import sys
@@ -30,16 +32,14 @@ import sys
 
 ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
 
+from fxbot.pipeline import Pipeline, PipelineError, fx_pipeline_steps  # noqa: E402
 
-def sh(cmd: list[str]) -> None:
-    env = os.environ.copy()
-    # Ensure src is importable
-    env["PYTHONPATH"] = str(SRC)
-    print("$", " ".join(cmd))
-    res = subprocess.run(cmd, env=env)
-    if res.returncode != 0:
-        raise SystemExit(res.returncode)
+
+def _parse_list(s: str, cast):
+    return [cast(x) for x in s.split(",") if x.strip()]
 
 
 def guess_csv() -> str:
@@ -64,6 +64,8 @@ def main() -> None:
     p.add_argument("--train-bars", type=int, default=2000, help="WFの学習本数")
     p.add_argument("--test-bars", type=int, default=500, help="WFの検証本数")
     p.add_argument("--atr-min", dest="atr_min", default="0.0,0.02,0.03", help="最適化時の atr-min-pct 候補（カンマ区切り）")
+    p.add_argument("--jobs", type=int, default=3, help="並行実行するステップ数の上限")
+    p.add_argument("--force", action="store_true", help="前回結果を使わず全ステップを再実行")
     a = p.parse_args()
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -71,81 +73,26 @@ def main() -> None:
     out_dir = out_root / ts
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Common flags
-    base = [sys.executable, "-m", "fxbot.cli"]
-    date_flags: list[str] = []
-    if a.start:
-        date_flags += ["--start", a.start]
-    if a.end:
-        date_flags += ["--end", a.end]
-
-    # 1) Backtest (raw)
+    grid = {
+        "ema_fast_list": [10, 20, 30],
+        "ema_slow_list": [50, 80, 120],
+        "atr_window_list": [10, 14, 20],
+        "atr_k_list": [1.5, 2.0, 2.5],
+        "vol_filter_min_atr_pct_list": _parse_list(a.atr_min, float),
+    }
+    steps = fx_pipeline_steps(
+        csv=a.csv, config=a.config, out_dir=out_dir, grid=grid, start=a.start, end=a.end,
+        ppyear=a.ppyear, train_bars=a.train_bars, test_bars=a.test_bars,
+    )
+    try:
+        runs = Pipeline(steps, state_path=out_root / ".pipeline_state.json", max_workers=a.jobs).run(force=a.force)
+    except PipelineError as e:
+        raise SystemExit(f"{e}: {e.__cause__!r}")
     report = out_dir / "report.json"
-    cmd_bt = base + [
-        "backtest",
-        "--csv", a.csv,
-        "--pair", a.pair,
-        "--config", a.config,
-        "--out", str(report),
-    ] + date_flags
-    sh(cmd_bt)
-
-    # 2) Optimize (grid search)
     opt = out_dir / "opt.json"
-    cmd_opt = base + [
-        "optimize",
-        "--csv", a.csv,
-        "--pair", a.pair,
-        "--config", a.config,
-        "--ema-fast", "10,20,30",
-        "--ema-slow", "50,80,120",
-        "--atr-window", "10,14,20",
-        "--atr-k", "1.5,2.0,2.5",
-        "--atr-min-pct", a.atr_min,
-        "--ppyear", str(a.ppyear),
-        "--out", str(opt),
-    ] + date_flags
-    sh(cmd_opt)
-
-    # 3) Backtest with best params
     report_best = out_dir / "report_best.json"
-    cmd_bt_best = base + [
-        "backtest-with-opt",
-        "--csv", a.csv,
-        "--pair", a.pair,
-        "--config", a.config,
-        "--opt", str(opt),
-        "--out", str(report_best),
-    ] + date_flags
-    sh(cmd_bt_best)
-
-    # 4) Export CSVs
     out_csv = out_dir / "csv"
-    cmd_exp = base + [
-        "report-export",
-        "--in", str(report_best),
-        "--out-dir", str(out_csv),
-    ]
-    sh(cmd_exp)
-
-    # 5) Walk-Forward
     wf = out_dir / "walkforward.json"
-    cmd_wf = base + [
-        "walkforward",
-        "--csv", a.csv,
-        "--pair", a.pair,
-        "--config", a.config,
-        "--ema-fast", "10,20,30",
-        "--ema-slow", "50,80,120",
-        "--atr-window", "10,14,20",
-        "--atr-k", "1.5,2.0,2.5",
-        "--atr-min-pct", a.atr_min,
-        "--train-bars", str(a.train_bars),
-        "--test-bars", str(a.test_bars),
-        "--ppyear", str(a.ppyear),
-        "--out", str(wf),
-    ] + date_flags
-    sh(cmd_wf)
 
     # Summary
     summary = out_dir / "SUMMARY.txt"
@@ -161,6 +108,8 @@ def main() -> None:
         f"exported csv: {out_csv}",
         f"walk-forward: {wf}",
         "",
+        "steps: " + ", ".join(f"{r.name}={r.status}" for r in runs.values()),
+        "",
         "Next: 生成された CSV と JSON を確認し、安定パラメータを config.yaml に反映してください。",
     ]
     summary.write_text("\n".join(lines), encoding="utf-8")
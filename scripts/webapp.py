@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import os
+import base64
+import gzip
 import json
+import threading
+import time
+import uuid
 from pathlib import Path
 from typing import Dict, Any, List
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, g
+import numpy as np
 import pandas as pd
 import sys
-from pathlib import Path
 
 # Make src importable without requiring PYTHONPATH
 ROOT = Path(__file__).resolve().parents[1]
@@ -17,14 +22,19 @@ if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
 
 # Local imports from src (expect PYTHONPATH=src or run via module path)
-from fxbot.config import load_config
+from fxbot.config import engine_kwargs, load_config
 from fxbot.data.csv_loader import load_ohlcv_csv
-from fxbot.strategies.momo_atr import generate_signals
+from fxbot.strategies.registry import get_strategy, names as strategy_names
+from fxbot.strategies import ai_bridge
 from fxbot.strategies.ai_bridge import generate_signals_from_callable
 from fxbot.backtest import run_backtest
-from fxbot.report import metrics_from_pnl
-from fxbot.risk import position_size_from_atr
+from fxbot.report import metrics_from_pnl, trades_frame, trades_records
 from fxbot.walkforward import walk_forward
+from fxbot import features, profiling
+from fxbot.cache import FileLRUCache, LRUCache, stats_of
+from fxbot.downsample import METHODS as DOWNSAMPLE_METHODS, downsample_indices
+from fxbot.jobs import FINISHED, JobContext, JobManager, JobStore
+from fxbot.paper import PaperEngine, SessionRegistry, valid_session_id
 
 
 app = Flask(__name__)
@@ -33,10 +43,38 @@ DATA_DIR = ROOT / "data"
 DEFAULT_CONFIG = ROOT / "config" / "config.yaml"
 ONLINE_ALLOWED = os.environ.get("FXBOT_ALLOW_ONLINE", "0") in ("1", "true", "TRUE", "True")
 PREFS_PATH = ROOT / "out" / "webui_prefs.json"
-
-# In-memory storage for last backtest trades (latest 20 shown; export may include all)
-_LAST_TRADES: List[Dict[str, Any]] = []
-_LAST_WF_FOLDS: List[Dict[str, Any]] = []
+# Stage timers are coarse (per load/backtest/metrics call), so they stay on unless FXBOT_PROFILE=0
+PROFILING = os.environ.get("FXBOT_PROFILE", "1") in ("1", "true", "TRUE", "True")
+if PROFILING:
+    profiling.enable()
+_STARTED_AT = time.time()
+# Per-process caches: parsed CSVs (warmed at startup by `fxbot.cli serve`), the config,
+# sliced/downcast frames and signal frames per strategy params. File-backed entries are
+# keyed by mtime/size, so edited files are reloaded; cached frames are read-only.
+CSV_CACHE_MAX = int(os.environ.get("FXBOT_CSV_CACHE", "8"))
+_CSV_CACHE = FileLRUCache(CSV_CACHE_MAX, name="csv")
+_CONFIG_CACHE = FileLRUCache(4, name="config")
+_FRAME_CACHE = FileLRUCache(int(os.environ.get("FXBOT_FRAME_CACHE", "16")), name="frame")
+_SIGNAL_CACHE = LRUCache(int(os.environ.get("FXBOT_SIGNAL_CACHE", "32")), name="signals")
+# AI callable scores on disk (content-addressed, shared by all worker processes)
+AI_SCORE_DIR = Path(os.environ.get(ai_bridge.SCORE_CACHE_ENV) or str(ROOT / "out" / "ai_scores"))
+# Feature columns (EMA/ATR/rolling stats) per cached frame, memory-mapped from disk and
+# shared by strategy signals and AI callables on the same frame
+FEATURE_DIR = Path(os.environ.get(features.STORE_ENV) or str(ROOT / "out" / "features"))
+# Background jobs (walk-forward / batch / snapshot rerun); table shared by all worker processes
+JOBS_DB = Path(os.environ.get("FXBOT_JOBS_DB", str(ROOT / "out" / "jobs.sqlite")))
+JOB_WORKERS = int(os.environ.get("FXBOT_JOB_WORKERS", "2"))
+_JOBS: JobManager | None = None
+_JOBS_LOCK = threading.Lock()
+
+# Per-browser sessions (cookie, or X-Session-Id header for API clients): paper engine,
+# last backtest trades and WF folds for export. Saved under out/sessions so any worker
+# process can serve them.
+SESSION_COOKIE = "fxbot_sid"
+SESSIONS_DIR = Path(os.environ.get("FXBOT_SESSIONS_DIR", str(ROOT / "out" / "sessions")))
+SESSION_IDLE_S = float(os.environ.get("FXBOT_SESSION_IDLE_S", "1800"))
+_PAPER: SessionRegistry | None = None
+_PAPER_LOCK = threading.Lock()
 
 
 def _list_csv_files(base: Path) -> List[str]:
@@ -48,6 +86,190 @@ def _list_csv_files(base: Path) -> List[str]:
     return files
 
 
+def _colmap_key(column_map: Dict[str, Any] | None) -> tuple:
+    return tuple(sorted((str(k), str(v)) for k, v in (column_map or {}).items()))
+
+
+def _load_csv(path: str | Path, column_map: Dict[str, Any] | None = None) -> pd.DataFrame:
+    """load_ohlcv_csv through the per-process cache; a changed file (mtime/size) is reparsed."""
+    df = _CSV_CACHE.get_file(path, lambda p: load_ohlcv_csv(p, column_map=column_map), variant=_colmap_key(column_map))
+    # Callers may modify the result; never hand out the cached object itself
+    return df.copy()
+
+
+def _config():
+    """Parsed config/config.yaml (shared, read-only)."""
+    return _CONFIG_CACHE.get_file(DEFAULT_CONFIG, load_config)
+
+
+def _frame_variant(column_map, start, end, max_bars, float32) -> tuple:
+    mb = int(max_bars) if max_bars else 0
+    return (_colmap_key(column_map), str(start or ""), str(end or ""), mb if mb > 0 else 0, bool(float32))
+
+
+def _load_frame(path: str | Path, column_map: Dict[str, Any] | None = None, start: str | None = None,
+                end: str | None = None, max_bars: Any = None, float32: bool = False) -> pd.DataFrame:
+    """CSV frame after start/end slicing, optional tail(max_bars) and float32 downcast (shared, read-only:
+    hand user code such as AI callables a .copy())."""
+
+    def build(_: str) -> pd.DataFrame:
+        df = _load_csv(path, column_map=column_map)
+        if start:
+            df = df[df.index >= pd.to_datetime(start, utc=True)]
+        if end:
+            df = df[df.index <= pd.to_datetime(end, utc=True)]
+        mb = _frame_variant(column_map, start, end, max_bars, float32)[3]
+        if mb > 0:
+            df = df.tail(mb)
+        if float32:
+            # Memory saver for the interactive backtest
+            try:
+                df = df.copy()
+                for c in ["open", "high", "low", "close", "volume"]:
+                    if c in df.columns:
+                        df[c] = pd.to_numeric(df[c], errors="coerce").astype("float32")
+            except Exception:
+                pass
+        return df
+
+    return _FRAME_CACHE.get_file(path, build, variant=_frame_variant(column_map, start, end, max_bars, float32))
+
+
+def _signals(path: str | Path, *, strategy: str = "momo_atr", column_map: Dict[str, Any] | None = None,
+             start: str | None = None, end: str | None = None, max_bars: Any = None, float32: bool = False,
+             **params: Any) -> pd.DataFrame:
+    """Strategy signals on the cached frame, memoized per file version, strategy and params (shared, read-only)."""
+    strat = get_strategy(strategy)
+    sp = strat.signal_params(strat.resolve(params))
+    variant = _frame_variant(column_map, start, end, max_bars, float32)
+    key = (_FRAME_CACHE.key_for(path, variant), strategy, *sp.items())
+
+    def build() -> pd.DataFrame:
+        df = _load_frame(path, column_map, start, end, max_bars, float32)
+        return strat.generate(df, sp, features=features.open_features(df, root=FEATURE_DIR))
+
+    return _SIGNAL_CACHE.get_or_compute(key, build)
+
+
+def _strategy(name: str | None, cfg):
+    """(name, strategy): a registered name or the config's strategy.name (the default); ValueError otherwise."""
+    name = name or cfg.strategy_name
+    if name not in strategy_names() and name != cfg.strategy_name:
+        raise ValueError(f"unknown strategy {name!r}; available: {', '.join(strategy_names())}")
+    return name, get_strategy(name)
+
+
+def _given(p: Dict[str, Any]) -> Dict[str, Any]:
+    """UI params that were filled in."""
+    return {k: v for k, v in p.items() if str(v).strip() != ""}
+
+
+def warm_csv_cache(paths: List[str] | None = None) -> int:
+    """Preload CSVs (default: data/*.csv up to the cache size). Returns how many were loaded."""
+    loaded = 0
+    for f in (paths if paths is not None else _list_csv_files(DATA_DIR))[: max(0, CSV_CACHE_MAX)]:
+        try:
+            _load_csv(f)
+            loaded += 1
+        except Exception:
+            continue  # not an OHLCV file; skip
+    return loaded
+
+
+def _sid() -> str:
+    """Session id of the current request; a new one is issued (cookie) when missing/invalid."""
+    sid = getattr(g, "sid", None)
+    if sid is None:
+        sid = request.headers.get("X-Session-Id") or request.cookies.get(SESSION_COOKIE)
+        if not valid_session_id(sid):
+            sid = g.new_sid = uuid.uuid4().hex
+        g.sid = sid
+    return sid
+
+
+def _paper_engine(spec: Dict[str, Any]) -> PaperEngine:
+    # Rebuilds a session's engine; signals come from the shared caches when possible
+    if spec.get("ai_callable"):
+        sig = generate_signals_from_callable(_load_frame(spec["csv"], spec.get("columns")).copy(),
+                                             callable_path=str(spec["ai_callable"]), threshold=float(spec.get("ai_threshold", 0.5)),
+                                             cache_dir=AI_SCORE_DIR)
+    else:
+        sig = _signals(spec["csv"], strategy=spec.get("strategy_name", "momo_atr"), column_map=spec.get("columns"),
+                       **spec["strategy"])
+    return PaperEngine(sig, **spec["engine"])
+
+
+def _sessions() -> SessionRegistry:
+    global _PAPER
+    with _PAPER_LOCK:
+        if _PAPER is None:
+            _PAPER = SessionRegistry(SESSIONS_DIR, _paper_engine, idle_ttl_s=SESSION_IDLE_S)
+        return _PAPER
+
+
+TRADE_TABLE_COLUMNS = ("entry_time", "exit_time", "entry", "exit", "size", "pnl", "hold_min", "ret_pct")
+EQUITY_MAX_POINTS = int(os.environ.get("FXBOT_EQUITY_POINTS", "2000"))
+GZIP_MIN_BYTES = 16 * 1024
+
+
+def _equity_payload(pnl: pd.Series | None, start_cash: float, opts: Dict[str, Any]) -> Any:
+    """
+    Equity curve for the chart.
+    Default: columnar {"t": epoch-ms[], "v": float[]} downsampled to max_points (lttb|minmax|none).
+    encoding "base64": t/v as little-endian int64/float64 bytes. equity_format "points": legacy [{t, v}].
+    """
+    if pnl is None or len(pnl) == 0:
+        return [] if opts.get("equity_format") == "points" else {"t": [], "v": [], "n": 0}
+    values = start_cash + np.cumsum(np.nan_to_num(pnl.to_numpy(dtype=float)))
+    t_ms = pnl.index.as_unit("ms").asi8
+    method = str(opts.get("downsample") or "lttb")
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"downsample must be one of {DOWNSAMPLE_METHODS}")
+    max_points = int(opts.get("max_points", EQUITY_MAX_POINTS) or 0)
+    idx = downsample_indices(values, max_points, method=method, x=t_ms)
+    t_ms, values = t_ms[idx], values[idx]
+    if opts.get("equity_format") == "points":
+        return [{"t": pd.Timestamp(int(ms), unit="ms", tz="UTC").isoformat(), "v": float(v)} for ms, v in zip(t_ms, values)]
+    out: Dict[str, Any] = {"n": int(len(pnl)), "method": method if len(idx) < len(pnl) else "none"}
+    if opts.get("encoding") == "base64":
+        out["encoding"] = "base64"
+        out["dtype"] = {"t": "<i8", "v": "<f8"}
+        out["t"] = base64.b64encode(t_ms.astype("<i8").tobytes()).decode("ascii")
+        out["v"] = base64.b64encode(values.astype("<f8").tobytes()).decode("ascii")
+    else:
+        out["t"] = t_ms.tolist()
+        out["v"] = values.tolist()
+    return out
+
+
+def _sse(event: str, data: Any) -> str:
+    """One server-sent event (compact JSON payload)."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+def _sse_response(gen) -> Response:
+    # X-Accel-Buffering: stop nginx-style proxies from holding events back
+    return Response(gen, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _jobs() -> JobManager:
+    # Created on first use so pre-fork servers start the pool inside each worker
+    global _JOBS
+    with _JOBS_LOCK:
+        if _JOBS is None:
+            _JOBS = JobManager(JobStore(JOBS_DB), max_workers=JOB_WORKERS)
+        return _JOBS
+
+
+def _submit_or_run(kind: str, fn, params: Dict[str, Any], payload: Dict[str, Any]):
+    """Queue fn(ctx) as a background job (202 + job id); {"wait": true} runs it inline as before."""
+    if payload.get("wait"):
+        return jsonify(fn(None))
+    job_id = _jobs().submit(kind, fn, params)
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"}), 202
+
+
 @app.get("/")
 def index() -> Response:
     html = f"""
@@ -98,12 +320,15 @@ def index() -> Response:
       const el = document.createElement('div'); el.className = 'toast' + (kind==='error'?' toast--err':''); el.textContent = msg; box.appendChild(el);
       setTimeout(()=>{{ el.remove(); }}, timeout);
     }}
-    function downsample(labels, values, maxPoints=1200) {{
-      const n = values.length; if (n <= maxPoints) return {{ labels, values }};
-      const step = Math.ceil(n / maxPoints);
-      const dsL = [], dsV = [];
-      for (let i=0; i<n; i+=step) {{ dsL.push(labels[i]); dsV.push(values[i]); }}
-      return {{ labels: dsL, values: dsV }};
+    // Equity payloads are columnar {{t: epoch-ms[], v: []}} (legacy: [{{t, v}}]); server already downsampled
+    function equitySeries(eq) {{
+      if (Array.isArray(eq)) return {{ labels: eq.map(p => p.t), values: eq.map(p => p.v) }};
+      return {{ labels: (eq.t||[]).map(ms => new Date(ms).toISOString()), values: eq.v||[] }};
+    }}
+    function chartPoints() {{
+      const c = document.getElementById('equity');
+      const w = (c && c.clientWidth) ? c.clientWidth : 1000;
+      return Math.max(200, Math.min(4000, Math.round(w * 2)));
     }}
     function getAccent() {{
       try {{ return getComputedStyle(document.body).getPropertyValue('--accent').trim() || '#ff6f00'; }} catch(e) {{ return '#ff6f00'; }}
@@ -130,6 +355,49 @@ def index() -> Response:
       }});
     }}
 
+    // Long operations run as server-side jobs: submit, then poll /api/jobs/<id> until finished
+    async function postJob(url, payload, label) {{
+      const r = await fetch(url, {{ method:'POST', headers:{{'Content-Type':'application/json'}}, body: JSON.stringify(payload) }});
+      if (!r.ok) throw new Error(await r.text());
+      const first = await r.json();
+      if (!first.job_id) return first;
+      const bar = document.getElementById('jobbar'); const st = document.getElementById('job_status');
+      const cancelBtn = document.getElementById('job_cancel');
+      if (bar) bar.style.display = '';
+      if (cancelBtn) cancelBtn.onclick = () => fetch('/api/jobs/' + first.job_id + '/cancel', {{ method:'POST' }});
+      const show = (job) => {{
+        const pct = (job.progress && job.progress.pct != null) ? ' ' + job.progress.pct.toFixed(0) + '%' : '';
+        if (st) st.textContent = label + ': ' + job.status + pct;
+      }};
+      const finish = (job) => {{
+        if (job.status === 'succeeded') return job.result || {{}};
+        if (job.status === 'failed') throw new Error(job.error || 'job failed');
+        throw new Error(label + ': キャンセルされました');
+      }};
+      try {{
+        if (window.EventSource) {{
+          // Server pushes progress; the final 'done' event carries the result
+          const job = await new Promise((resolve, reject) => {{
+            const es = new EventSource('/api/jobs/' + first.job_id + '/stream');
+            es.addEventListener('progress', ev => show(JSON.parse(ev.data)));
+            es.addEventListener('done', ev => {{ es.close(); resolve(JSON.parse(ev.data)); }});
+            es.addEventListener('error', () => {{ es.close(); reject(new Error(label + ': 進捗ストリームが切断されました')); }});
+          }});
+          return finish(job);
+        }}
+        while (true) {{
+          await new Promise(res => setTimeout(res, 1000));
+          const jr = await fetch('/api/jobs/' + first.job_id);
+          if (!jr.ok) throw new Error(await jr.text());
+          const job = await jr.json();
+          show(job);
+          if (job.status !== 'queued' && job.status !== 'running') return finish(job);
+        }}
+      }} finally {{
+        if (bar) bar.style.display = 'none';
+      }}
+    }}
+
     async function runBacktest() {{
       const runBtn = document.getElementById('run');
       if (runBtn) {{ runBtn.disabled = true; runBtn.textContent = '実行中…'; }}
@@ -170,10 +438,10 @@ def index() -> Response:
       if (!(payload.params.atr_k >= 0.5 && payload.params.atr_k <= 5.0)) errs.push('ATR k は 0.5〜5.0');
       if (!(payload.params.atr_min_pct >= 0.0 && payload.params.atr_min_pct <= 0.2)) errs.push('Vol下限 は 0.0〜0.2');
       if (payload.start && payload.end && (new Date(payload.start) > new Date(payload.end))) errs.push('開始は終了より前');
-      if (errs.length) { alert('入力を確認してください:\n- ' + errs.join('\n- ')); return; }
+      if (errs.length) {{ alert('入力を確認してください:\\n- ' + errs.join('\\n- ')); return; }}
       // Optional column mapping
       const cols = ['timestamp','open','high','low','close','volume'];
-      const colMap = {}; let hasMap = false;
+      const colMap = {{}}; let hasMap = false;
       cols.forEach(k => {{
         const el = document.getElementById('col_'+k);
         if (el) {{
@@ -182,6 +450,7 @@ def index() -> Response:
         }}
       }});
       if (hasMap) payload.columns = colMap;
+      payload.max_points = chartPoints();
       const res = await fetch('/api/backtest', {{ method: 'POST', headers: {{ 'Content-Type': 'application/json' }}, body: JSON.stringify(payload) }});
       if (!res.ok) {{
         const txt = await res.text();
@@ -200,9 +469,7 @@ def index() -> Response:
       document.getElementById('m_wr').textContent = fmt(m.win_rate);
       // Chart equity
       const ctx = document.getElementById('equity').getContext('2d');
-      const labels = data.equity.map(p => p.t);
-      const values = data.equity.map(p => p.v);
-      const ds = downsample(labels, values, 1200);
+      const ds = equitySeries(data.equity);
       if (window._chart) window._chart.destroy();
       window._chart = new Chart(ctx, {{
         type: 'line',
@@ -305,9 +572,8 @@ def index() -> Response:
         }});
         document.querySelectorAll('.btn_run_snap').forEach(b => {{ b.addEventListener('click', async (ev) => {{
           const name = ev.target.getAttribute('data-name');
-          const r2 = await fetch('/api/snapshots/run', {{ method:'POST', headers:{{'Content-Type':'application/json'}}, body: JSON.stringify({{ name }}) }});
-          if (!r2.ok) {{ alert(await r2.text()); return; }}
-          const res = await r2.json();
+          let res;
+          try {{ res = await postJob('/api/snapshots/run', {{ name, max_points: chartPoints() }}, 'スナップショット再実行'); }} catch(e) {{ alert(e.message); return; }}
           const m = res.summary||{{}}; const fmt=(x)=> (x==null?'-':(typeof x==='number'?x.toFixed(4):x));
           document.getElementById('m_tr').textContent = fmt(m.total_return);
           document.getElementById('m_sh').textContent = fmt(m.sharpe_approx);
@@ -315,8 +581,7 @@ def index() -> Response:
           document.getElementById('m_nt').textContent = fmt(m.num_trades);
           document.getElementById('m_wr').textContent = fmt(m.win_rate);
           const ctx = document.getElementById('equity').getContext('2d');
-          const labels = res.equity.map(p => p.t); const values = res.equity.map(p => p.v);
-          const ds = (typeof downsample==='function') ? downsample(labels, values, 1200) : {{ labels, values }};
+          const ds = equitySeries(res.equity);
           if (window._chart) window._chart.destroy();
           window._chart = new Chart(ctx, {{ type:'line', data: {{ labels: ds.labels, datasets:[{{ label:'Equity', data: ds.values, borderColor:getAccent(), fill:false, tension:0.1 }}] }}, options: {{ responsive:true, plugins: {{ zoom: {{ zoom: {{ wheel: {{ enabled:true }}, pinch: {{ enabled:true }}, mode:'x' }}, pan: {{ enabled:true, mode:'x' }} }} }} }} }});
         }}); }});
@@ -327,7 +592,7 @@ def index() -> Response:
       const btnBatch = document.getElementById('btn_run_batch'); if (btnBatch) btnBatch.addEventListener('click', async () => {{
         const area = document.getElementById('batch_csvs'); if (!area) return; const txt = (area.value||'').trim(); if (!txt) {{ alert('CSVを入力してください'); return; }}
         const payload = {{
-          csvs: txt.split(/\r?\n/).map(s=>s.trim()).filter(Boolean),
+          csvs: txt.split(/\\r?\\n/).map(s=>s.trim()).filter(Boolean),
           start: document.getElementById('start').value || null,
           end: document.getElementById('end').value || null,
           params: {{
@@ -341,9 +606,8 @@ def index() -> Response:
         const cols = ['timestamp','open','high','low','close','volume']; const colMap={{}}; let hasMap=false;
         cols.forEach(k=>{{ const el=document.getElementById('col_'+k); if(el&&el.value.trim()){{ colMap[k]=el.value.trim(); hasMap=true; }} }});
         if (hasMap) payload.columns = colMap;
-        const r = await fetch('/api/batch', {{ method:'POST', headers:{{'Content-Type':'application/json'}}, body: JSON.stringify(payload) }});
-        if (!r.ok) {{ alert(await r.text()); return; }}
-        const data = await r.json();
+        let data;
+        try {{ data = await postJob('/api/batch', payload, 'バッチ'); }} catch(e) {{ alert(e.message); return; }}
         const tb = document.querySelector('#batch_tbl tbody'); if (!tb) return; tb.innerHTML='';
         (data.results||[]).forEach(it => {{
           const tr=document.createElement('tr');
@@ -369,12 +633,11 @@ def index() -> Response:
           av: (document.getElementById('wf_av').value||'0.0,0.01,0.02'),
         }};
         const cols = ['timestamp','open','high','low','close','volume'];
-        const colMap = {}; let hasMap = false;
+        const colMap = {{}}; let hasMap = false;
         cols.forEach(k => {{ const el = document.getElementById('col_'+k); if (el && el.value.trim()) {{ colMap[k]=el.value.trim(); hasMap=true; }} }});
         if (hasMap) payload.columns = colMap;
-        const res = await fetch('/api/walkforward', {{ method:'POST', headers:{{'Content-Type':'application/json'}}, body: JSON.stringify(payload) }});
-        if (!res.ok) {{ alert(await res.text()); return; }}
-        const data = await res.json();
+        let data;
+        try {{ data = await postJob('/api/walkforward', payload, 'WF'); }} catch(e) {{ alert(e.message); return; }}
         document.getElementById('wf_n').textContent = (data.folds||[]).length;
         const s = data.summary||{{}};
         const fmt = (x) => (x===null||x===undefined) ? '-' : (typeof x==='number' ? x.toFixed(4) : x);
@@ -402,7 +665,7 @@ def index() -> Response:
         const ai = document.getElementById('ai_callable').value.trim();
         if (ai) {{ payload.ai_callable = ai; payload.ai_threshold = parseFloat(document.getElementById('ai_threshold').value || '0.5'); }}
         const cols = ['timestamp','open','high','low','close','volume'];
-        const colMap = {}; let hasMap = false;
+        const colMap = {{}}; let hasMap = false;
         cols.forEach(k => {{ const el = document.getElementById('col_'+k); if (el && el.value.trim()) {{ colMap[k]=el.value.trim(); hasMap=true; }} }});
         if (hasMap) payload.columns = colMap;
         const r = await fetch('/api/paper/config', {{ method:'POST', headers:{{'Content-Type':'application/json'}}, body: JSON.stringify(payload) }});
@@ -414,15 +677,26 @@ def index() -> Response:
         if (!r.ok) {{ alert(await r.text()); return; }}
         await refresh();
       }});
-      let timer = null;
+      // Auto replay: the server runs the engine and streams updates (SSE) instead of one request per bar
+      let stream = null;
+      const stopStream = () => {{ if (stream) {{ stream.close(); stream = null; }} document.getElementById('pt_auto').textContent='自動開始'; }};
       document.getElementById('pt_auto').addEventListener('click', async (e) => {{
-        if (timer) {{ clearInterval(timer); timer=null; e.target.textContent='自動開始'; return; }}
+        if (stream) {{ stopStream(); await refresh(); return; }}
+        const speed = parseFloat(document.getElementById('pt_speed').value || '10');
         e.target.textContent='自動停止';
-        timer = setInterval(async () => {{
-          const r = await fetch('/api/paper/step', {{ method:'POST' }});
-          if (!r.ok) {{ clearInterval(timer); timer=null; e.target.textContent='自動開始'; return; }}
-          await refresh();
-        }}, 800);
+        stream = new EventSource('/api/paper/stream?speed=' + encodeURIComponent(isNaN(speed) ? 10 : speed));
+        stream.addEventListener('update', ev => {{
+          const u = JSON.parse(ev.data);
+          document.getElementById('pt_pos').textContent = u.ptr;
+          document.getElementById('pt_total').textContent = u.total;
+          document.getElementById('pt_position').textContent = (u.position||0).toFixed(4);
+          document.getElementById('pt_entry').textContent = (u.entry_price!==null && u.entry_price!==undefined) ? u.entry_price.toFixed(5) : '-';
+          if (u.equity.length) document.getElementById('pt_equity').textContent = u.equity[u.equity.length-1].toFixed(2);
+          const st = document.getElementById('pt_status');
+          if (st && u.fills.length) {{ const f = u.fills[u.fills.length-1]; st.textContent = f.side + ' @ ' + (f.price!=null ? f.price.toFixed(5) : '-') + ' (' + f.t + ')'; }}
+        }});
+        stream.addEventListener('done', () => {{ stopStream(); notify('ペーパートレード: 最後まで再生しました'); }});
+        stream.addEventListener('error', () => {{ stopStream(); }});
       }});
       await refresh();
     }});
@@ -440,6 +714,7 @@ def index() -> Response:
     </div>
   </header>
   <div id=\"toast\"></div>
+  <div id=\"jobbar\" class=\"card muted\" style=\"display:none\"><span id=\"job_status\">-</span> <button id=\"job_cancel\">キャンセル</button></div>
 
   <div class=\"card\"> 
     <div class=\"row\"> 
@@ -566,6 +841,7 @@ def index() -> Response:
       <div><button id=\"pt_init\">初期化</button></div>
       <div><button id=\"pt_step\">1バー進める</button></div>
       <div>
+        <input id=\"pt_speed\" value=\"20\" title=\"バー/秒（0=最速）\" style=\"min-width:60px;width:60px\" /> バー/秒
         <button id=\"pt_auto\">自動開始</button>
         <span id=\"pt_status\" style=\"margin-left:8px\"></span>
       </div>
@@ -586,12 +862,75 @@ def index() -> Response:
     return Response(html, mimetype="text/html")
 
 
+@app.get("/api/strategies")
+def api_strategies():
+    """Registered strategies (parameters, defaults, grids, indicators) and the config's default."""
+    cfg = _config()
+    items = [get_strategy(n).describe() for n in strategy_names()]
+    return jsonify({"default": cfg.strategy_name, "items": items})
+
+
 @app.get("/api/files")
 def api_files():
     files = _list_csv_files(DATA_DIR)
     return jsonify({"files": files})
 
 
+@app.before_request
+def _metrics_request_start():
+    g._t0 = time.perf_counter()
+
+
+@app.after_request
+def _metrics_request_end(resp: Response) -> Response:
+    prof = profiling.get_profiler()
+    t0 = getattr(g, "_t0", None)
+    if prof is not None and t0 is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        prof.record(f"http {request.method} {rule}", t0, time.perf_counter())
+        prof.add(f"http.status.{resp.status_code}")
+    # gzip large JSON bodies (equity curves, fold lists) for clients that accept it
+    if (resp.mimetype == "application/json" and not resp.direct_passthrough and "Content-Encoding" not in resp.headers
+            and "gzip" in request.headers.get("Accept-Encoding", "")):
+        body = resp.get_data()
+        if len(body) >= GZIP_MIN_BYTES:
+            resp.set_data(gzip.compress(body, compresslevel=5))
+            resp.headers["Content-Encoding"] = "gzip"
+            resp.headers["Vary"] = "Accept-Encoding"
+    new_sid = getattr(g, "new_sid", None)
+    if new_sid and not request.headers.get("X-Session-Id"):
+        resp.set_cookie(SESSION_COOKIE, new_sid, httponly=True, samesite="Lax", max_age=30 * 86_400)
+    return resp
+
+
+@app.get("/api/metrics")
+def api_metrics():
+    """Per-stage timings and counters since start (or the last ?reset=1)."""
+    prof = profiling.get_profiler()
+    if prof is None:
+        return jsonify({"enabled": False, "error": "profiling disabled (FXBOT_PROFILE=0)"})
+    out = {"enabled": True, "pid": os.getpid(), "uptime_s": time.time() - _STARTED_AT, **prof.summary()}
+    if str(request.args.get("reset", "")).lower() in ("1", "true"):
+        prof.reset()
+    return jsonify(out)
+
+
+_CACHES = (_CSV_CACHE, _CONFIG_CACHE, _FRAME_CACHE, _SIGNAL_CACHE, ai_bridge._SCORES, features._OPEN)
+
+
+@app.get("/api/cache/stats")
+def api_cache_stats():
+    """Size and hit/miss counters of this worker's caches."""
+    return jsonify({"pid": os.getpid(), "caches": stats_of(*_CACHES)})
+
+
+@app.post("/api/cache/clear")
+def api_cache_clear():
+    for c in _CACHES:
+        c.clear()
+    return jsonify({"ok": True, "pid": os.getpid()})
+
+
 @app.post("/api/backtest")
 def api_backtest():
     try:
@@ -609,129 +948,78 @@ def api_backtest():
         if not Path(csv_path).exists():
             return Response(f"csv not found: {csv_path}", status=404)
 
-        cfg = load_config(str(DEFAULT_CONFIG))
-        df = load_ohlcv_csv(str(csv_path), column_map=colmap)
-        # Optional slicing
-        if start:
-            df = df[df.index >= pd.to_datetime(start, utc=True)]  # type: ignore[name-defined]
-        if end:
-            df = df[df.index <= pd.to_datetime(end, utc=True)]  # type: ignore[name-defined]
-        # Memory saver: limit max bars and downcast numerics
+        cfg = _config()
+        # Sliced, max_bars-limited, float32-downcast frame (cached)
         try:
-            if max_bars:
-                mb = int(max_bars)
-                if mb > 0:
-                    df = df.tail(mb)
-            for c in ["open","high","low","close","volume"]:
-                if c in df.columns:
-                    df[c] = pd.to_numeric(df[c], errors="coerce").astype("float32")
-        except Exception:
-            pass
+            max_bars = int(max_bars) if max_bars else None
+        except (TypeError, ValueError):
+            max_bars = None
+        frame = dict(column_map=colmap, start=start, end=end, max_bars=max_bars, float32=True)
 
         params = cfg.strategy_params
-        # Overrides from UI (if provided)
-        ui_ef = int(p.get("ema_fast")) if str(p.get("ema_fast", "")).strip() != "" else int(params.get("ema_fast", 20))
-        ui_es = int(p.get("ema_slow")) if str(p.get("ema_slow", "")).strip() != "" else int(params.get("ema_slow", 60))
-        ui_aw = int(p.get("atr_window")) if str(p.get("atr_window", "")).strip() != "" else int(params.get("atr_window", 14))
-        ui_ak = float(p.get("atr_k")) if str(p.get("atr_k", "")).strip() != "" else float(params.get("atr_k_stop", 2.0))
-        ui_av = float(p.get("atr_min_pct")) if str(p.get("atr_min_pct", "")).strip() != "" else float(params.get("vol_filter_min_atr_pct", 0.0))
-        # Server-side validation
-        if not (ui_ef > 0):
-            return Response("EMA Fast must be > 0", status=400)
-        if not (ui_es > ui_ef):
-            return Response("EMA Slow must be > EMA Fast", status=400)
-        if not (ui_aw >= 5):
-            return Response("ATR Window must be >= 5", status=400)
-        if not (0.5 <= ui_ak <= 5.0):
-            return Response("ATR k must be in [0.5, 5.0]", status=400)
-        if not (0.0 <= ui_av <= 0.2):
-            return Response("Vol min ATR pct must be in [0.0, 0.2]", status=400)
+        try:
+            strat_name, strat = _strategy(payload.get("strategy"), cfg)
+        except ValueError as e:
+            return Response(str(e), status=400)
+        if strat.name == "momo_atr":
+            # Overrides from UI (if provided)
+            ui_ef = int(p.get("ema_fast")) if str(p.get("ema_fast", "")).strip() != "" else int(params.get("ema_fast", 20))
+            ui_es = int(p.get("ema_slow")) if str(p.get("ema_slow", "")).strip() != "" else int(params.get("ema_slow", 60))
+            ui_aw = int(p.get("atr_window")) if str(p.get("atr_window", "")).strip() != "" else int(params.get("atr_window", 14))
+            ui_ak = float(p.get("atr_k")) if str(p.get("atr_k", "")).strip() != "" else float(params.get("atr_k_stop", 2.0))
+            ui_av = float(p.get("atr_min_pct")) if str(p.get("atr_min_pct", "")).strip() != "" else float(params.get("vol_filter_min_atr_pct", 0.0))
+            # Server-side validation
+            if not (ui_ef > 0):
+                return Response("EMA Fast must be > 0", status=400)
+            if not (ui_es > ui_ef):
+                return Response("EMA Slow must be > EMA Fast", status=400)
+            if not (ui_aw >= 5):
+                return Response("ATR Window must be >= 5", status=400)
+            if not (0.5 <= ui_ak <= 5.0):
+                return Response("ATR k must be in [0.5, 5.0]", status=400)
+            if not (0.0 <= ui_av <= 0.2):
+                return Response("Vol min ATR pct must be in [0.0, 0.2]", status=400)
+            run_params = {"ema_fast": ui_ef, "ema_slow": ui_es, "atr_window": ui_aw, "atr_k": ui_ak, "vol_filter_min_atr_pct": ui_av}
+            snap_params = {"ema_fast": ui_ef, "ema_slow": ui_es, "atr_window": ui_aw, "atr_k": ui_ak, "atr_min_pct": ui_av}
+        else:
+            # Config params the strategy declares, then filled-in UI params it declares
+            try:
+                run_params = strat.resolve({**params, **_given(p)})
+            except (TypeError, ValueError) as e:
+                return Response(f"invalid params for {strat.name}: {e}", status=400)
+            if not strat.valid(run_params):
+                return Response(f"invalid params for {strat.name}: {run_params}", status=400)
+            snap_params = run_params
         ai_callable = payload.get("ai_callable")
         if ai_callable and ("ai_gemini" in str(ai_callable)) and not ONLINE_ALLOWED:
             ai_callable = None
         if ai_callable:
             th = float(payload.get("ai_threshold", 0.5))
-            sig = generate_signals_from_callable(df, callable_path=str(ai_callable), threshold=th)
+            sig = generate_signals_from_callable(_load_frame(str(csv_path), **frame).copy(), callable_path=str(ai_callable), threshold=th,
+                                                 cache_dir=AI_SCORE_DIR)
         else:
-            sig = generate_signals(
-                df,
-                ema_fast=ui_ef,
-                ema_slow=ui_es,
-                atr_window=ui_aw,
-                vol_filter_min_atr_pct=ui_av,
-            )
+            sig = _signals(str(csv_path), strategy=strat_name, **strat.signal_params(run_params), **frame)
         res = run_backtest(
             sig,
-            start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-            atr_k_stop=ui_ak,
-            slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-            fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-            per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-            daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+            atr_k_stop=float(run_params["atr_k"]),
+            **engine_kwargs(cfg),
         )
 
         pnl = res.get("pnl_series")
         start_cash = float(res.get("start_cash", 0.0))
         end_cash = float(res.get("end_cash", 0.0))
 
-        # Build equity curve for chart
-        equity_points = []
-        if pnl is not None:
-            csum = pnl.fillna(0.0).cumsum()
-            equity = start_cash + csum
-            for ts, v in equity.items():
-                t = ts.isoformat()
-                equity_points.append({"t": t, "v": float(v)})
+        # Equity curve for chart (columnar, downsampled server-side)
+        equity_points = _equity_payload(pnl, start_cash, payload)
 
         summary = metrics_from_pnl(pnl, start_cash, end_cash) if pnl is not None else {}
 
         # Build trades table (latest 20) and store all for export
-        trades = []
-        all_trades = []
-        for t in res.get("trades", []):
-            try:
-                entry_time = t.entry_time.isoformat() if hasattr(t, "entry_time") else None
-                exit_time = t.exit_time.isoformat() if getattr(t, "exit_time", None) is not None else None
-                entry = float(getattr(t, "entry", None)) if getattr(t, "entry", None) is not None else None
-                exit_px = float(getattr(t, "exit", None)) if getattr(t, "exit", None) is not None else None
-                size = float(getattr(t, "size", None)) if getattr(t, "size", None) is not None else None
-                pnl = None
-                if entry is not None and exit_px is not None and size is not None:
-                    pnl = (exit_px - entry) * size
-                # extra columns
-                hold_min = None
-                try:
-                    if entry_time and exit_time:
-                        import pandas as _pd
-                        et = _pd.to_datetime(entry_time, utc=True)
-                        xt = _pd.to_datetime(exit_time, utc=True)
-                        hold_min = float((xt - et).total_seconds() / 60.0)
-                except Exception:
-                    hold_min = None
-                ret_pct = None
-                if entry is not None and exit_px is not None and size is not None and entry != 0:
-                    try:
-                        ret_pct = float((exit_px - entry) / entry)
-                    except Exception:
-                        ret_pct = None
-                row = {
-                    "entry_time": entry_time,
-                    "exit_time": exit_time,
-                    "entry": entry,
-                    "exit": exit_px,
-                    "size": size,
-                    "pnl": pnl,
-                    "hold_min": hold_min,
-                    "ret_pct": ret_pct,
-                }
-                all_trades.append(row)
-            except Exception:
-                continue
+        all_trades = trades_records(trades_frame(res.get("trades", [])), columns=TRADE_TABLE_COLUMNS)
         trades = all_trades[-20:]
 
         # Save last trades for export
-        global _LAST_TRADES
-        _LAST_TRADES = all_trades
+        _sessions().save_artifact(_sid(), "trades", all_trades)
 
         # Save snapshot (inputs + summary)
         try:
@@ -745,7 +1033,8 @@ def api_backtest():
                     "pair": pair,
                     "start": start,
                     "end": end,
-                    "params": {"ema_fast": ui_ef, "ema_slow": ui_es, "atr_window": ui_aw, "atr_k": ui_ak, "atr_min_pct": ui_av},
+                    "strategy": strat_name,
+                    "params": snap_params,
                     "ai_callable": ai_callable,
                     "max_bars": max_bars,
                 },
@@ -789,46 +1078,51 @@ def api_walkforward():
         aw = _parse_list(payload.get("aw", "10,14,20"), int)
         ak = _parse_list(payload.get("ak", "1.5,2.0,2.5"), float)
         av = _parse_list(payload.get("av", "0.0,0.01,0.02"), float)
-
-        cfg = load_config(str(DEFAULT_CONFIG))
-        df = load_ohlcv_csv(str(csv_path), column_map=colmap)
-        if start:
-            df = df[df.index >= pd.to_datetime(start, utc=True)]
-        if end:
-            df = df[df.index <= pd.to_datetime(end, utc=True)]
+        strat_name, strat = _strategy(payload.get("strategy"), _config())
+        # ef/es/aw/ak/av apply where the strategy declares them; "grid" ({name: "v1,v2"}) sets any parameter
+        grid = strat.default_grid()
+        legacy = {"ema_fast": ef, "ema_slow": es, "atr_window": aw, "atr_k": ak, "vol_filter_min_atr_pct": av}
+        grid.update({k: v for k, v in legacy.items() if k in grid})
+        extra = payload.get("grid") if isinstance(payload.get("grid"), dict) else {}
+        grid.update({k: _parse_list(v, str) for k, v in extra.items() if k in grid})
 
         train_bars = int(payload.get("train_bars", 2000))
         test_bars = int(payload.get("test_bars", 500))
         step_bars = int(payload.get("step_bars", 0))
         step = step_bars if step_bars > 0 else None
         ppyear = int(payload.get("ppyear", 6048))
+    except Exception as e:
+        return Response(str(e), status=400)
+
+    sid = _sid()
+
+    def run(ctx: JobContext | None) -> Dict[str, Any]:
+        cfg = _config()
+        df = _load_frame(str(csv_path), colmap, start, end)
 
         result = walk_forward(
             df,
             train_bars=train_bars,
             test_bars=test_bars,
             step_bars=step,
-            ema_fast_list=ef,
-            ema_slow_list=es,
-            atr_window_list=aw,
-            atr_k_list=ak,
-            vol_filter_min_atr_pct_list=av,
-            start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-            slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-            fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-            per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-            daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+            strategy=strat,
+            grid=grid,
+            **engine_kwargs(cfg),
             periods_per_year=ppyear,
+            progress=ctx.progress if ctx is not None else None,
         )
 
-        # Save folds for export
-        global _LAST_WF_FOLDS
-        _LAST_WF_FOLDS = result.get('folds', [])
+        # Save folds for export (session captured at submit time; jobs run outside the request)
+        folds = result.get('folds', [])
+        _sessions().save_artifact(sid, "wf_folds", folds)
 
-        return jsonify({
+        return {
             "summary": result.get("summary", {}),
-            "folds": _LAST_WF_FOLDS,
-        })
+            "folds": folds,
+        }
+
+    try:
+        return _submit_or_run("walkforward", run, payload, payload)
     except Exception as e:
         return Response(str(e), status=500)
 
@@ -836,29 +1130,27 @@ def api_walkforward():
 @app.get("/api/export/wf")
 def api_export_wf():
     try:
-        if not _LAST_WF_FOLDS:
+        folds = _sessions().load_artifact(_sid(), "wf_folds")
+        if not folds:
             return Response("no folds", status=404)
         import io, csv
         buf = io.StringIO()
-        # Flatten params + metrics
+        # Flatten params (the strategy's, in declaration order) + metrics
+        param_names = list(dict.fromkeys(k for f in folds for k in f.get("params", {})))
         fieldnames = [
             "train_start","train_end","test_start","test_end",
-            "ema_fast","ema_slow","atr_window","atr_k","vol_filter_min_atr_pct",
+            *param_names,
             "total_return","sharpe_approx","max_drawdown","num_trades","win_rate","avg_trade","profit_factor",
         ]
         w = csv.DictWriter(buf, fieldnames=fieldnames)
         w.writeheader()
-        for f in _LAST_WF_FOLDS:
+        for f in folds:
             row = {
                 "train_start": f.get("train_start"),
                 "train_end": f.get("train_end"),
                 "test_start": f.get("test_start"),
                 "test_end": f.get("test_end"),
-                "ema_fast": f.get("params",{}).get("ema_fast"),
-                "ema_slow": f.get("params",{}).get("ema_slow"),
-                "atr_window": f.get("params",{}).get("atr_window"),
-                "atr_k": f.get("params",{}).get("atr_k"),
-                "vol_filter_min_atr_pct": f.get("params",{}).get("vol_filter_min_atr_pct"),
+                **{k: f.get("params",{}).get(k) for k in param_names},
             }
             m = f.get("metrics", {})
             row.update({
@@ -903,15 +1195,10 @@ def api_post_prefs():
 @app.get("/api/export/trades")
 def api_export_trades():
     try:
-        if not _LAST_TRADES:
+        trades = _sessions().load_artifact(_sid(), "trades")
+        if not trades:
             return Response("no trades", status=404)
-        import io, csv
-        buf = io.StringIO()
-        w = csv.DictWriter(buf, fieldnames=["entry_time","exit_time","entry","exit","size","pnl"])
-        w.writeheader()
-        for r in _LAST_TRADES:
-            w.writerow(r)
-        data = buf.getvalue()
+        data = pd.DataFrame(trades, columns=list(TRADE_TABLE_COLUMNS)).to_csv(index=False)
         return Response(
             data,
             mimetype="text/csv",
@@ -921,96 +1208,6 @@ def api_export_trades():
         return Response(str(e), status=500)
 
 # -------- Paper trading (step-by-step) --------
-class PaperEngine:
-    def __init__(self, sig_df: pd.DataFrame, *, start_cash: float, atr_k_stop: float, slippage_pct: float, fee_perc_roundturn: float, per_trade_risk_pct: float, daily_loss_stop_pct: float | None):
-        self.df = sig_df.copy()
-        self.idx = list(sig_df.index)
-        self.ptr = 0
-        self.start_cash = float(start_cash)
-        self.cash = float(start_cash)
-        self.equity = float(start_cash)
-        self.position = 0.0
-        self.entry_price = None
-        self.atr_stop = None
-        self.atr_k_stop = float(atr_k_stop)
-        self.slippage_pct = float(slippage_pct)
-        self.fee_perc_roundturn = float(fee_perc_roundturn)
-        self.per_trade_risk_pct = float(per_trade_risk_pct)
-        self.daily_loss_stop_pct = float(daily_loss_stop_pct) if daily_loss_stop_pct is not None else None
-        self.pnl_series = pd.Series(0.0, index=self.df.index)
-        self.day_realized = {}
-
-    def step_one(self) -> bool:
-        if self.ptr >= len(self.idx):
-            return False
-        ts = self.idx[self.ptr]
-        row = self.df.loc[ts]
-        price = float(row["close"])
-        sig = int(row.get("signal", 0))
-        a = float(row.get("atr", 0.0)) if pd.notna(row.get("atr", float("nan"))) else 0.0
-
-        # Exit
-        if self.position > 0:
-            stop_px = self.atr_stop if self.atr_stop is not None else -1e18
-            exit_now = (sig == 0) or (price <= stop_px)
-            if exit_now:
-                px = price * (1.0 - self.slippage_pct)
-                gross = (px - float(self.entry_price)) * self.position
-                fee = abs(px * self.position) * self.fee_perc_roundturn
-                trade_pnl = gross - fee
-                self.cash += trade_pnl
-                self.equity = self.cash
-                self.position = 0.0
-                self.entry_price = None
-                self.atr_stop = None
-                self.pnl_series.loc[ts] = trade_pnl
-                d = ts.tz_convert("UTC").date() if hasattr(ts, "tzinfo") and ts.tzinfo else ts.date()
-                self.day_realized[d] = self.day_realized.get(d, 0.0) + float(trade_pnl)
-
-        # Entry
-        if self.position == 0 and sig == 1 and a > 0:
-            if self.daily_loss_stop_pct is not None:
-                d = ts.tz_convert("UTC").date() if hasattr(ts, "tzinfo") and ts.tzinfo else ts.date()
-                realized_today = self.day_realized.get(d, 0.0)
-                if realized_today <= -(self.start_cash * (self.daily_loss_stop_pct / 100.0)):
-                    self.ptr += 1
-                    return True
-            units = position_size_from_atr(
-                entry_price=price,
-                atr_value=a,
-                atr_k_stop=self.atr_k_stop,
-                equity=self.equity,
-                per_trade_risk_pct=self.per_trade_risk_pct,
-            )
-            if units > 0:
-                px = price * (1.0 + self.slippage_pct)
-                fee = abs(px * units) * (self.fee_perc_roundturn / 2.0)
-                self.entry_price = px
-                self.atr_stop = self.entry_price - self.atr_k_stop * a
-                self.position = units
-                self.cash -= fee
-                self.equity = self.cash
-
-        self.ptr += 1
-        return True
-
-    def status(self) -> dict:
-        last_ts = self.idx[self.ptr - 1] if self.ptr > 0 and self.ptr <= len(self.idx) else None
-        start_cash = float(self.start_cash)
-        end_cash = float(self.cash)
-        summary = metrics_from_pnl(self.pnl_series.iloc[: self.ptr], start_cash, end_cash) if self.ptr > 0 else {}
-        return {
-            "ptr": self.ptr,
-            "total": len(self.idx),
-            "last_ts": last_ts.isoformat() if last_ts is not None else None,
-            "position": float(self.position),
-            "entry_price": float(self.entry_price) if self.entry_price is not None else None,
-            "equity": float(self.equity),
-            "summary": summary,
-        }
-
-
-_ENGINE: PaperEngine | None = None
 
 
 @app.post("/api/paper/config")
@@ -1021,32 +1218,27 @@ def api_paper_config():
         if not csv_path:
             return Response("csv is required", status=400)
         colmap = payload.get("columns") if isinstance(payload.get("columns"), dict) else None
-        cfg = load_config(str(DEFAULT_CONFIG))
-        df = load_ohlcv_csv(str(csv_path), column_map=colmap)
-        params = cfg.strategy_params
-        ai_callable = payload.get("ai_callable")
-        if ai_callable:
-            th = float(payload.get("ai_threshold", 0.5))
-            sig = generate_signals_from_callable(df, callable_path=str(ai_callable), threshold=th)
-        else:
-            sig = generate_signals(
-                df,
-                ema_fast=int(params.get("ema_fast", 20)),
-                ema_slow=int(params.get("ema_slow", 60)),
-                atr_window=int(params.get("atr_window", 14)),
-                vol_filter_min_atr_pct=float(params.get("vol_filter_min_atr_pct", 0.0)),
-            )
-        global _ENGINE
-        _ENGINE = PaperEngine(
-            sig,
-            start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-            atr_k_stop=float(params.get("atr_k_stop", 2.0)),
-            slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-            fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-            per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-            daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
-        )
-        return jsonify({"ok": True})
+        cfg = _config()
+        try:
+            strat_name, strat = _strategy(payload.get("strategy"), cfg)
+        except ValueError as e:
+            return Response(str(e), status=400)
+        params = strat.resolve(cfg.strategy_params)
+        # Everything needed to rebuild the engine in another worker / after a restart
+        spec = {
+            "csv": str(csv_path),
+            "columns": colmap,
+            "ai_callable": payload.get("ai_callable") or None,
+            "ai_threshold": float(payload.get("ai_threshold", 0.5)),
+            "strategy_name": strat_name,
+            "strategy": strat.signal_params(params),
+            "engine": {
+                "atr_k_stop": params["atr_k"],
+                **engine_kwargs(cfg),
+            },
+        }
+        _sessions().create(_sid(), spec)
+        return jsonify({"ok": True, "session_id": _sid()})
     except Exception as e:
         return Response(str(e), status=500)
 
@@ -1054,10 +1246,16 @@ def api_paper_config():
 @app.post("/api/paper/step")
 def api_paper_step():
     try:
-        global _ENGINE
-        if _ENGINE is None:
-            return Response("engine not initialized", status=400)
-        cont = _ENGINE.step_one()
+        payload = request.get_json(silent=True) or {}
+        n = max(1, min(int(payload.get("n", 1)), 100_000))
+        with _sessions().session(_sid()) as engine:
+            if engine is None:
+                return Response("engine not initialized", status=400)
+            cont = True
+            for _ in range(n):
+                cont = engine.step_one()
+                if not cont:
+                    break
         return jsonify({"ok": True, "cont": cont})
     except Exception as e:
         return Response(str(e), status=500)
@@ -1066,22 +1264,68 @@ def api_paper_step():
 @app.get("/api/paper/status")
 def api_paper_status():
     try:
-        global _ENGINE
-        if _ENGINE is None:
-            return jsonify({"ptr": 0, "total": 0, "position": 0.0, "entry_price": None, "equity": None, "summary": {}})
-        return jsonify(_ENGINE.status())
+        with _sessions().session(_sid(), write=False) as engine:
+            if engine is None:
+                return jsonify({"ptr": 0, "total": 0, "position": 0.0, "entry_price": None, "equity": None, "summary": {}})
+            return jsonify(engine.status())
     except Exception as e:
         return Response(str(e), status=500)
-def main():
-    # Flask dev server
-    port = int(os.environ.get("PORT", "7860"))
-    app.run(host="0.0.0.0", port=port, debug=True)
 
 
-if __name__ == "__main__":
-    # Lazy import to avoid top import cost for pandas in route registration
-    import pandas as pd  # noqa: F401
-    main()
+@app.get("/api/paper/stream")
+def api_paper_stream():
+    """
+    Replay the session's paper engine server-side and push incremental updates (SSE).
+    speed: bars per second (0 = as fast as possible); batch: bars per event
+    (default ~10 events/s); max_bars: stop after this many bars (0 = to the end).
+    """
+    sid = _sid()
+    try:
+        speed = max(0.0, float(request.args.get("speed", 10)))
+        batch = int(request.args.get("batch", 0)) or (max(1, int(speed // 10)) if speed > 0 else 500)
+        max_bars = max(0, int(request.args.get("max_bars", 0)))
+    except ValueError as e:
+        return Response(str(e), status=400)
+    with _sessions().session(sid, write=False) as engine:
+        if engine is None:
+            return Response("engine not initialized", status=400)
+
+    def gen():
+        sent = 0
+        next_t = time.monotonic()
+        while True:
+            # Lock per batch only, so status/step requests interleave with the stream
+            with _sessions().session(sid) as engine:
+                if engine is None:
+                    yield _sse("error", {"error": "session dropped"})
+                    return
+                upd = engine.step_many(min(batch, max_bars - sent) if max_bars else batch)
+                sent += len(upd["t"])
+                finished = upd["done"] or not upd["t"] or (max_bars and sent >= max_bars)
+                if finished:
+                    upd["summary"] = engine.status()["summary"]
+            yield _sse("update", upd)
+            if finished:
+                yield _sse("done", {"ptr": upd["ptr"], "total": upd["total"], "bars": sent})
+                return
+            if speed > 0:
+                next_t += len(upd["t"]) / speed
+                delay = next_t - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    return _sse_response(gen())
+
+
+@app.delete("/api/paper/session")
+def api_paper_drop():
+    _sessions().drop(_sid())
+    return jsonify({"ok": True})
+
+
+@app.get("/api/paper/sessions")
+def api_paper_sessions():
+    return jsonify({"pid": os.getpid(), **_sessions().stats()})
 # Snapshot list and rerun
 @app.get("/api/snapshots")
 def api_snapshots():
@@ -1121,43 +1365,39 @@ def api_snapshots_run():
         start = inp.get("start")
         end = inp.get("end")
         params = inp.get("params") or {}
+        strat_name = inp.get("strategy") or "momo_atr"  # older snapshots predate the registry
         ai_callable = inp.get("ai_callable")
+        opts = {k: payload[k] for k in ("equity_format", "max_points", "downsample", "encoding") if k in payload}
+    except Exception as e:
+        return Response(str(e), status=500)
 
-        cfg = load_config(str(DEFAULT_CONFIG))
-        df = load_ohlcv_csv(str(csv_path))
-        if start:
-            df = df[df.index >= pd.to_datetime(start, utc=True)]
-        if end:
-            df = df[df.index <= pd.to_datetime(end, utc=True)]
-
-        ef = int(params.get("ema_fast", 20)); es = int(params.get("ema_slow", 60)); aw = int(params.get("atr_window", 14))
-        ak = float(params.get("atr_k", params.get("atr_k_stop", 2.0)))
-        av = float(params.get("atr_min_pct", params.get("vol_filter_min_atr_pct", 0.0)))
-        if ai_callable and ("ai_gemini" in str(ai_callable)) and not ONLINE_ALLOWED:
-            ai_callable = None
-        if ai_callable:
-            sig = generate_signals_from_callable(df, callable_path=str(ai_callable), threshold=0.5)
+    def run(ctx: JobContext | None) -> Dict[str, Any]:
+        cfg = _config()
+        name, strat = _strategy(strat_name, cfg)
+        run_params = strat.resolve(params)  # aliases cover atr_k_stop / atr_min_pct
+        ai_path = ai_callable
+        if ai_path and ("ai_gemini" in str(ai_path)) and not ONLINE_ALLOWED:
+            ai_path = None
+        if ai_path:
+            sig = generate_signals_from_callable(_load_frame(str(csv_path), None, start, end).copy(), callable_path=str(ai_path), threshold=0.5,
+                                                 cache_dir=AI_SCORE_DIR)
         else:
-            sig = generate_signals(df, ema_fast=ef, ema_slow=es, atr_window=aw, vol_filter_min_atr_pct=av)
+            sig = _signals(str(csv_path), strategy=name, start=start, end=end, **strat.signal_params(run_params))
 
         res = run_backtest(
             sig,
-            start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-            atr_k_stop=ak,
-            slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-            fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-            per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-            daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+            atr_k_stop=run_params["atr_k"],
+            **engine_kwargs(cfg),
         )
         pnl = res.get("pnl_series")
         start_cash = float(res.get("start_cash", 0.0))
         end_cash = float(res.get("end_cash", 0.0))
-        equity_points = []
-        if pnl is not None:
-            csum = pnl.fillna(0.0).cumsum(); equity = start_cash + csum
-            for ts, v in equity.items(): equity_points.append({"t": ts.isoformat(), "v": float(v)})
+        equity_points = _equity_payload(pnl, start_cash, opts)
         summary = metrics_from_pnl(pnl, start_cash, end_cash) if pnl is not None else {}
-        return jsonify({"summary": summary, "equity": equity_points})
+        return {"summary": summary, "equity": equity_points}
+
+    try:
+        return _submit_or_run("snapshot", run, {"name": name}, payload)
     except Exception as e:
         return Response(str(e), status=500)
 
@@ -1173,34 +1413,111 @@ def api_batch():
         start = payload.get("start"); end = payload.get("end")
         colmap = payload.get("columns") if isinstance(payload.get("columns"), dict) else None
         p = payload.get("params") or {}
-        cfg = load_config(str(DEFAULT_CONFIG))
+        strat_name, strat = _strategy(payload.get("strategy"), _config())
+    except ValueError as e:
+        return Response(str(e), status=400)
+    except Exception as e:
+        return Response(str(e), status=500)
+
+    def run(ctx: JobContext | None) -> Dict[str, Any]:
+        cfg = _config()
         results = []
-        for path in csvs:
+        for k, path in enumerate(csvs):
+            if ctx is not None:
+                ctx.progress(k, len(csvs), message=str(path))
             try:
                 if not Path(path).exists():
                     results.append({"name": path, "error": "not found"}); continue
-                df = load_ohlcv_csv(str(path), column_map=colmap)
-                if start: df = df[df.index >= pd.to_datetime(start, utc=True)]
-                if end: df = df[df.index <= pd.to_datetime(end, utc=True)]
-                ef = int(p.get("ema_fast", 20)); es = int(p.get("ema_slow", 60)); aw = int(p.get("atr_window", 14))
-                ak = float(p.get("atr_k", 2.0)); av = float(p.get("atr_min_pct", 0.0))
-                sig = generate_signals(df, ema_fast=ef, ema_slow=es, atr_window=aw, vol_filter_min_atr_pct=av)
+                bp = strat.resolve(p)
+                sig = _signals(str(path), strategy=strat_name, column_map=colmap, start=start, end=end,
+                               **strat.signal_params(bp))
                 res = run_backtest(
                     sig,
-                    start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-                    atr_k_stop=ak,
-                    slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-                    fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-                    per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-                    daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+                    atr_k_stop=bp["atr_k"],
+                    **engine_kwargs(cfg),
                 )
                 pnl = res.get("pnl_series"); summ = metrics_from_pnl(pnl, res["start_cash"], res["end_cash"]) if pnl is not None else {}
                 pair = Path(path).stem
                 results.append({"name": path, "pair": pair, "summary": summ})
             except Exception as e:
                 results.append({"name": path, "error": str(e)})
+        if ctx is not None:
+            ctx.progress(len(csvs), len(csvs))
         # sort by sharpe desc
         results.sort(key=lambda x: (x.get("summary",{}).get("sharpe_approx", -1e9)), reverse=True)
-        return jsonify({"results": results})
+        return {"results": results}
+
+    try:
+        return _submit_or_run("batch", run, {"csvs": csvs}, payload)
     except Exception as e:
         return Response(str(e), status=500)
+
+
+# -------- Background jobs --------
+@app.get("/api/jobs")
+def api_jobs():
+    try:
+        limit = int(request.args.get("limit", 50))
+        return jsonify({"jobs": _jobs().list(limit=limit, kind=request.args.get("kind"), status=request.args.get("status"))})
+    except Exception as e:
+        return Response(str(e), status=500)
+
+
+@app.get("/api/jobs/<job_id>")
+def api_job(job_id: str):
+    job = _jobs().get(job_id)
+    if job is None:
+        return Response("job not found", status=404)
+    return jsonify(job)
+
+
+@app.get("/api/jobs/<job_id>/stream")
+def api_job_stream(job_id: str):
+    """Push job status/progress as SSE until it finishes; the final 'done' event carries the result."""
+    jobs = _jobs()
+    if jobs.get(job_id, with_result=False) is None:
+        return Response("job not found", status=404)
+    interval = min(max(float(request.args.get("interval", 0.5)), 0.1), 10.0)
+
+    def gen():
+        last = None
+        last_sent = time.monotonic()
+        while True:
+            job = jobs.get(job_id, with_result=False)
+            if job is None:
+                yield _sse("error", {"error": "job not found"})
+                return
+            if job["status"] in FINISHED:
+                yield _sse("done", jobs.get(job_id))
+                return
+            snap = (job["status"], job["progress"]["done"], job["message"])
+            now = time.monotonic()
+            if snap != last:
+                yield _sse("progress", job)
+                last, last_sent = snap, now
+            elif now - last_sent >= 15.0:
+                yield ": keepalive\n\n"
+                last_sent = now
+            time.sleep(interval)
+
+    return _sse_response(gen())
+
+
+@app.post("/api/jobs/<job_id>/cancel")
+@app.delete("/api/jobs/<job_id>")
+def api_job_cancel(job_id: str):
+    jobs = _jobs()
+    if jobs.get(job_id, with_result=False) is None:
+        return Response("job not found", status=404)
+    ok = jobs.cancel(job_id)
+    return jsonify({"ok": ok, "job": jobs.get(job_id, with_result=False)})
+
+
+def main():
+    # Flask dev server (single process). For concurrent users: python -m fxbot.cli serve
+    port = int(os.environ.get("PORT", "7860"))
+    app.run(host="0.0.0.0", port=port, debug=True)
+
+
+if __name__ == "__main__":
+    main()
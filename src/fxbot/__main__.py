@@ -0,0 +1,4 @@
+from .cli import main
+
+# `python -m fxbot ...` is the same as `python -m fxbot.cli ...`
+main()
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import csv
+import pathlib
 from dataclasses import dataclass
-from typing import Dict, Any, List
+from typing import Any, Callable, Dict, Iterable, List, Protocol
 
 import numpy as np
 import pandas as pd
 
-from .risk import position_size_from_atr
+from .profiling import count, profiled, stage
+from .engine import EngineParams, EngineState, Fill, close_out, run_bars
+from .report import PnlAccumulator
+from .risk import trading_day_ids
 
 
 @dataclass
@@ -19,6 +24,52 @@ class Trade:
     atr_stop: float
 
 
+def kernel_inputs(df: pd.DataFrame, entry_allowed_mask: pd.Series | None, daily_loss_stop_pct: float | None,
+                  day_rollover: str | int | None = "00:00", day_rollover_tz: str | None = "UTC",
+                  stop_model: str = "close") -> Dict[str, Any]:
+    """engine.run_bars inputs for a signal frame (plain lists; None where unused)."""
+    n = len(df)
+    signal = df["signal"].astype(int).tolist() if "signal" in df.columns else [0] * n
+    atr = df["atr"].astype(float).tolist() if "atr" in df.columns else [np.nan] * n
+    allow = None
+    if entry_allowed_mask is not None:
+        allow = entry_allowed_mask.reindex(df.index).fillna(True).astype(bool).tolist()
+    day = None
+    if daily_loss_stop_pct is not None:
+        day = trading_day_ids(df.index, rollover=day_rollover, tz=day_rollover_tz).tolist()
+    bars = {}
+    if stop_model == "intrabar":
+        missing = [c for c in ("open", "high", "low") if c not in df.columns]
+        if missing:
+            raise ValueError(f"stop_model='intrabar' needs columns: {missing}")
+        bars = {"open_": df["open"].astype(float).tolist(), "high": df["high"].astype(float).tolist(), "low": df["low"].astype(float).tolist()}
+    return {
+        "close": df["close"].astype(float).tolist(),
+        "signal": signal,
+        "atr": atr,
+        "allow": allow,
+        "day": day,
+        **bars,
+    }
+
+
+def _apply_fills(fills: List[Fill], index: pd.Index, open_trade: Trade | None) -> tuple[List[Trade], List[Trade], Trade | None]:
+    """Turn kernel fills into Trade records: (opened, closed, still-open trade)."""
+    opened: List[Trade] = []
+    closed: List[Trade] = []
+    for f in fills:
+        if f.side == "entry":
+            open_trade = Trade(entry_time=index[f.i], exit_time=None, entry=f.price, exit=None, size=f.size, atr_stop=f.atr_stop)
+            opened.append(open_trade)
+        elif open_trade is not None:
+            open_trade.exit_time = index[f.i]
+            open_trade.exit = f.price
+            closed.append(open_trade)
+            open_trade = None
+    return opened, closed, open_trade
+
+
+@profiled("backtest")
 def run_backtest(
     df_sig: pd.DataFrame,
     *,
@@ -29,100 +80,263 @@ def run_backtest(
     per_trade_risk_pct: float = 0.25,
     daily_loss_stop_pct: float | None = None,
     entry_allowed_mask: pd.Series | None = None,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
 ) -> Dict[str, Any]:
     """
     Long-only, flat/long switching. ATR stop. One position at a time.
     df_sig: DataFrame with columns [open, high, low, close, atr, signal]
+    The daily loss stop resets at 'day_rollover' local time in 'day_rollover_tz'.
+    stop_model="intrabar" checks the stop (and optional take_profit_k * ATR target)
+    against bar low/high and fills at the level, or at the open on a gap;
+    intrabar_path ("worst" | "best" | "ohlc") orders stop vs target within a bar.
     """
-    df = df_sig.copy()
-    cash = start_cash
-    equity = start_cash
-    position = 0.0
-    entry_price = 0.0
-    atr_stop = np.nan
-    trades: List[Trade] = []
-    pnl_series = pd.Series(0.0, index=df.index)
-    # Track realized PnL per day for daily stop
-    day_realized = {}
-
-    for ts, row in df.iterrows():
-        price = row["close"]
-        sig = int(row.get("signal", 0))
-        a = float(row.get("atr", np.nan))
-
-        # Exit logic: if in position and signal drops or ATR stop hit
-        if position > 0:
-            stop_price = atr_stop
-            # Stop-out on intrabar breach (approx by close below stop)
-            exit_now = (sig == 0) or (price <= stop_price)
-            if exit_now:
-                # Apply slippage & fees
-                px = price * (1.0 - slippage_pct)
-                gross = (px - entry_price) * position
-                fee = abs(px * position) * fee_perc_roundturn
-                trade_pnl = gross - fee
-                cash += trade_pnl
-                equity = cash
-                trades[-1].exit_time = ts
-                trades[-1].exit = px
-                position = 0.0
-                entry_price = 0.0
-                atr_stop = np.nan
-                pnl_series.loc[ts] = trade_pnl
-                # Accumulate daily realized PnL
-                d = ts.tz_convert("UTC").date() if hasattr(ts, "tzinfo") and ts.tzinfo else ts.date()
-                day_realized[d] = day_realized.get(d, 0.0) + float(trade_pnl)
-
-        # Entry logic: if flat and signal is long
-        if position == 0 and sig == 1 and np.isfinite(a) and a > 0:
-            # Blackout window for entries
-            if entry_allowed_mask is not None:
-                allow = bool(entry_allowed_mask.get(ts, True))
-                if not allow:
-                    continue
-            # Enforce daily loss stop: if reached threshold today, skip new entries
-            if daily_loss_stop_pct is not None:
-                d = ts.tz_convert("UTC").date() if hasattr(ts, "tzinfo") and ts.tzinfo else ts.date()
-                realized_today = day_realized.get(d, 0.0)
-                if realized_today <= -(start_cash * (daily_loss_stop_pct / 100.0)):
-                    continue
-            # size determined by ATR risk
-            units = position_size_from_atr(
-                entry_price=price,
-                atr_value=a,
-                atr_k_stop=atr_k_stop,
-                equity=equity,
-                per_trade_risk_pct=per_trade_risk_pct,
-            )
-            if units > 0:
-                px = price * (1.0 + slippage_pct)
-                fee = abs(px * units) * (fee_perc_roundturn / 2.0)
-                # For FX, using units ~ notional JPY. Simplified cash handling.
-                entry_price = px
-                atr_stop = entry_price - atr_k_stop * a
-                position = units
-                trades.append(Trade(entry_time=ts, exit_time=None, entry=px, exit=None, size=units, atr_stop=atr_stop))
-                cash -= fee
-                equity = cash
+    params = EngineParams(
+        start_cash=start_cash,
+        atr_k_stop=atr_k_stop,
+        slippage_pct=slippage_pct,
+        fee_perc_roundturn=fee_perc_roundturn,
+        per_trade_risk_pct=per_trade_risk_pct,
+        daily_loss_stop_pct=daily_loss_stop_pct,
+        stop_model=stop_model,
+        intrabar_path=intrabar_path,
+        take_profit_k=take_profit_k,
+    )
+    state = EngineState.initial(start_cash)
+    count("backtest.bars", len(df_sig))
+    with stage("backtest.prepare"):
+        inputs = kernel_inputs(df_sig, entry_allowed_mask, daily_loss_stop_pct, day_rollover, day_rollover_tz, stop_model)
+    with stage("backtest.kernel"):
+        pnl, fills = run_bars(state, params, **inputs)
+    trades, _, open_trade = _apply_fills(fills, df_sig.index, None)
 
     # Close any open position at last price
-    if position > 0:
-        last_ts = df.index[-1]
-        price = df["close"].iloc[-1]
-        px = price * (1.0 - slippage_pct)
-        gross = (px - entry_price) * position
-        fee = abs(px * position) * (fee_perc_roundturn / 2.0)
-        trade_pnl = gross - fee
-        cash += trade_pnl
-        equity = cash
-        trades[-1].exit_time = last_ts
-        trades[-1].exit = px
-        pnl_series.loc[last_ts] = trade_pnl
+    last = close_out(state, params, float(df_sig["close"].iloc[-1])) if len(df_sig) else None
+    if last is not None and open_trade is not None:
+        open_trade.exit_time = df_sig.index[-1]
+        open_trade.exit = last.price
+        pnl[-1] = last.pnl
 
     result = {
         "start_cash": start_cash,
-        "end_cash": cash,
+        "end_cash": state.cash,
         "trades": trades,
-        "pnl_series": pnl_series,
+        "pnl_series": pd.Series(pnl, index=df_sig.index, dtype=float),
     }
     return result
+
+
+@profiled("backtest.matrix")
+def run_backtest_matrix(
+    df: pd.DataFrame,
+    signals: np.ndarray,
+    *,
+    atr_k_list: List[float],
+    start_cash: float,
+    slippage_pct: float = 0.0,
+    fee_perc_roundturn: float = 0.0,
+    per_trade_risk_pct: float = 0.25,
+    daily_loss_stop_pct: float | None = None,
+    entry_allowed_mask: pd.Series | None = None,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    run_backtest for every column of a (bars x k) 0/1 signal matrix and every ATR k.
+    result[j][m] is column j with atr_k_list[m]: {"start_cash", "end_cash", "pnl_series"}
+    (no trade records). df supplies close/atr (and open/high/low for intrabar stops);
+    kernel inputs are prepared once and identical signal columns are run once.
+    """
+    signals = np.asarray(signals)
+    if signals.ndim != 2 or signals.shape[0] != len(df):
+        raise ValueError(f"signals must be (bars x k) with {len(df)} rows, got {signals.shape}")
+    with stage("backtest.prepare"):
+        inputs = kernel_inputs(df.drop(columns="signal", errors="ignore"), entry_allowed_mask, daily_loss_stop_pct,
+                               day_rollover, day_rollover_tz, stop_model)
+    last_close = float(df["close"].iloc[-1]) if len(df) else None
+    runs: Dict[tuple, Dict[str, Any]] = {}
+    out: List[List[Dict[str, Any]]] = []
+    for j in range(signals.shape[1]):
+        col = signals[:, j].astype(np.int8)
+        col_key = col.tobytes()
+        inputs["signal"] = None
+        row = []
+        for ak in atr_k_list:
+            key = (col_key, float(ak))
+            if key not in runs:
+                if inputs["signal"] is None:
+                    inputs["signal"] = col.tolist()
+                params = EngineParams(
+                    start_cash=start_cash,
+                    atr_k_stop=float(ak),
+                    slippage_pct=slippage_pct,
+                    fee_perc_roundturn=fee_perc_roundturn,
+                    per_trade_risk_pct=per_trade_risk_pct,
+                    daily_loss_stop_pct=daily_loss_stop_pct,
+                    stop_model=stop_model,
+                    intrabar_path=intrabar_path,
+                    take_profit_k=take_profit_k,
+                )
+                state = EngineState.initial(start_cash)
+                count("backtest.bars", len(df))
+                with stage("backtest.kernel"):
+                    pnl, _ = run_bars(state, params, **inputs)
+                last = close_out(state, params, last_close) if last_close is not None else None
+                if last is not None:
+                    pnl[-1] = last.pnl
+                runs[key] = {"start_cash": start_cash, "end_cash": state.cash,
+                             "pnl_series": pd.Series(pnl, index=df.index, dtype=float)}
+            else:
+                count("backtest.matrix.dedup")
+            row.append(runs[key])
+        out.append(row)
+    return out
+
+
+# -------- Streaming backtest (constant memory over chunked bars) --------
+
+class BacktestSink(Protocol):
+    def on_trade(self, trade: Trade) -> None: ...
+
+    def on_pnl(self, pnl: pd.Series) -> None: ...
+
+
+class CallbackSink:
+    """Adapt plain callables to the BacktestSink interface."""
+
+    def __init__(self, on_trade: Callable[[Trade], None] | None = None, on_pnl: Callable[[pd.Series], None] | None = None):
+        self._on_trade = on_trade
+        self._on_pnl = on_pnl
+
+    def on_trade(self, trade: Trade) -> None:
+        if self._on_trade is not None:
+            self._on_trade(trade)
+
+    def on_pnl(self, pnl: pd.Series) -> None:
+        if self._on_pnl is not None:
+            self._on_pnl(pnl)
+
+
+class CsvSink:
+    """Append closed trades and realized PnL (nonzero bars only by default) to CSV files."""
+
+    def __init__(self, out_dir: str | pathlib.Path, *, all_bars: bool = False):
+        self.out_dir = pathlib.Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.trades_path = self.out_dir / "trades.csv"
+        self.pnl_path = self.out_dir / "pnl.csv"
+        self.all_bars = all_bars
+        self._trades_f = open(self.trades_path, "w", newline="", encoding="utf-8")
+        self._pnl_f = open(self.pnl_path, "w", newline="", encoding="utf-8")
+        self._trades_w = csv.writer(self._trades_f)
+        self._pnl_w = csv.writer(self._pnl_f)
+        self._trades_w.writerow(["entry_time", "exit_time", "entry", "exit", "size", "atr_stop"])
+        self._pnl_w.writerow(["timestamp", "pnl"])
+
+    def on_trade(self, trade: Trade) -> None:
+        self._trades_w.writerow([
+            trade.entry_time.isoformat(),
+            trade.exit_time.isoformat() if trade.exit_time is not None else None,
+            trade.entry, trade.exit, trade.size, trade.atr_stop,
+        ])
+
+    def on_pnl(self, pnl: pd.Series) -> None:
+        s = pnl if self.all_bars else pnl[pnl != 0.0]
+        self._pnl_w.writerows(zip((ts.isoformat() for ts in s.index), s.tolist()))
+
+    def close(self) -> None:
+        self._trades_f.close()
+        self._pnl_f.close()
+
+
+def run_backtest_stream(
+    chunks: Iterable[pd.DataFrame],
+    *,
+    start_cash: float,
+    atr_k_stop: float,
+    slippage_pct: float = 0.0,
+    fee_perc_roundturn: float = 0.0,
+    per_trade_risk_pct: float = 0.25,
+    daily_loss_stop_pct: float | None = None,
+    entry_allowed: Callable[[pd.DatetimeIndex], pd.Series] | None = None,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+    sink: BacktestSink | None = None,
+    periods_per_year: int | None = None,
+) -> Dict[str, Any]:
+    """
+    Same engine as run_backtest, fed with time-ordered signal chunks
+    (e.g. momo_atr.generate_signals_stream). Position, stop and daily-loss state
+    are carried across chunk boundaries; closed trades and per-chunk PnL go to
+    'sink' as they happen. Memory stays bounded by ~2 chunks.
+    'entry_allowed' maps a chunk index to an entry mask (e.g. blackout windows).
+    """
+    params = EngineParams(
+        start_cash=start_cash,
+        atr_k_stop=atr_k_stop,
+        slippage_pct=slippage_pct,
+        fee_perc_roundturn=fee_perc_roundturn,
+        per_trade_risk_pct=per_trade_risk_pct,
+        daily_loss_stop_pct=daily_loss_stop_pct,
+        stop_model=stop_model,
+        intrabar_path=intrabar_path,
+        take_profit_k=take_profit_k,
+    )
+    state = EngineState.initial(start_cash)
+    acc = PnlAccumulator(start_cash)
+    open_trade: Trade | None = None
+    num_bars = 0
+    num_trades = 0
+    # Each chunk is emitted one step late so the end-of-data close can land on its last bar
+    pending: tuple[pd.Series, List[Trade]] | None = None
+
+    def _emit(pnl: pd.Series, closed: List[Trade]) -> None:
+        acc.update(pnl.to_numpy(dtype=float))
+        if sink is not None:
+            for t in closed:
+                sink.on_trade(t)
+            sink.on_pnl(pnl)
+
+    last_close = np.nan
+    for df in chunks:
+        if len(df) == 0:
+            continue
+        with stage("backtest.stream_chunk"):
+            mask = entry_allowed(df.index) if entry_allowed is not None else None
+            pnl, fills = run_bars(state, params, **kernel_inputs(df, mask, daily_loss_stop_pct, day_rollover, day_rollover_tz, stop_model))
+        count("backtest.bars", len(df))
+        opened, closed, open_trade = _apply_fills(fills, df.index, open_trade)
+        num_trades += len(opened)
+        if pending is not None:
+            _emit(*pending)
+        pending = (pd.Series(pnl, index=df.index, dtype=float), closed)
+        num_bars += len(df)
+        last_close = float(df["close"].iloc[-1])
+
+    if pending is not None:
+        pnl_last, closed_last = pending
+        # Close any open position at last price
+        last = close_out(state, params, last_close)
+        if last is not None and open_trade is not None:
+            open_trade.exit_time = pnl_last.index[-1]
+            open_trade.exit = last.price
+            closed_last = closed_last + [open_trade]
+            pnl_last.iloc[-1] = last.pnl
+        _emit(pnl_last, closed_last)
+
+    return {
+        "start_cash": start_cash,
+        "end_cash": state.cash,
+        "num_bars": num_bars,
+        "num_trades": num_trades,
+        "summary": acc.metrics(state.cash, periods_per_year),
+    }
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from . import profiling
+
+
+# Small in-process LRU caches for the interactive layers (web UI, daemon).
+# FileLRUCache keys entries by the file's (path, mtime_ns, size) stamp, so an
+# edited CSV/config is reparsed on the next access and its stale version dropped.
+# Cached values are shared between callers: treat them as read-only.
+
+_MISSING = object()
+
+
+def file_stamp(path: str | os.PathLike) -> Tuple[str, int, int]:
+    """(resolved path, mtime_ns, size); raises FileNotFoundError for a missing file."""
+    p = pathlib.Path(path).resolve()
+    st = p.stat()
+    return (str(p), st.st_mtime_ns, st.st_size)
+
+
+class LRUCache:
+    """Thread-safe bounded LRU with hit/miss/eviction counters (maxsize 0 disables caching)."""
+
+    def __init__(self, maxsize: int, *, name: str = "cache"):
+        self.maxsize = max(0, int(maxsize))
+        self.name = name
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        profiling.count(f"cache.{self.name}.{'miss' if value is _MISSING else 'hit'}")
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        # Computed outside the lock: two concurrent misses may both compute, last one wins
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else None,
+        }
+
+
+class FileLRUCache(LRUCache):
+    """LRU of values derived from a file; keys are (file stamp, variant)."""
+
+    def get_file(self, path: str | os.PathLike, load: Callable[[str], Any], variant: Hashable = ()) -> Any:
+        stamp = file_stamp(path)
+        key = (stamp, variant)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = load(stamp[0])
+            # Same file + variant with an older stamp is unreachable now
+            self.discard(lambda k: k[0][0] == stamp[0] and k[1] == variant and k[0] != stamp)
+            self.put(key, value)
+        return value
+
+    def key_for(self, path: str | os.PathLike, variant: Hashable = ()) -> Tuple[Tuple[str, int, int], Hashable]:
+        """Cache key a get_file() call would use; lets derived caches key on the same file version."""
+        return (file_stamp(path), variant)
+
+
+def stats_of(*caches: Optional[LRUCache]) -> Dict[str, Dict[str, Any]]:
+    return {c.name: c.stats() for c in caches if c is not None}
@@ -1,21 +1,47 @@
 from __future__ import annotations
 
 import argparse
+import os
 import pathlib
+import sys
 import json
-import pandas as pd
+from typing import TYPE_CHECKING
 
-from .config import load_config
-from .data.csv_loader import load_ohlcv_csv
-from .strategies.momo_atr import generate_signals
-from .backtest import run_backtest
-from .report import save_report, export_report_to_csvs
-from .optimize import grid_search
-from .events import load_events_csv, build_blackout_mask
-from .walkforward import walk_forward
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Subcommands import pandas/yaml and the engine modules on first use, so
+# `--help` and light commands do not pay for them (budget: benchmarks/bench.py imports).
+
+# Same as fxbot.report.REPORT_FORMATS; that module imports numpy/pandas
+REPORT_FORMATS = ("json", "npz")
+
+
+# Resident caches, set by fxbot.daemon: parsed CSVs and configs keyed by file stamp
+_frames = None
+_configs = None
+
+
+def set_resident_caches(frames, configs) -> None:
+    global _frames, _configs
+    _frames, _configs = frames, configs
+
+
+def _load_frame(path: str) -> pd.DataFrame:
+    from .data.csv_loader import load_ohlcv_csv
+
+    return load_ohlcv_csv(path) if _frames is None else _frames.get_file(path, load_ohlcv_csv)
+
+
+def _load_config(path: str):
+    from .config import load_config
+
+    return load_config(path) if _configs is None else _configs.get_file(path, load_config)
 
 
 def _slice_df(df: pd.DataFrame, start: str | None, end: str | None) -> pd.DataFrame:
+    import pandas as pd
+
     if start:
         df = df[df.index >= pd.to_datetime(start, utc=True)]
     if end:
@@ -23,18 +49,54 @@ def _slice_df(df: pd.DataFrame, start: str | None, end: str | None) -> pd.DataFr
     return df
 
 
+def _param_items(items) -> dict:
+    """--param NAME=VALUE[,VALUE...] options as {name: value string}."""
+    out = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip():
+            raise SystemExit(f"--param expects NAME=VALUE, got {item!r}")
+        out[name.strip()] = value.strip()
+    return out
+
+
+def _get_strategy(args: argparse.Namespace, cfg):
+    """--strategy, else the config's strategy.name, from the registry."""
+    from .strategies.registry import get_strategy
+
+    name = getattr(args, "strategy", None) or cfg.strategy_name
+    if ":" in name and str(os.getcwd()) not in sys.path:
+        sys.path.insert(0, os.getcwd())  # 'module:attr' plugin strategies
+    try:
+        return get_strategy(name)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def _strategy(args: argparse.Namespace, cfg):
+    """(strategy, resolved params): config params, then --param NAME=VALUE overrides."""
+    strat = _get_strategy(args, cfg)
+    given = _param_items(getattr(args, "param", None))
+    unknown = set(given) - {p.name for p in strat.params}
+    if unknown:
+        raise SystemExit(f"unknown parameter(s) for {strat.name}: {', '.join(sorted(unknown))}")
+    return strat, strat.resolve({**cfg.strategy_params, **given})
+
+
 def cmd_backtest(args: argparse.Namespace) -> None:
-    cfg = load_config(args.config)
-    df = load_ohlcv_csv(args.csv)
+    if getattr(args, "stream", False):
+        cmd_backtest_stream(args)
+        return
+    from .backtest import run_backtest
+    from .config import engine_kwargs
+    from .events import build_blackout_mask, load_events_csv
+    from .report import save_report
+
+    cfg = _load_config(args.config)
+    strat, params = _strategy(args, cfg)
+    df = _load_frame(args.csv)
     df = _slice_df(df, getattr(args, "start", None), getattr(args, "end", None))
-    params = cfg.strategy_params
-    sig = generate_signals(
-        df,
-        ema_fast=int(params.get("ema_fast", 20)),
-        ema_slow=int(params.get("ema_slow", 60)),
-        atr_window=int(params.get("atr_window", 14)),
-        vol_filter_min_atr_pct=float(params.get("vol_filter_min_atr_pct", 0.0)),
-    )
+    sig = strat.generate(df, params)
     mask = None
     if getattr(args, "events", None):
         ev = load_events_csv(args.events)
@@ -42,22 +104,63 @@ def cmd_backtest(args: argparse.Namespace) -> None:
 
     res = run_backtest(
         sig,
-        start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-        atr_k_stop=float(params.get("atr_k_stop", 2.0)),
-        slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-        fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-        per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-        daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+        atr_k_stop=params["atr_k"],
+        **engine_kwargs(cfg),
         entry_allowed_mask=mask,
     )
 
     out_dir = pathlib.Path(args.out).parent if args.out else cfg.report_dir
     out_dir.mkdir(parents=True, exist_ok=True)
-    out_file = pathlib.Path(args.out) if args.out else out_dir / f"report_{args.pair}.json"
-    save_report(str(out_file), res)
+    fmt = getattr(args, "report_format", None)
+    out_file = pathlib.Path(args.out) if args.out else out_dir / f"report_{args.pair}.{fmt or 'json'}"
+    save_report(str(out_file), res, fmt)
     print(f"Saved report to: {out_file}")
 
 
+def cmd_backtest_stream(args: argparse.Namespace) -> None:
+    """Chunked backtest: bounded memory; trades/PnL are appended to CSVs as they close."""
+    from .backtest import CsvSink, run_backtest_stream
+    from .config import engine_kwargs
+    from .data.chunked import is_ohlcv_store, iter_ohlcv_chunks, iter_ohlcv_store
+    from .events import build_blackout_mask, load_events_csv
+    from .strategies.momo_atr import generate_signals_stream
+
+    cfg = _load_config(args.config)
+    strat, params = _strategy(args, cfg)
+    if strat.name != "momo_atr":
+        raise SystemExit(f"--stream supports the momo_atr strategy only (got {strat.name})")
+    start, end = getattr(args, "start", None), getattr(args, "end", None)
+    if is_ohlcv_store(args.csv):
+        chunks = iter_ohlcv_store(args.csv, chunksize=int(args.chunksize), start=start, end=end)
+    else:
+        chunks = (_slice_df(c, start, end) for c in iter_ohlcv_chunks(args.csv, chunksize=int(args.chunksize)))
+    sig_chunks = generate_signals_stream(chunks, **strat.signal_params(params))
+    entry_allowed = None
+    if getattr(args, "events", None):
+        ev = load_events_csv(args.events)
+
+        def entry_allowed(idx: pd.DatetimeIndex) -> pd.Series:
+            return build_blackout_mask(idx, ev, before_min=args.blackout_before_min, after_min=args.blackout_after_min)
+
+    out_file = pathlib.Path(args.out) if args.out else cfg.report_dir / f"report_{args.pair}.json"
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    sink = CsvSink(out_file.with_name(out_file.stem + "_stream"))
+    try:
+        res = run_backtest_stream(
+            sig_chunks,
+            atr_k_stop=params["atr_k"],
+            **engine_kwargs(cfg),
+            entry_allowed=entry_allowed,
+            sink=sink,
+        )
+    finally:
+        sink.close()
+    res.update({"trades_csv": str(sink.trades_path), "pnl_csv": str(sink.pnl_path)})
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(res, f, ensure_ascii=False, indent=2)
+    print(f"Saved streaming report to: {out_file}")
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog="fxbot")
     sub = p.add_subparsers(dest="command", required=True)
@@ -67,12 +170,17 @@ def build_parser() -> argparse.ArgumentParser:
     bt.add_argument("--csv", required=True, help="Path to OHLCV CSV")
     bt.add_argument("--pair", required=True, help="Symbol/pair label for report filename")
     bt.add_argument("--config", default="config/config.yaml", help="Path to config.yaml")
-    bt.add_argument("--out", default=None, help="Path to output report JSON")
+    bt.add_argument("--out", default=None, help="Path to output report (.json, or .npz for the compressed bundle)")
+    bt.add_argument("--report-format", choices=REPORT_FORMATS, default=None, help="Report format (default: by --out suffix, else json)")
     bt.add_argument("--start", default=None, help="YYYY-MM-DD or ISO start (optional)")
     bt.add_argument("--end", default=None, help="YYYY-MM-DD or ISO end (optional)")
     bt.add_argument("--events", default=None, help="Events CSV with 'timestamp' column (UTC)")
     bt.add_argument("--blackout-before-min", type=int, default=30, help="Minutes before event to block entries")
     bt.add_argument("--blackout-after-min", type=int, default=30, help="Minutes after event to block entries")
+    bt.add_argument("--stream", action="store_true", help="Chunked constant-memory backtest (CSV or ingest store dir)")
+    bt.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk for --stream")
+    bt.add_argument("--strategy", default=None, help="Registered strategy (default: config strategy.name; see `fxbot strategies`)")
+    bt.add_argument("--param", action="append", default=None, metavar="NAME=VALUE", help="Override a strategy parameter (repeatable)")
     bt.set_defaults(func=cmd_backtest)
 
     # Fetchers
@@ -161,6 +269,9 @@ def build_parser() -> argparse.ArgumentParser:
     op.add_argument("--pair", required=True)
     op.add_argument("--config", default="config/config.yaml")
     op.add_argument("--out", required=True, help="Output JSON for top results")
+    op.add_argument("--strategy", default=None, help="Registered strategy (default: config strategy.name)")
+    op.add_argument("--param", action="append", default=None, metavar="NAME=V1,V2",
+                    help="Values of any strategy parameter (repeatable); the flags below apply when the strategy declares them")
     op.add_argument("--ema-fast", default="10,20,30")
     op.add_argument("--ema-slow", default="50,80,120")
     op.add_argument("--atr-window", default="10,14,20")
@@ -173,30 +284,39 @@ def build_parser() -> argparse.ArgumentParser:
     def _parse_list(s: str, cast):
         return [cast(x) for x in s.split(",") if x.strip()]
 
+    # Grid flags (momo_atr parameter names); each applies to strategies declaring that parameter
+    grid_flags = {"ema_fast": "ema_fast", "ema_slow": "ema_slow", "atr_window": "atr_window",
+                  "atr_k": "atr_k", "vol_filter_min_atr_pct": "atr_min_pct"}
+
+    def _param_grid(args: argparse.Namespace, strat) -> dict:
+        grid = strat.default_grid()
+        for name, dest in grid_flags.items():
+            if name in grid and getattr(args, dest, None) is not None:
+                grid[name] = _parse_list(getattr(args, dest), str)
+        for name, values in _param_items(args.param).items():
+            if name not in grid:
+                raise SystemExit(f"unknown parameter for {strat.name}: {name}")
+            grid[name] = _parse_list(values, str)
+        return grid
+
     def cmd_optimize(args: argparse.Namespace) -> None:
-        cfg = load_config(args.config)
-        df = load_ohlcv_csv(args.csv)
+        from .config import engine_kwargs
+        from .features import open_features
+        from .optimize import grid_search
+
+        cfg = _load_config(args.config)
+        strat = _get_strategy(args, cfg)
+        df = _load_frame(args.csv)
         df = _slice_df(df, getattr(args, "start", None), getattr(args, "end", None))
-        ef = _parse_list(args.__dict__["ema_fast"], int)
-        es = _parse_list(args.__dict__["ema_slow"], int)
-        aw = _parse_list(args.__dict__["atr_window"], int)
-        ak = _parse_list(args.__dict__["atr_k"], float)
-        av = _parse_list(args.__dict__["atr_min_pct"], float)
         res = grid_search(
             df,
-            ema_fast_list=ef,
-            ema_slow_list=es,
-            atr_window_list=aw,
-            atr_k_list=ak,
-            vol_filter_min_atr_pct_list=av,
-            start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-            slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-            fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-            per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-            daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+            strategy=strat,
+            grid=_param_grid(args, strat),
+            **engine_kwargs(cfg),
             periods_per_year=int(args.ppyear),
             max_dd_limit=None,
             top_n=10,
+            cache=open_features(df),  # persisted across runs when $FXBOT_FEATURE_STORE is set
         )
         out_path = pathlib.Path(args.out)
         out_path.parent.mkdir(parents=True, exist_ok=True)
@@ -212,35 +332,35 @@ def build_parser() -> argparse.ArgumentParser:
     bb.add_argument("--pair", required=True)
     bb.add_argument("--config", default="config/config.yaml")
     bb.add_argument("--opt", required=True, help="Path to optimize results JSON")
-    bb.add_argument("--out", required=True)
+    bb.add_argument("--out", required=True, help="Path to output report (.json or .npz)")
+    bb.add_argument("--report-format", choices=REPORT_FORMATS, default=None, help="Report format (default: by --out suffix)")
     bb.add_argument("--start", default=None)
     bb.add_argument("--end", default=None)
+    bb.add_argument("--strategy", default=None, help="Strategy the results were optimized for (default: config strategy.name)")
 
     def cmd_backtest_with_opt(args: argparse.Namespace) -> None:
-        cfg = load_config(args.config)
-        df = load_ohlcv_csv(args.csv)
+        from .backtest import run_backtest
+        from .config import engine_kwargs
+        from .report import save_report
+
+        cfg = _load_config(args.config)
+        strat, _ = _strategy(args, cfg)
+        df = _load_frame(args.csv)
         df = _slice_df(df, getattr(args, "start", None), getattr(args, "end", None))
         with open(args.opt, "r", encoding="utf-8") as f:
             arr = json.load(f)
         if not arr:
             raise SystemExit("opt results empty")
-        top = arr[0]
-        ef, es = int(top["ema_fast"]), int(top["ema_slow"]) 
-        aw, ak = int(top["atr_window"]), float(top["atr_k"]) 
-        av = float(top.get("vol_filter_min_atr_pct", 0.0))
-        sig = generate_signals(df, ema_fast=ef, ema_slow=es, atr_window=aw, vol_filter_min_atr_pct=av)
+        top = strat.resolve(arr[0])
+        sig = strat.generate(df, top)
         res = run_backtest(
             sig,
-            start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-            atr_k_stop=ak,
-            slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-            fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-            per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-            daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+            atr_k_stop=top["atr_k"],
+            **engine_kwargs(cfg),
         )
         out = pathlib.Path(args.out)
         out.parent.mkdir(parents=True, exist_ok=True)
-        save_report(str(out), res)
+        save_report(str(out), res, args.report_format)
         print(f"Saved best-params report to: {out}")
 
     bb.set_defaults(func=cmd_backtest_with_opt)
@@ -251,6 +371,8 @@ def build_parser() -> argparse.ArgumentParser:
     wf.add_argument("--pair", required=True)
     wf.add_argument("--config", default="config/config.yaml")
     wf.add_argument("--out", required=True)
+    wf.add_argument("--strategy", default=None, help="Registered strategy (default: config strategy.name)")
+    wf.add_argument("--param", action="append", default=None, metavar="NAME=V1,V2", help="Values of any strategy parameter (repeatable)")
     wf.add_argument("--ema-fast", default="10,20,30")
     wf.add_argument("--ema-slow", default="50,80,120")
     wf.add_argument("--atr-window", default="10,14,20")
@@ -267,16 +389,14 @@ def build_parser() -> argparse.ArgumentParser:
     wf.add_argument("--end", default=None)
 
     def cmd_walkforward(args: argparse.Namespace) -> None:
-        cfg = load_config(args.config)
-        df = load_ohlcv_csv(args.csv)
+        from .config import engine_kwargs
+        from .events import build_blackout_mask, load_events_csv
+        from .walkforward import walk_forward
+
+        cfg = _load_config(args.config)
+        strat = _get_strategy(args, cfg)
+        df = _load_frame(args.csv)
         df = _slice_df(df, getattr(args, "start", None), getattr(args, "end", None))
-        def _parse_list(s: str, cast):
-            return [cast(x) for x in s.split(",") if x.strip()]
-        ef = _parse_list(args.__dict__["ema_fast"], int)
-        es = _parse_list(args.__dict__["ema_slow"], int)
-        aw = _parse_list(args.__dict__["atr_window"], int)
-        ak = _parse_list(args.__dict__["atr_k"], float)
-        av = _parse_list(args.__dict__["atr_min_pct"], float)
         mask = None
         if args.events:
             ev = load_events_csv(args.events)
@@ -287,16 +407,9 @@ def build_parser() -> argparse.ArgumentParser:
             train_bars=int(args.train_bars),
             test_bars=int(args.test_bars),
             step_bars=step,
-            ema_fast_list=ef,
-            ema_slow_list=es,
-            atr_window_list=aw,
-            atr_k_list=ak,
-            vol_filter_min_atr_pct_list=av,
-            start_cash=float(cfg.general.get("start_cash", 1_000_000)),
-            slippage_pct=float(cfg.backtest_params.get("slippage_pct", 0.0)),
-            fee_perc_roundturn=float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
-            per_trade_risk_pct=float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
-            daily_loss_stop_pct=float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+            strategy=strat,
+            grid=_param_grid(args, strat),
+            **engine_kwargs(cfg),
             periods_per_year=int(args.ppyear),
             entry_allowed_mask=mask,
         )
@@ -308,23 +421,237 @@ def build_parser() -> argparse.ArgumentParser:
 
     wf.set_defaults(func=cmd_walkforward)
 
+    # Threshold / ATR-k sweep for an AI callable (scores computed once)
+    oa = sub.add_parser("optimize-ai", help="Sweep AI-callable thresholds and ATR k (optionally walk-forward)")
+    oa.add_argument("--csv", required=True)
+    oa.add_argument("--pair", required=True)
+    oa.add_argument("--config", default="config/config.yaml")
+    oa.add_argument("--out", required=True, help="Output JSON (top results, or walk-forward folds)")
+    oa.add_argument("--callable", required=True, help="Scoring function as 'module:func'")
+    oa.add_argument("--thresholds", default="0.3,0.4,0.5,0.6,0.7")
+    oa.add_argument("--atr-k", default="1.5,2.0,2.5")
+    oa.add_argument("--score-cache", default=None, help="Score cache directory (default: $FXBOT_AI_SCORE_CACHE)")
+    oa.add_argument("--ppyear", default=6048, type=int)
+    oa.add_argument("--top", type=int, default=10)
+    oa.add_argument("--walkforward", action="store_true", help="Re-tune threshold/ATR k per train window")
+    oa.add_argument("--train-bars", type=int, default=2000)
+    oa.add_argument("--test-bars", type=int, default=500)
+    oa.add_argument("--step-bars", type=int, default=0)
+    oa.add_argument("--start", default=None)
+    oa.add_argument("--end", default=None)
+
+    def cmd_optimize_ai(args: argparse.Namespace) -> None:
+        from .config import engine_kwargs
+        from .optimize import threshold_search
+        from .strategies.ai_bridge import score_callable
+        from .walkforward import walk_forward_thresholds
+
+        if str(os.getcwd()) not in sys.path:
+            sys.path.insert(0, os.getcwd())  # 'scripts.ai_example:...' style paths
+        cfg = _load_config(args.config)
+        df = _load_frame(args.csv)
+        df = _slice_df(df, getattr(args, "start", None), getattr(args, "end", None))
+        scores = score_callable(df, callable_path=args.callable, cache_dir=args.score_cache)
+        common = dict(
+            threshold_list=_parse_list(args.thresholds, float),
+            atr_k_list=_parse_list(args.atr_k, float),
+            **engine_kwargs(cfg),
+            periods_per_year=int(args.ppyear),
+        )
+        if args.walkforward:
+            step = int(args.step_bars) if int(args.step_bars) > 0 else None
+            res = walk_forward_thresholds(df, scores, train_bars=int(args.train_bars), test_bars=int(args.test_bars),
+                                          step_bars=step, **common)
+        else:
+            res = threshold_search(df, scores, top_n=int(args.top), **common)
+        out = pathlib.Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(f"Saved AI {'walk-forward' if args.walkforward else 'threshold'} results: {out}")
+
+    oa.set_defaults(func=cmd_optimize_ai)
+
+    # Strategy registry
+    sl = sub.add_parser("strategies", help="List registered strategies with their parameters and indicators (JSON)")
+
+    def cmd_strategies(args: argparse.Namespace) -> None:
+        from .strategies.registry import get_strategy, names
+
+        print(json.dumps([get_strategy(n).describe() for n in names()], ensure_ascii=False, indent=2))
+
+    sl.set_defaults(func=cmd_strategies)
+
+    cp = sub.add_parser("compare", help="Backtest several registered strategies over one data pass")
+    cp.add_argument("--csv", required=True)
+    cp.add_argument("--config", default="config/config.yaml")
+    cp.add_argument("--strategies", default=None, help="Comma-separated names (default: all registered)")
+    cp.add_argument("--out", default=None, help="Output JSON (default: print)")
+    cp.add_argument("--ppyear", default=6048, type=int)
+    cp.add_argument("--start", default=None)
+    cp.add_argument("--end", default=None)
+
+    def cmd_compare(args: argparse.Namespace) -> None:
+        from .backtest import run_backtest
+        from .config import engine_kwargs
+        from .features import open_features
+        from .report import metrics_from_pnl
+        from .strategies.registry import generate_many, names
+
+        cfg = _load_config(args.config)
+        # Each strategy takes the config's params it declares (e.g. atr_window, atr_k_stop), else its defaults
+        strats = [_get_strategy(argparse.Namespace(strategy=n), cfg)
+                  for n in (_parse_list(args.strategies, str) if args.strategies else names())]
+        df = _slice_df(_load_frame(args.csv), args.start, args.end)
+        params = [s.resolve(cfg.strategy_params) for s in strats]
+        sigs = generate_many(df, list(zip(strats, params)), features=open_features(df))
+        kw = engine_kwargs(cfg)
+        rows = []
+        for s, p, sig in zip(strats, params, sigs):
+            res = run_backtest(sig, atr_k_stop=p["atr_k"], **kw)
+            met = metrics_from_pnl(res["pnl_series"], kw["start_cash"], res["end_cash"], int(args.ppyear))
+            rows.append({"strategy": s.name, "params": p, **{k: float(v) if isinstance(v, (int, float)) else v for k, v in met.items()}})
+        rows.sort(key=lambda x: (float(x.get("sharpe_approx", 0.0)), float(x.get("total_return", 0.0))), reverse=True)
+        text = json.dumps(rows, ensure_ascii=False, indent=2)
+        if args.out:
+            out = pathlib.Path(args.out)
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(text, encoding="utf-8")
+            print(f"Saved comparison: {out}")
+        else:
+            print(text)
+
+    cp.set_defaults(func=cmd_compare)
+
     # Report export to CSV
-    rx = sub.add_parser("report-export", help="Export report JSON into CSV files")
-    rx.add_argument("--in", dest="in_json", required=True, help="Path to report JSON produced by backtest")
+    rx = sub.add_parser("report-export", help="Export a report (JSON or npz) into CSV files")
+    rx.add_argument("--in", dest="in_json", required=True, help="Path to report JSON/npz produced by backtest")
     rx.add_argument("--out-dir", required=True, help="Directory to write CSVs (pnl.csv, trades.csv, summary.csv)")
 
     def cmd_report_export(args: argparse.Namespace) -> None:
+        with open(args.in_json, "rb") as f:
+            is_npz = f.read(4) == b"PK\x03\x04"
+        if is_npz:
+            from .report import export_report_to_csvs
+        else:
+            # Same CSVs as fxbot.report for JSON reports, without importing pandas
+            # (byte-identical; checked by the lite_report_export bench stage, `make bench-lite`)
+            from .lite import export_report_to_csvs
         out = export_report_to_csvs(args.in_json, args.out_dir)
         print(json.dumps(out, ensure_ascii=False, indent=2))
 
     rx.set_defaults(func=cmd_report_export)
 
+    # Chunked ingestion into a columnar store (bounded memory)
+    ig = sub.add_parser("ingest", help="Convert a large OHLCV CSV into a columnar store (chunked)")
+    ig.add_argument("--csv", required=True, help="Path to OHLCV CSV")
+    ig.add_argument("--out-dir", required=True, help="Store directory (meta.json + one file per column)")
+    ig.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk")
+    ig.add_argument("--sort", choices=["auto", "presorted", "external"], default="auto",
+                    help="auto: scan then stream/merge; external: always external merge sort")
+    ig.add_argument("--tmp-dir", default=None, help="Directory for external sort runs (default: system temp)")
+
+    def cmd_ingest(args: argparse.Namespace) -> None:
+        from .data.chunked import ingest_ohlcv_csv
+        meta = ingest_ohlcv_csv(args.csv, args.out_dir, chunksize=int(args.chunksize), sort=args.sort, tmp_dir=args.tmp_dir)
+        print(json.dumps(meta, ensure_ascii=False, indent=2))
+
+    ig.set_defaults(func=cmd_ingest)
+
+    # Production serving of the Web UI (scripts/webapp.py)
+    sv = sub.add_parser("serve", help="Serve the Web UI with a multi-worker WSGI server")
+    sv.add_argument("--host", default="127.0.0.1", help="Bind address (0.0.0.0 for LAN)")
+    sv.add_argument("--port", type=int, default=int(os.environ.get("PORT", "7860")))
+    sv.add_argument("--workers", type=int, default=None, help="Worker processes (default: min(4, CPUs))")
+    sv.add_argument("--threads", type=int, default=None, help="Threads per worker (default 4; gunicorn: 1 = sync workers, which cut SSE streams)")
+    sv.add_argument("--timeout", type=int, default=120,
+                    help="Seconds before gunicorn replaces a hung worker (sync workers, --threads 1: any longer request)")
+    sv.add_argument("--backend", choices=["auto", "gunicorn", "waitress", "werkzeug"], default="auto")
+    sv.add_argument("--app", default=None, help="Path to the web app module (default: scripts/webapp.py)")
+    sv.add_argument("--no-preload", action="store_true", help="Import the app in each worker instead of before fork")
+    sv.add_argument("--no-warm", action="store_true", help="Do not preload data/*.csv into the per-process cache")
+    sv.add_argument("--max-requests", type=int, default=0, help="Recycle a worker after N requests (0 = never)")
+
+    def cmd_serve(args: argparse.Namespace) -> None:
+        from .serve import serve
+        serve(
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads=args.threads,
+            timeout=args.timeout,
+            backend=args.backend,
+            app_path=args.app,
+            preload=not args.no_preload,
+            warm=not args.no_warm,
+            max_requests=args.max_requests,
+        )
+
+    sv.set_defaults(func=cmd_serve)
+
+    # Resident worker: keeps libraries/datasets loaded; the CLI delegates to it while it runs
+    dm = sub.add_parser("daemon", help="Run/stop/query the resident worker that serves CLI commands over a Unix socket")
+    dm.add_argument("action", nargs="?", choices=["run", "stop", "status"], default="run")
+    dm.add_argument("--socket", default=None, help="Socket path (default: $FXBOT_DAEMON_SOCKET or $XDG_RUNTIME_DIR/fxbot-<uid>.sock)")
+    dm.add_argument("--preload", action="append", default=[], help="CSV glob to load at startup (repeatable, e.g. 'data/*.csv')")
+    dm.add_argument("--max-datasets", type=int, default=8, help="Parsed CSVs kept resident (LRU)")
+
+    def cmd_daemon(args: argparse.Namespace) -> None:
+        from . import daemon
+
+        if args.action == "run":
+            daemon.serve_daemon(path=args.socket, preload=args.preload, max_datasets=args.max_datasets)
+            return
+        try:
+            reply = daemon.request({"op": args.action}, path=args.socket, timeout=10)
+        except OSError as e:
+            raise SystemExit(f"no daemon on {args.socket or daemon.default_socket_path()}: {e}")
+        print(json.dumps(reply, ensure_ascii=False, indent=2))
+
+    dm.set_defaults(func=cmd_daemon)
+
+    # Per-stage timing for any subcommand (fxbot.profiling)
+    for sp in sub.choices.values():
+        sp.add_argument("--profile", action="store_true", help="Print per-stage timing breakdown to stderr")
+        sp.add_argument("--profile-out", default=None, help="Write profile summary JSON (implies --profile)")
+        sp.add_argument("--profile-trace", default=None, help="Write Chrome trace JSON (chrome://tracing / Perfetto)")
+
     return p
 
 
-def main() -> None:
+def _default_socket() -> str:
+    # fxbot.daemon.default_socket_path without importing it (kept off the startup path)
+    base = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(base, f"fxbot-{os.getuid() if hasattr(os, 'getuid') else 0}.sock")
+
+
+def _run_profiled(args: argparse.Namespace) -> None:
+    from . import profiling
+
+    with profiling.profile(trace=bool(args.profile_trace)) as prof:
+        try:
+            args.func(args)
+        finally:
+            print(prof.format_table(), file=sys.stderr)
+            if args.profile_out:
+                print(f"Saved profile to: {prof.write_json(args.profile_out)}", file=sys.stderr)
+            if args.profile_trace:
+                print(f"Saved trace to: {prof.write_chrome_trace(args.profile_trace)}", file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if os.environ.get("FXBOT_DAEMON_SOCKET") or os.path.exists(_default_socket()):
+        from .daemon import try_delegate
+
+        code = try_delegate(argv)
+        if code is not None:
+            raise SystemExit(code)
     p = build_parser()
-    args = p.parse_args()
+    args = p.parse_args(argv)
+    if args.profile or args.profile_out or args.profile_trace:
+        _run_profiled(args)
+        return
     args.func(args)
 
 
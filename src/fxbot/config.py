@@ -42,6 +42,22 @@ class AppConfig:
         return self.raw.get("general", {})
 
 
+def engine_kwargs(cfg: AppConfig) -> Dict[str, Any]:
+    """Cost/risk/execution settings from config.yaml as run_backtest / grid_search keyword arguments."""
+    return {
+        "start_cash": float(cfg.general.get("start_cash", 1_000_000)),
+        "slippage_pct": float(cfg.backtest_params.get("slippage_pct", 0.0)),
+        "fee_perc_roundturn": float(cfg.backtest_params.get("fee_perc_roundturn", 0.0)),
+        "per_trade_risk_pct": float(cfg.risk_params.get("per_trade_risk_pct", 0.25)),
+        "daily_loss_stop_pct": float(cfg.risk_params.get("daily_loss_stop_pct", 1.0)),
+        "day_rollover": cfg.risk_params.get("day_rollover", "00:00"),
+        "day_rollover_tz": cfg.risk_params.get("day_rollover_tz", "UTC"),
+        "stop_model": cfg.backtest_params.get("stop_model", "close"),
+        "intrabar_path": cfg.backtest_params.get("intrabar_path", "worst"),
+        "take_profit_k": cfg.backtest_params.get("take_profit_k"),
+    }
+
+
 def load_config(path: str | pathlib.Path) -> AppConfig:
     with open(path, "r", encoding="utf-8") as f:
         data = yaml.safe_load(f)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import contextlib
+import glob
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+
+# Resident worker for short CLI runs (`fxbot daemon`). The server process keeps
+# pandas, the engine modules, parsed CSVs and configs loaded; each request is
+# served by a forked child, so commands run in isolation (own cwd, env and
+# stdout) but start with everything warm. Before forking, the server loads the
+# request's --csv/--config into its LRU caches, so the next run of the same
+# dataset finds it resident. The regular CLI delegates to a running daemon
+# when its socket exists (FXBOT_NO_DAEMON=1 disables this). POSIX only.
+#
+# Protocol: one JSON line each way over the Unix socket.
+#   request:  {"argv": [...], "cwd": "...", "env": {...}}  or  {"op": "status" | "stop"}
+#   response: {"code": int, "stdout": "...", "stderr": "..."}  or  the status dict
+
+NO_DELEGATE = ("daemon", "serve", "-h", "--help")
+_MAX_REQUEST = 1 << 20
+
+
+def default_socket_path() -> str:
+    env = os.environ.get("FXBOT_DAEMON_SOCKET")
+    if env:
+        return env
+    base = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(base, f"fxbot-{uid}.sock")
+
+
+def _recv_line(sock: socket.socket) -> bytes:
+    buf = bytearray()
+    while not buf.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        buf += chunk
+        if len(buf) > _MAX_REQUEST and b"\n" not in chunk:
+            raise ValueError("request too large")
+    return bytes(buf)
+
+
+def request(msg: Dict[str, Any], *, path: str | None = None, timeout: float | None = None) -> Dict[str, Any]:
+    """Send one message to the daemon; raises OSError when none is listening."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path or default_socket_path())
+        s.sendall(json.dumps(msg).encode("utf-8") + b"\n")
+        line = _recv_line(s)
+    if not line:
+        raise ConnectionError("daemon closed the connection without a reply")
+    return json.loads(line)
+
+
+def try_delegate(argv: List[str]) -> Optional[int]:
+    """Run argv on the daemon and relay its output; None means run locally (no daemon, or not delegable)."""
+    if not argv or argv[0] in NO_DELEGATE or os.environ.get("FXBOT_NO_DAEMON") or not hasattr(socket, "AF_UNIX"):
+        return None
+    path = default_socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        reply = request({"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}, path=path)
+    except (OSError, ValueError):
+        return None  # stale socket or daemon going down: fall back to a local run
+    sys.stdout.write(reply.get("stdout", ""))
+    sys.stdout.flush()
+    sys.stderr.write(reply.get("stderr", ""))
+    return int(reply.get("code", 1))
+
+
+# -------- server --------
+
+class _Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    block_on_close = False
+
+    def __init__(self, path: str, frames: Any, configs: Any):
+        self.frames = frames
+        self.configs = configs
+        self.started = time.time()
+        self.served = 0
+        self.pending: Dict[str, Any] = {}
+        self.stopping = False
+        super().__init__(path, _Handler)
+
+    def process_request(self, request: socket.socket, client_address: Any) -> None:
+        # Read and warm in the server process (before fork) so the caches persist
+        try:
+            request.settimeout(10)
+            self.pending = json.loads(_recv_line(request) or b"{}")
+        except (OSError, ValueError) as e:
+            self.pending = {"error": str(e)}
+        op = self.pending.get("op")
+        if op in ("status", "stop"):
+            reply = self.status() if op == "status" else {"stopping": True, "pid": os.getpid()}
+            with contextlib.suppress(OSError):
+                request.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            self.shutdown_request(request)
+            self.stopping = self.stopping or op == "stop"
+            return
+        self.served += 1
+        if "argv" in self.pending:
+            self.warm(self.pending)
+        super().process_request(request, client_address)
+
+    def warm(self, msg: Dict[str, Any]) -> None:
+        from .cli import build_parser
+        from .config import load_config
+        from .data.csv_loader import load_ohlcv_csv
+
+        try:
+            with contextlib.redirect_stderr(io.StringIO()), contextlib.redirect_stdout(io.StringIO()):
+                args = build_parser().parse_args(msg["argv"])
+        except SystemExit:
+            return  # usage error: the child reports it
+        cwd = msg.get("cwd") or os.getcwd()
+        csv, cfg = getattr(args, "csv", None), getattr(args, "config", None)
+        try:
+            if csv and not getattr(args, "stream", False):
+                self.frames.get_file(os.path.join(cwd, csv), load_ohlcv_csv)
+            if cfg:
+                self.configs.get_file(os.path.join(cwd, cfg), load_config)
+        except Exception:
+            pass  # missing/bad file: the child raises the real error
+
+    def status(self) -> Dict[str, Any]:
+        from .cache import stats_of
+
+        return {
+            "pid": os.getpid(),
+            "socket": self.server_address,
+            "uptime_s": time.time() - self.started,
+            "served": self.served,
+            "active_children": len(self.active_children or ()),
+            "caches": stats_of(self.frames, self.configs),
+        }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Runs in the forked child: execute the CLI with captured output and reply."""
+
+    def handle(self) -> None:
+        msg = self.server.pending
+        out, err = io.StringIO(), io.StringIO()
+        code = 0
+        if "argv" not in msg:
+            code, err = 2, io.StringIO(f"bad request: {msg.get('error', 'missing argv')}\n")
+        else:
+            from . import cli
+
+            try:
+                os.chdir(msg.get("cwd") or "/")
+                os.environ.clear()
+                os.environ.update(msg.get("env") or {})
+                os.environ["FXBOT_NO_DAEMON"] = "1"
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                    cli.main(list(msg["argv"]))
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if e.code is not None and not isinstance(e.code, int):
+                    err.write(f"{e.code}\n")
+            except BaseException as e:  # report instead of killing the connection
+                import traceback
+
+                code = 1
+                err.write("".join(traceback.format_exception(type(e), e, e.__traceback__)))
+        reply = {"code": code, "stdout": out.getvalue(), "stderr": err.getvalue()}
+        self.request.sendall(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+def serve_daemon(*, path: str | None = None, preload: List[str] | None = None, max_datasets: int = 8) -> None:
+    """Run the daemon in the foreground until `fxbot daemon stop` (or SIGINT/SIGTERM)."""
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"):
+        raise SystemExit("fxbot daemon needs Unix sockets and fork (POSIX)")
+    from . import cli  # noqa: F401  (resident: parser and command modules)
+    from . import backtest, optimize, report, walkforward  # noqa: F401
+    from .cache import FileLRUCache
+    from .data.csv_loader import load_ohlcv_csv
+
+    frames = FileLRUCache(max_datasets, name="daemon_frames")
+    configs = FileLRUCache(32, name="daemon_configs")
+    cli.set_resident_caches(frames, configs)
+    for pattern in preload or []:
+        for p in sorted(glob.glob(pattern)):
+            frames.get_file(p, load_ohlcv_csv)
+    path = path or default_socket_path()
+    if os.path.exists(path):
+        try:
+            request({"op": "status"}, path=path, timeout=2)
+        except OSError:
+            os.unlink(path)  # stale socket from a crashed daemon
+        else:
+            raise SystemExit(f"a daemon is already listening on {path}")
+    old_umask = os.umask(0o177)  # socket usable by this user only
+    try:
+        server = _Server(path, frames, configs)
+    finally:
+        os.umask(old_umask)
+    print(f"[daemon] pid {os.getpid()} listening on {path} ({len(frames)} dataset(s) preloaded)", file=sys.stderr)
+
+    def on_term(_signum: int, _frame: Any) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, on_term)
+    server.timeout = 0.5
+    try:
+        while not server.stopping:
+            server.handle_request()
+            server.collect_children()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+        print("[daemon] stopped", file=sys.stderr)
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import pathlib
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..profiling import count, stage
+from .csv_loader import OHLCV_COLUMNS, normalize_ohlcv_frame, resolve_ohlcv_columns
+
+
+# Chunked ingestion for OHLCV files that do not fit in memory.
+# Every chunk yielded here has the same shape as load_ohlcv_csv output
+# (UTC 'timestamp' index, float64 open/high/low/close/volume), so chunks can be
+# fed to the streaming backtest or written to the columnar store below.
+
+DEFAULT_CHUNKSIZE = 100_000
+STORE_VERSION = 1
+_STORE_DTYPES = {"timestamp": "<i8", **{c: "<f8" for c in OHLCV_COLUMNS}}
+
+
+def _index_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """Epoch nanoseconds (int64) regardless of the index resolution."""
+    return index.as_unit("ns").asi8
+
+
+def _chunk_from_arrays(ts: np.ndarray, cols: Mapping[str, np.ndarray]) -> pd.DataFrame:
+    idx = pd.DatetimeIndex(pd.to_datetime(ts, unit="ns", utc=True), name="timestamp")
+    return pd.DataFrame({c: np.asarray(cols[c], dtype="float64") for c in OHLCV_COLUMNS}, index=idx)
+
+
+def _read_normalized_chunks(
+    path: str | pathlib.Path,
+    *,
+    chunksize: int,
+    column_map: Optional[Mapping[str, str]],
+) -> Iterator[pd.DataFrame]:
+    """Yield validated chunks in file order (not sorted)."""
+    header = pd.read_csv(path, nrows=0).columns
+    columns = resolve_ohlcv_columns(header, column_map)
+    reader = pd.read_csv(path, usecols=list(columns.values()), chunksize=int(chunksize))
+    for raw in reader:
+        with stage("ingest.normalize_chunk"):
+            df = normalize_ohlcv_frame(raw, columns)
+            if len(df) == 0:
+                continue
+            df = df.set_index("timestamp")[list(OHLCV_COLUMNS)].astype("float64")
+        count("ingest.rows", len(df))
+        yield df
+
+
+def is_time_sorted(
+    path: str | pathlib.Path,
+    *,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    column_map: Optional[Mapping[str, str]] = None,
+) -> bool:
+    """Scan only the timestamp column and report whether the file is non-decreasing in time."""
+    header = pd.read_csv(path, nrows=0).columns
+    ts_col = resolve_ohlcv_columns(header, column_map)["timestamp"]
+    last = None
+    for raw in pd.read_csv(path, usecols=[ts_col], chunksize=int(chunksize)):
+        ts = pd.to_datetime(raw[ts_col], utc=True, errors="coerce").dropna()
+        if len(ts) == 0:
+            continue
+        if not ts.is_monotonic_increasing:
+            return False
+        if last is not None and ts.iloc[0] < last:
+            return False
+        last = ts.iloc[-1]
+    return True
+
+
+def _check_sorted(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    last = None
+    for df in chunks:
+        if not df.index.is_monotonic_increasing or (last is not None and df.index[0] < last):
+            raise ValueError("CSV is not time-sorted; use sort='external' (or 'auto')")
+        last = df.index[-1]
+        yield df
+
+
+def _spill_runs(chunks: Iterable[pd.DataFrame], run_dir: pathlib.Path) -> List[pathlib.Path]:
+    """Sort each chunk in memory and write it as one run of .npy column files."""
+    runs: List[pathlib.Path] = []
+    for k, df in enumerate(chunks):
+        df = df.sort_index(kind="stable")
+        d = run_dir / f"run{k:05d}"
+        d.mkdir()
+        np.save(d / "timestamp.npy", _index_ns(df.index))
+        for c in OHLCV_COLUMNS:
+            np.save(d / f"{c}.npy", df[c].to_numpy(dtype="float64"))
+        runs.append(d)
+    return runs
+
+
+def _merge_runs(runs: List[pathlib.Path], *, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    K-way merge of sorted runs with bounded memory.
+    Each round takes at most ~chunksize/k rows from every run (memory-mapped), cut at the
+    smallest block-end timestamp so that everything emitted is globally ordered.
+    """
+    if not runs:
+        return
+    cols = [{c: np.load(d / f"{c}.npy", mmap_mode="r") for c in ("timestamp",) + OHLCV_COLUMNS} for d in runs]
+    block = max(1, int(chunksize) // len(runs))
+    pos = [0] * len(runs)
+    while True:
+        active = [i for i in range(len(runs)) if pos[i] < len(cols[i]["timestamp"])]
+        if not active:
+            break
+        cutoff = min(
+            int(cols[i]["timestamp"][min(pos[i] + block, len(cols[i]["timestamp"])) - 1]) for i in active
+        )
+        parts_ts = []
+        parts = {c: [] for c in OHLCV_COLUMNS}
+        for i in active:
+            ts = cols[i]["timestamp"]
+            end = pos[i] + int(np.searchsorted(ts[pos[i]:], cutoff, side="right"))
+            parts_ts.append(np.asarray(ts[pos[i]:end]))
+            for c in OHLCV_COLUMNS:
+                parts[c].append(np.asarray(cols[i][c][pos[i]:end]))
+            pos[i] = end
+        ts = np.concatenate(parts_ts)
+        order = np.argsort(ts, kind="stable")
+        yield _chunk_from_arrays(ts[order], {c: np.concatenate(parts[c])[order] for c in OHLCV_COLUMNS})
+    # Drop memory maps before the caller removes the run files (required on Windows)
+    del cols
+
+
+def iter_ohlcv_chunks(
+    path: str | pathlib.Path,
+    *,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    column_map: Optional[Mapping[str, str]] = None,
+    sort: str = "auto",
+    tmp_dir: str | pathlib.Path | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read an OHLCV CSV in fixed-size chunks, yielding time-ordered DataFrames.
+
+    sort:
+      - "presorted": stream as-is; raises ValueError if time goes backwards.
+      - "external":  spill sorted runs to tmp_dir and k-way merge them.
+      - "auto":      scan timestamps first, then stream or merge as needed.
+    Peak memory is bounded by chunksize rows regardless of file size.
+    """
+    if sort not in ("auto", "presorted", "external"):
+        raise ValueError("sort must be 'auto', 'presorted' or 'external'")
+    if sort == "auto":
+        sort = "presorted" if is_time_sorted(path, chunksize=chunksize, column_map=column_map) else "external"
+    chunks = _read_normalized_chunks(path, chunksize=chunksize, column_map=column_map)
+    if sort == "presorted":
+        yield from _check_sorted(chunks)
+        return
+    with tempfile.TemporaryDirectory(prefix="fxbot_runs_", dir=tmp_dir) as td:
+        runs = _spill_runs(chunks, pathlib.Path(td))
+        yield from _merge_runs(runs, chunksize=chunksize)
+
+
+# -------- Columnar store (one raw little-endian file per column + meta.json) --------
+
+def write_ohlcv_store(chunks: Iterable[pd.DataFrame], out_dir: str | pathlib.Path) -> pathlib.Path:
+    """Append time-ordered chunks to a columnar store directory and return its path."""
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    files = {c: open(out / f"{c}.bin", "wb") for c in _STORE_DTYPES}
+    rows = 0
+    first = last = None
+    try:
+        for df in _check_sorted(chunks):
+            files["timestamp"].write(_index_ns(df.index).astype(_STORE_DTYPES["timestamp"]).tobytes())
+            for c in OHLCV_COLUMNS:
+                files[c].write(df[c].to_numpy(dtype=_STORE_DTYPES[c]).tobytes())
+            rows += len(df)
+            first = df.index[0] if first is None else first
+            last = df.index[-1]
+    finally:
+        for f in files.values():
+            f.close()
+    meta = {
+        "version": STORE_VERSION,
+        "rows": rows,
+        "dtypes": _STORE_DTYPES,
+        "start": first.isoformat() if first is not None else None,
+        "end": last.isoformat() if last is not None else None,
+    }
+    with open(out / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return out
+
+
+def ingest_ohlcv_csv(
+    path: str | pathlib.Path,
+    out_dir: str | pathlib.Path,
+    *,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    column_map: Optional[Mapping[str, str]] = None,
+    sort: str = "auto",
+    tmp_dir: str | pathlib.Path | None = None,
+) -> Dict[str, object]:
+    """CSV -> columnar store in bounded memory. Returns the store metadata."""
+    chunks = iter_ohlcv_chunks(path, chunksize=chunksize, column_map=column_map, sort=sort, tmp_dir=tmp_dir)
+    store = write_ohlcv_store(chunks, out_dir)
+    with open(store / "meta.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_ohlcv_store(path: str | pathlib.Path) -> Dict[str, np.ndarray]:
+    """Return read-only memory-mapped column arrays of a store."""
+    base = pathlib.Path(path)
+    with open(base / "meta.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if int(meta.get("version", 0)) != STORE_VERSION:
+        raise ValueError(f"unsupported store version: {meta.get('version')}")
+    rows = int(meta["rows"])
+    out: Dict[str, np.ndarray] = {}
+    for c, dt in meta["dtypes"].items():
+        if rows == 0:
+            out[c] = np.empty(0, dtype=dt)
+        else:
+            out[c] = np.memmap(base / f"{c}.bin", dtype=dt, mode="r", shape=(rows,))
+    return out
+
+
+def is_ohlcv_store(path: str | pathlib.Path) -> bool:
+    p = pathlib.Path(path)
+    return p.is_dir() and (p / "meta.json").exists()
+
+
+def iter_ohlcv_store(
+    path: str | pathlib.Path,
+    *,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    start: str | None = None,
+    end: str | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield chunks from a store, optionally restricted to [start, end] (UTC)."""
+    cols = open_ohlcv_store(path)
+    ts = cols["timestamp"]
+    lo = int(np.searchsorted(ts, pd.to_datetime(start, utc=True).value, side="left")) if start else 0
+    hi = int(np.searchsorted(ts, pd.to_datetime(end, utc=True).value, side="right")) if end else len(ts)
+    for i in range(lo, hi, int(chunksize)):
+        j = min(i + int(chunksize), hi)
+        yield _chunk_from_arrays(np.asarray(ts[i:j]), {c: cols[c][i:j] for c in OHLCV_COLUMNS})
+
+
+def load_ohlcv_store(path: str | pathlib.Path, *, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    """Load a (sliced) store into one DataFrame, same shape as load_ohlcv_csv."""
+    chunks = list(iter_ohlcv_store(path, chunksize=2**62, start=start, end=end))
+    if not chunks:
+        return _chunk_from_arrays(np.empty(0, dtype="int64"), {c: np.empty(0) for c in OHLCV_COLUMNS})
+    return chunks[0]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Mapping, Optional
+
+
+# Column-name resolution shared by the pandas loaders and fxbot.lite (standard library only).
+
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def resolve_ohlcv_columns(
+    columns: Iterable[str],
+    column_map: Optional[Mapping[str, str]] = None,
+) -> Dict[str, str]:
+    """
+    Map logical names (timestamp/open/high/low/close/volume) -> actual CSV column names.
+    Raises ValueError when timestamp or OHLC cannot be resolved. 'volume' may be absent.
+    """
+    columns = list(columns)
+    # Normalize lookup by lowercase
+    lower_map = {c.lower(): c for c in columns}
+
+    # Build desired mapping
+    want = {
+        "timestamp": None,
+        "open": None,
+        "high": None,
+        "low": None,
+        "close": None,
+        "volume": None,
+    }  # type: Dict[str, Optional[str]]
+
+    # Apply explicit mapping if provided
+    if column_map:
+        for k, v in column_map.items():
+            if k in want and v in columns:
+                want[k] = v
+
+    # Infer timestamp if not provided
+    if want["timestamp"] is None:
+        for cand in ("timestamp", "time", "date", "datetime"):
+            if cand in lower_map:
+                want["timestamp"] = lower_map[cand]
+                break
+
+    # Infer OHLC if not provided (common exact names cover most cases)
+    for k in OHLCV_COLUMNS:
+        if want[k] is None and k in lower_map:
+            want[k] = lower_map[k]
+
+    # Validate minimal required columns (OHLC and timestamp)
+    missing_min = [k for k in ("timestamp", "open", "high", "low", "close") if not want[k]]
+    if missing_min:
+        raise ValueError(f"CSV missing columns: {missing_min}")
+    return {k: v for k, v in want.items() if v is not None}
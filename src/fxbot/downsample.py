@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+
+# Visual downsampling for chart payloads. Both methods return sorted indices
+# into the original series (first and last point always kept), so timestamps
+# and values are sliced together.
+#   lttb:   Largest-Triangle-Three-Buckets; keeps the visual shape of a line.
+#   minmax: min and max of each bucket; keeps every extreme (drawdown troughs).
+
+METHODS = ("lttb", "minmax", "none")
+
+
+def lttb_indices(y: np.ndarray, n_out: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    # n_out - 2 buckets over the interior points; bucket i is [edges[i], edges[i + 1])
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:nhi].mean()
+        avg_y = y[hi:nhi].mean()
+        # Twice the triangle area (a, candidate, next-bucket average); constant factor irrelevant
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    buckets = (n_out - 2) // 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    picks = [np.array([0, n - 1], dtype=np.int64)]
+    lo_idx = np.empty(buckets, dtype=np.int64)
+    hi_idx = np.empty(buckets, dtype=np.int64)
+    for i in range(buckets):
+        seg = y[edges[i] : edges[i + 1]]
+        lo_idx[i] = edges[i] + int(np.argmin(seg))
+        hi_idx[i] = edges[i] + int(np.argmax(seg))
+    picks += [lo_idx, hi_idx]
+    return np.unique(np.concatenate(picks))
+
+
+def downsample_indices(y: np.ndarray, n_out: int, *, method: str = "lttb", x: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indices of at most n_out points (n_out <= 0 or method 'none': all points)."""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if method == "none" or n_out <= 0:
+        return np.arange(len(y))
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    return lttb_indices(y, n_out, x)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+
+# Bar-by-bar execution kernel shared by the batch and streaming backtests.
+# It works on plain Python sequences and keeps every piece of engine state in
+# EngineState, so a run can be split into chunks and resumed exactly.
+# Standard library only: fxbot.lite runs it without numpy/pandas.
+
+STOP_MODELS = ("close", "intrabar")
+INTRABAR_PATHS = ("worst", "best", "ohlc")
+
+
+@dataclass
+class EngineParams:
+    start_cash: float
+    atr_k_stop: float
+    slippage_pct: float = 0.0
+    fee_perc_roundturn: float = 0.0
+    per_trade_risk_pct: float = 0.25
+    daily_loss_stop_pct: float | None = None
+    stop_model: str = "close"  # "close": close <= stop; "intrabar": low <= stop, filled at stop/open
+    intrabar_path: str = "worst"  # which of stop/target fills first when one bar touches both
+    take_profit_k: float | None = None  # optional target at entry + k * ATR
+
+    def __post_init__(self) -> None:
+        if self.stop_model not in STOP_MODELS:
+            raise ValueError(f"stop_model must be one of {STOP_MODELS}")
+        if self.intrabar_path not in INTRABAR_PATHS:
+            raise ValueError(f"intrabar_path must be one of {INTRABAR_PATHS}")
+
+
+@dataclass
+class EngineState:
+    cash: float
+    equity: float
+    position: float = 0.0
+    entry_price: float = 0.0
+    atr_stop: float = math.nan
+    take_profit: float = math.nan
+    day: Any = None  # key of the current trading day (daily loss stop)
+    day_realized: float = 0.0
+
+    @classmethod
+    def initial(cls, start_cash: float) -> "EngineState":
+        return cls(cash=float(start_cash), equity=float(start_cash))
+
+
+def position_size_from_atr(entry_price: float, atr_value: float, atr_k_stop: float,
+                           equity: float, per_trade_risk_pct: float) -> float:
+    risk_jpy = equity * (per_trade_risk_pct / 100.0)
+    stop_distance = atr_k_stop * atr_value
+    if stop_distance <= 0:
+        return 0.0
+    units = risk_jpy / stop_distance
+    return max(0.0, units)
+
+
+def rollover_minutes(rollover: str | int | None) -> int:
+    """
+    Parse a trading-day rollover as minutes after local midnight.
+    Accepts "HH:MM" or an int (YAML 1.1 reads unquoted 17:00 as 1020 = minutes).
+    """
+    if rollover is None or rollover == "":
+        return 0
+    if isinstance(rollover, int):
+        return rollover
+    hh, _, mm = str(rollover).partition(":")
+    return int(hh) * 60 + int(mm or 0)
+
+
+class Fill(NamedTuple):
+    i: int  # bar offset within the processed chunk
+    side: str  # "entry" | "exit"
+    price: float
+    size: float
+    atr_stop: float
+    pnl: float
+
+
+def intrabar_exit(o: float, h: float, l: float, c: float, stop: float, target: float, path: str = "worst") -> Optional[float]:
+    """
+    Exit price of a long position inside one OHLC bar, or None if neither level traded.
+    A gap through a level fills at the open. When the bar spans both stop and target,
+    'path' decides: "worst" -> stop, "best" -> target, "ohlc" -> bar direction
+    (up bar assumed O-L-H-C, down bar O-H-L-C).
+    """
+    has_target = math.isfinite(target)
+    if o <= stop:
+        return o
+    if has_target and o >= target:
+        return o
+    stop_hit = l <= stop
+    target_hit = has_target and h >= target
+    if stop_hit and target_hit:
+        if path == "best" or (path == "ohlc" and c < o):
+            return target
+        return stop
+    if stop_hit:
+        return stop
+    if target_hit:
+        return target
+    return None
+
+
+def run_bars(
+    state: EngineState,
+    p: EngineParams,
+    close: Sequence[float],
+    signal: Sequence[int],
+    atr: Sequence[float],
+    *,
+    allow: Optional[Sequence[bool]] = None,
+    day: Optional[Sequence[Any]] = None,
+    open_: Optional[Sequence[float]] = None,
+    high: Optional[Sequence[float]] = None,
+    low: Optional[Sequence[float]] = None,
+) -> Tuple[List[float], List[Fill]]:
+    """
+    Long-only, flat/long switching with ATR stop; one position at a time.
+    Advances 'state' over the given bars and returns (realized pnl per bar, fills).
+    'allow' blocks entries (blackout); 'day' enables the daily loss stop.
+    With p.stop_model == "intrabar", 'open_'/'high'/'low' are required and stops
+    (and targets) are checked against the bar range before the close signal.
+    """
+    n = len(close)
+    pnl = [0.0] * n
+    fills: List[Fill] = []
+    cash, equity = state.cash, state.equity
+    position, entry_price, atr_stop = state.position, state.entry_price, state.atr_stop
+    take_profit = state.take_profit
+    cur_day, realized = state.day, state.day_realized
+    slip, fee_rt = p.slippage_pct, p.fee_perc_roundturn
+    daily_limit = None
+    if p.daily_loss_stop_pct is not None and day is not None:
+        daily_limit = -(p.start_cash * (p.daily_loss_stop_pct / 100.0))
+    intrabar = p.stop_model == "intrabar"
+    if intrabar and (open_ is None or high is None or low is None):
+        raise ValueError("stop_model='intrabar' needs open/high/low")
+    path = p.intrabar_path
+    tp_k = p.take_profit_k
+
+    for i in range(n):
+        price = close[i]
+        sig = signal[i]
+        a = atr[i]
+        if day is not None and day[i] != cur_day:
+            cur_day = day[i]
+            realized = 0.0
+
+        # Exit logic: if in position and signal drops or ATR stop hit
+        if position > 0:
+            fill_px = None
+            if intrabar:
+                # Stop/target touched inside the bar (gaps fill at the open)
+                fill_px = intrabar_exit(open_[i], high[i], low[i], price, atr_stop, take_profit, path)
+            elif price <= atr_stop or price >= take_profit:
+                # Stop-out approximated by close below stop
+                fill_px = price
+            if fill_px is None and sig == 0:
+                fill_px = price
+            if fill_px is not None:
+                px = fill_px * (1.0 - slip)
+                gross = (px - entry_price) * position
+                fee = abs(px * position) * fee_rt
+                trade_pnl = gross - fee
+                cash += trade_pnl
+                equity = cash
+                fills.append(Fill(i, "exit", px, position, atr_stop, trade_pnl))
+                position = 0.0
+                entry_price = 0.0
+                atr_stop = math.nan
+                take_profit = math.nan
+                pnl[i] = trade_pnl
+                realized += trade_pnl
+
+        # Entry logic: if flat and signal is long
+        if position == 0 and sig == 1 and math.isfinite(a) and a > 0:
+            # Blackout window for entries
+            if allow is not None and not allow[i]:
+                continue
+            # Enforce daily loss stop: if reached threshold today, skip new entries
+            if daily_limit is not None and realized <= daily_limit:
+                continue
+            units = position_size_from_atr(
+                entry_price=price,
+                atr_value=a,
+                atr_k_stop=p.atr_k_stop,
+                equity=equity,
+                per_trade_risk_pct=p.per_trade_risk_pct,
+            )
+            if units > 0:
+                px = price * (1.0 + slip)
+                fee = abs(px * units) * (fee_rt / 2.0)
+                # For FX, using units ~ notional JPY. Simplified cash handling.
+                entry_price = px
+                atr_stop = entry_price - p.atr_k_stop * a
+                if tp_k is not None:
+                    take_profit = entry_price + tp_k * a
+                position = units
+                fills.append(Fill(i, "entry", px, units, atr_stop, -fee))
+                cash -= fee
+                equity = cash
+
+    state.cash, state.equity = cash, equity
+    state.position, state.entry_price, state.atr_stop = position, entry_price, atr_stop
+    state.take_profit = take_profit
+    state.day, state.day_realized = cur_day, realized
+    return pnl, fills
+
+
+def close_out(state: EngineState, p: EngineParams, price: float) -> Optional[Fill]:
+    """Close any open position at 'price' (end of data). Returns the exit fill, if any."""
+    if state.position <= 0:
+        return None
+    px = price * (1.0 - p.slippage_pct)
+    gross = (px - state.entry_price) * state.position
+    fee = abs(px * state.position) * (p.fee_perc_roundturn / 2.0)
+    trade_pnl = gross - fee
+    state.cash += trade_pnl
+    state.equity = state.cash
+    fill = Fill(-1, "exit", px, state.position, state.atr_stop, trade_pnl)
+    state.position = 0.0
+    state.entry_price = 0.0
+    state.atr_stop = math.nan
+    state.take_profit = math.nan
+    return fill
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .indicators import atr, ema
+from .profiling import count, stage
+
+
+# Per-dataset feature store: named feature columns computed once, on first request,
+# and kept as one .npy file per feature under <root>/v<FEATURES_VERSION>-<digest>/
+# (opened memory-mapped, read-only), so strategies, AI callables and later runs
+# share them. Without a root the columns live in process memory only.
+#
+# Directories are content-addressed by a digest of the index and OHLCV columns
+# (dtypes included), so edited source data, another slice of it or a
+# FEATURES_VERSION bump lands in a fresh directory. A directory is built under a
+# temporary name and renamed into place with its meta.json, so concurrent workers
+# never see (or remove) a half-made one. Beyond MAX_DATASETS the least recently
+# opened directories are removed, except those opened by this process or within
+# PRUNE_GRACE_S; a store whose directory disappears anyway keeps new columns in
+# memory. Names are "<kind>_<n>" (see KINDS), e.g.
+# ema_20, atr_14, ret_1, lagret_3, sma_10, std_30, vol_20, z_50.
+#
+# The store also answers the ("ema", span) / ("atr", window) keys that
+# momo_atr.generate_signals / optimize.grid_search look up in their 'cache'
+# mapping, so passing a store there reuses (and persists) the indicators. As with
+# a plain dict cache, the frame must be the store's own frame, not a slice of it.
+
+FEATURES_VERSION = 1
+STORE_ENV = "FXBOT_FEATURE_STORE"
+MAX_DATASETS = 16  # per root
+PRUNE_GRACE_S = 3600.0  # datasets opened more recently are never pruned
+_NAME = re.compile(r"^([a-z]+)_(\d+)$")
+_OPEN = LRUCache(int(os.environ.get("FXBOT_FEATURE_MEMO", "4")), name="features")
+_IN_USE: set = set()  # dataset directories opened by this process (never pruned)
+_IN_USE_LOCK = threading.Lock()
+
+
+def _close(fs: "FeatureStore") -> pd.Series:
+    return pd.to_numeric(fs.frame["close"], errors="coerce").astype("float64")
+
+
+def _ret(fs: "FeatureStore", k: int) -> pd.Series:
+    c = _close(fs)
+    return c / c.shift(k) - 1.0
+
+
+def _logret(fs: "FeatureStore", k: int) -> pd.Series:
+    c = _close(fs)
+    return np.log(c / c.shift(k))
+
+
+def _lagret(fs: "FeatureStore", j: int) -> pd.Series:
+    return fs.series("ret_1").shift(j)
+
+
+def _sma(fs: "FeatureStore", w: int) -> pd.Series:
+    return _close(fs).rolling(w, min_periods=1).mean()
+
+
+def _std(fs: "FeatureStore", w: int) -> pd.Series:
+    return _close(fs).rolling(w, min_periods=1).std()
+
+
+def _vol(fs: "FeatureStore", w: int) -> pd.Series:
+    return fs.series("ret_1").rolling(w).std()
+
+
+def _z(fs: "FeatureStore", w: int) -> pd.Series:
+    return (_close(fs) - fs.series(f"sma_{w}")) / fs.series(f"std_{w}")
+
+
+def _ema(fs: "FeatureStore", span: int) -> pd.Series:
+    return ema(fs.frame["close"], span)
+
+
+def _atr(fs: "FeatureStore", w: int) -> pd.Series:
+    return atr(fs.frame["high"], fs.frame["low"], fs.frame["close"], window=w)
+
+
+# kind -> (compute(store, n), description); n >= 1
+KINDS: Dict[str, Tuple[Callable[["FeatureStore", int], pd.Series], str]] = {
+    "ret": (_ret, "n-bar simple return close/close[-n] - 1"),
+    "logret": (_logret, "n-bar log return"),
+    "lagret": (_lagret, "1-bar return lagged by n bars"),
+    "ema": (_ema, "EMA of close (indicators.ema, adjust=False)"),
+    "sma": (_sma, "rolling mean of close (min_periods=1)"),
+    "std": (_std, "rolling std of close (min_periods=1, ddof=1)"),
+    "vol": (_vol, "rolling std of 1-bar returns"),
+    "z": (_z, "(close - sma_n) / std_n"),
+    "atr": (_atr, "ATR (indicators.atr: EMA of true range)"),
+}
+
+
+def parse_name(name: str) -> Tuple[str, int]:
+    m = _NAME.match(name)
+    if not m or m.group(1) not in KINDS or int(m.group(2)) < 1:
+        raise KeyError(f"unknown feature {name!r}; expected <kind>_<n> with kind in {sorted(KINDS)}")
+    return m.group(1), int(m.group(2))
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Content digest of the index and OHLCV columns."""
+    cols = [c for c in ("open", "high", "low", "close", "volume") if c in df.columns]
+    h = hashlib.sha256(repr([(c, str(df[c].dtype)) for c in cols]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df[cols], index=True, categorize=False).to_numpy().tobytes())
+    return h.hexdigest()[:32]
+
+
+class FeatureStore:
+    """Lazily computed, optionally file-backed feature columns of one OHLCV frame (read-only arrays)."""
+
+    def __init__(self, df: pd.DataFrame, *, directory: Path | None = None):
+        self.frame = df
+        self.index = df.index
+        self.directory = directory
+        self.root = str(directory.parent) if directory is not None else None
+        self._cols: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    # ---- features ----
+
+    def get(self, name: str) -> np.ndarray:
+        """Feature column as a read-only float array (memory-mapped when file-backed)."""
+        arr = self._cols.get(name)
+        if arr is not None:
+            count("features.hit")
+            return arr
+        kind, n = parse_name(name)
+        with self._lock:
+            arr = self._cols.get(name)
+            if arr is None:
+                arr = self._load(name)
+                if arr is None:
+                    count("features.computed")
+                    with stage(f"features.compute.{kind}"):
+                        values = np.asarray(KINDS[kind][0](self, n), dtype="float64")
+                    arr = self._save(name, values)
+                else:
+                    count("features.disk_hit")
+                self._cols[name] = arr
+        return arr
+
+    def series(self, name: str) -> pd.Series:
+        return pd.Series(self.get(name), index=self.index, name=name, copy=False)
+
+    def columns(self, names: Iterable[str], start: int | None = None, stop: int | None = None) -> pd.DataFrame:
+        """The named features for rows [start, stop) as a DataFrame (only these are computed)."""
+        names = list(names)
+        sl = slice(start, stop)
+        return pd.DataFrame({n: self.get(n)[sl] for n in names}, index=self.index[sl])
+
+    def available(self) -> List[str]:
+        names = set(self._cols)
+        if self.directory is not None and self.directory.is_dir():
+            names |= {p.stem for p in self.directory.glob("*.npy")}
+        return sorted(names)
+
+    def _load(self, name: str) -> Optional[np.ndarray]:
+        if self.directory is None:
+            return None
+        p = self.directory / f"{name}.npy"
+        try:
+            arr = np.load(p, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return arr if arr.shape == (len(self),) else None
+
+    def _save(self, name: str, values: np.ndarray) -> np.ndarray:
+        if self.directory is None:
+            values.flags.writeable = False
+            return values
+        tmp = self.directory / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp, self.directory / f"{name}.npy")  # atomic: other readers never see partial files
+            return np.load(self.directory / f"{name}.npy", mmap_mode="r")
+        except OSError:
+            # Directory removed by another process's prune, disk full, ...: keep the column in memory
+            count("features.save_failed")
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            values.flags.writeable = False
+            return values
+
+    # ---- Mapping protocol used as the generate_signals / grid_search 'cache' ----
+
+    @staticmethod
+    def _cache_name(key: Hashable) -> Optional[str]:
+        if isinstance(key, tuple) and len(key) == 2 and key[0] in ("ema", "atr"):
+            return f"{key[0]}_{int(key[1])}"
+        return None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._cache_name(key) is not None
+
+    def __getitem__(self, key: Hashable) -> pd.Series:
+        name = self._cache_name(key)
+        if name is None:
+            raise KeyError(key)
+        return self.series(name)
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        raise TypeError("FeatureStore computes its own columns")
+
+
+def _read_meta(d: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((d / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _dataset_dir(root: Path, digest: str, rows: int) -> Optional[Path]:
+    """The dataset's directory, published (with meta.json) if new; None when it is unusable."""
+    d = root / f"v{FEATURES_VERSION}-{digest}"
+    if not d.exists():
+        tmp = root / f".{d.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.mkdir(parents=True, exist_ok=True)
+        (tmp / "meta.json").write_text(json.dumps({"version": FEATURES_VERSION, "rows": rows, "digest": digest}), encoding="utf-8")
+        try:
+            os.rename(tmp, d)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another worker published it first
+    if _read_meta(d).get("rows") != rows:
+        # Leftover of an interrupted write by an older version: use memory; _prune removes it later
+        return None
+    try:
+        os.utime(d)  # recency for pruning
+    except OSError:
+        return None
+    with _IN_USE_LOCK:
+        _IN_USE.add(d)
+    return d
+
+
+def _prune(root: Path) -> None:
+    cutoff = time.time() - PRUNE_GRACE_S
+    with _IN_USE_LOCK:
+        in_use = {p.name for p in _IN_USE if p.parent == root}
+    dirs = []
+    for p in root.iterdir():
+        try:
+            if p.is_dir() and p.name not in in_use:
+                dirs.append((p.stat().st_mtime, p))
+        except OSError:
+            continue  # removed meanwhile
+    # Unfinished temp/aside directories of crashed workers go once past the grace period
+    done = [(t, p) for t, p in dirs if not p.name.startswith(".")]
+    stale = [p for t, p in dirs if p.name.startswith(".") and t < cutoff]
+    done.sort(key=lambda tp: tp[0], reverse=True)
+    stale += [p for t, p in done[max(0, MAX_DATASETS - len(in_use)):] if t < cutoff]
+    for p in stale:
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def open_features(df: pd.DataFrame, *, root: str | os.PathLike | None = None) -> FeatureStore:
+    """
+    Feature store of df, memoized per frame object (treat df as read-only afterwards).
+    'root' defaults to $FXBOT_FEATURE_STORE; without either, an already open store of
+    df is reused (whatever its root), else the store is in-memory.
+    """
+    root = root if root is not None else (os.environ.get(STORE_ENV) or None)
+    store = _OPEN.get(id(df))
+    if store is not None and store.frame is df and (root is None or store.root == str(Path(root))):
+        return store
+    with stage("features.open"):
+        directory = None
+        if root is not None:
+            base = Path(root)
+            base.mkdir(parents=True, exist_ok=True)
+            directory = _dataset_dir(base, frame_digest(df), len(df))
+            _prune(base)
+        store = FeatureStore(df, directory=directory)
+    _OPEN.put(id(df), store)
+    return store
@@ -3,26 +3,39 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 
+from .profiling import profiled
 
-def ema(series: pd.Series, span: int) -> pd.Series:
-    return series.ewm(span=span, adjust=False).mean()
+
+@profiled("indicators.ema")
+def ema(series: pd.Series, span: int, *, init: float | None = None) -> pd.Series:
+    """EMA (adjust=False). 'init' continues from a previous EMA value (chunked input)."""
+    if init is None:
+        return series.ewm(span=span, adjust=False).mean()
+    seeded = pd.concat([pd.Series([init], dtype=float), series.reset_index(drop=True)], ignore_index=True)
+    out = seeded.ewm(span=span, adjust=False).mean().iloc[1:]
+    out.index = series.index
+    return out
 
 
 def sma(series: pd.Series, window: int) -> pd.Series:
     return series.rolling(window).mean()
 
 
-def true_range(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
-    prev_close = close.shift(1)
+def true_range(high: pd.Series, low: pd.Series, close: pd.Series, *, prev_close: float | None = None) -> pd.Series:
+    prev_close_s = close.shift(1)
+    if prev_close is not None and len(prev_close_s):
+        prev_close_s.iloc[0] = prev_close
     tr = pd.concat([
         high - low,
-        (high - prev_close).abs(),
-        (low - prev_close).abs(),
+        (high - prev_close_s).abs(),
+        (low - prev_close_s).abs(),
     ], axis=1).max(axis=1)
     return tr
 
 
-def atr(high: pd.Series, low: pd.Series, close: pd.Series, window: int = 14) -> pd.Series:
-    tr = true_range(high, low, close)
-    return tr.ewm(span=window, adjust=False).mean()
-
+@profiled("indicators.atr")
+def atr(high: pd.Series, low: pd.Series, close: pd.Series, window: int = 14, *,
+        prev_close: float | None = None, init: float | None = None) -> pd.Series:
+    """ATR as EMA of true range. 'prev_close'/'init' carry state from the previous chunk."""
+    tr = true_range(high, low, close, prev_close=prev_close)
+    return ema(tr, window, init=init)
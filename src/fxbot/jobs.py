@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Background jobs for long web API operations (walk-forward, batch, snapshot rerun).
+# Jobs run on a thread pool inside the serving process; their state lives in a
+# SQLite table so any worker process (gunicorn) can report status, and a cancel
+# request written by one worker is seen by the worker running the job.
+# Cancellation is cooperative: the job function calls ctx.progress()/ctx.check(),
+# which raise JobCancelled once a cancel was requested.
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    message TEXT,
+    params TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner_pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs(created_at);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation was requested."""
+
+
+class JobStore:
+    """SQLite-backed job table (safe to share between threads and processes)."""
+
+    def __init__(self, path: str | pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as c:
+            c.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # One connection per thread; never reuse one inherited through fork (pre-fork servers)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, kind: str, params: Dict[str, Any] | None = None) -> str:
+        job_id = uuid.uuid4().hex
+        with self._conn() as c:
+            c.execute(
+                "INSERT INTO jobs (id, kind, status, created_at, params, owner_pid) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, time.time(), json.dumps(params or {}, ensure_ascii=False, default=str), os.getpid()),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if not fields:
+            return
+        for k in ("result", "params"):
+            if k in fields and fields[k] is not None and not isinstance(fields[k], str):
+                fields[k] = json.dumps(fields[k], ensure_ascii=False, default=str)
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._conn() as c:
+            c.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str, *, with_result: bool = True) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_dict(row, with_result) if row is not None else None
+
+    def list(self, *, limit: int = 50, kind: str | None = None, status: str | None = None) -> List[Dict[str, Any]]:
+        q = "SELECT * FROM jobs"
+        where, args = [], []
+        if kind:
+            where.append("kind = ?")
+            args.append(kind)
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        q += " ORDER BY created_at DESC LIMIT ?"
+        args.append(int(limit))
+        return [_row_to_dict(r, False) for r in self._conn().execute(q, args).fetchall()]
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Flag a job for cancellation. Queued jobs are cancelled at once. False if already finished/unknown."""
+        with self._conn() as c:
+            cur = c.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,)
+            )
+            c.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+        return cur.rowcount > 0
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self._conn().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def fail_orphans(self) -> int:
+        """Mark queued/running jobs whose owner process is gone (server restart) as failed."""
+        rows = self._conn().execute("SELECT id, owner_pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        dead = [r["id"] for r in rows if not _pid_alive(r["owner_pid"])]
+        with self._conn() as c:
+            c.executemany(
+                "UPDATE jobs SET status = 'failed', error = 'interrupted (server restarted)', finished_at = ? WHERE id = ?",
+                [(time.time(), i) for i in dead],
+            )
+        return len(dead)
+
+    def prune(self, *, max_age_s: float) -> int:
+        with self._conn() as c:
+            cur = c.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?",
+                (time.time() - max_age_s,),
+            )
+        return cur.rowcount
+
+
+def _pid_alive(pid: Any) -> bool:
+    if not pid:
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True  # exists but not ours / cannot tell (Windows)
+    return True
+
+
+def _row_to_dict(row: sqlite3.Row, with_result: bool) -> Dict[str, Any]:
+    done, total = int(row["progress_done"] or 0), row["progress_total"]
+    out: Dict[str, Any] = {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+        "progress": {"done": done, "total": total, "pct": (100.0 * done / total) if total else None},
+        "message": row["message"],
+        "params": json.loads(row["params"]) if row["params"] else {},
+        "error": row["error"],
+        "cancel_requested": bool(row["cancel_requested"]),
+    }
+    if with_result and row["result"] is not None:
+        out["result"] = json.loads(row["result"])
+    return out
+
+
+class JobContext:
+    """Handed to job functions: progress reporting and cooperative cancellation."""
+
+    def __init__(self, store: JobStore, job_id: str, cancel_event: threading.Event, *, min_interval: float = 0.5):
+        self.store = store
+        self.job_id = job_id
+        self._cancel = cancel_event
+        self._min_interval = min_interval
+        self._last_write = 0.0
+        self._last_poll = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        if self._cancel.is_set():
+            return True
+        now = time.monotonic()
+        if now - self._last_poll >= self._min_interval:
+            # Cancel may have been requested through another worker process
+            self._last_poll = now
+            if self.store.cancel_requested(self.job_id):
+                self._cancel.set()
+        return self._cancel.is_set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress(self, done: int, total: int | None = None, message: str | None = None) -> None:
+        """Record progress (DB writes throttled) and raise JobCancelled if cancellation was requested."""
+        now = time.monotonic()
+        if now - self._last_write >= self._min_interval or (total is not None and done >= total):
+            self._last_write = now
+            fields: Dict[str, Any] = {"progress_done": int(done)}
+            if total is not None:
+                fields["progress_total"] = int(total)
+            if message is not None:
+                fields["message"] = message
+            self.store.update(self.job_id, **fields)
+        self.check()
+
+
+class JobManager:
+    """Thread-pool executor over a JobStore. fn(ctx) must return a JSON-serializable result."""
+
+    def __init__(self, store: JobStore, *, max_workers: int = 2, retention_s: float = 7 * 86_400):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="fxbot-job")
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        store.fail_orphans()
+        store.prune(max_age_s=retention_s)
+
+    def submit(self, kind: str, fn: Callable[[JobContext], Any], params: Dict[str, Any] | None = None) -> str:
+        job_id = self.store.create(kind, params)
+        ev = threading.Event()
+        with self._lock:
+            self._events[job_id] = ev
+        self._pool.submit(self._run, job_id, fn, ev)
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[[JobContext], Any], ev: threading.Event) -> None:
+        try:
+            if self.store.cancel_requested(job_id):
+                return  # cancelled while queued
+            self.store.update(job_id, status="running", started_at=time.time())
+            ctx = JobContext(self.store, job_id, ev)
+            try:
+                result = fn(ctx)
+            except JobCancelled:
+                self.store.update(job_id, status="cancelled", finished_at=time.time())
+                return
+            except Exception as e:
+                self.store.update(job_id, status="failed", error=str(e) or type(e).__name__,
+                                  message=traceback.format_exc(limit=5), finished_at=time.time())
+                return
+            self.store.update(job_id, status="succeeded", result=result, finished_at=time.time())
+        finally:
+            with self._lock:
+                self._events.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        ok = self.store.request_cancel(job_id)
+        with self._lock:
+            ev = self._events.get(job_id)
+        if ev is not None:
+            ev.set()
+        return ok
+
+    def get(self, job_id: str, *, with_result: bool = True) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id, with_result=with_result)
+
+    def list(self, **kw: Any) -> List[Dict[str, Any]]:
+        return self.store.list(**kw)
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            for ev in self._events.values():
+                ev.set()
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,670 @@
+from __future__ import annotations
+
+import bisect
+import csv
+import json
+import math
+import pathlib
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from .data.columns import resolve_ohlcv_columns
+from .engine import EngineParams, EngineState, Fill, close_out, rollover_minutes, run_bars
+from .profiling import count, profiled
+
+
+# Dependency-free twin of the pandas pipeline (load -> signals -> backtest ->
+# metrics -> grid search -> walk-forward) on standard-library arrays.
+# It drives the same execution kernel (fxbot.engine) and evaluates every formula
+# the way the pandas path does, so results match fxbot.backtest / optimize /
+# walkforward without numpy or pandas installed. Used by scripts/offline_backtest.py
+# and scripts/free_quickstart.py.
+# Timestamps are int epoch nanoseconds (UTC); windows are zero-copy memoryview slices.
+# CSV prices go through float() (correctly rounded); pandas' C parser can differ in
+# the last bit for 17-digit values, so compare the two paths on the same parsed bars.
+
+_NS = 1_000_000_000
+NS_PER_DAY = 86_400 * _NS
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+TRADE_FIELDS = ("entry_time", "exit_time", "entry", "exit", "size", "atr_stop")
+
+
+# -------- Timestamps --------
+
+def timestamp_ns(value: str | datetime) -> int:
+    """Epoch ns (UTC) of an ISO date/datetime string or datetime; naive values are read as UTC."""
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    d = dt - _EPOCH
+    return (d.days * 86_400 + d.seconds) * _NS + d.microseconds * 1_000
+
+
+def to_datetime(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=ns // 1_000)
+
+
+def _ts_str(ns: int) -> str:
+    # str() of a UTC datetime equals str(pd.Timestamp) for microsecond resolution
+    return str(to_datetime(ns))
+
+
+# -------- Bars --------
+
+@dataclass
+class Bars:
+    """Columnar OHLCV bars sorted by time: 't' in epoch ns (UTC), prices as float64 arrays."""
+
+    t: Sequence[int]
+    open: Sequence[float]
+    high: Sequence[float]
+    low: Sequence[float]
+    close: Sequence[float]
+    volume: Sequence[float]
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def columns(self) -> tuple:
+        return (self.t, self.open, self.high, self.low, self.close, self.volume)
+
+    def window(self, start: int, stop: int) -> "Bars":
+        """Rows [start, stop) without copying."""
+        return Bars(*(memoryview(c)[start:stop] for c in self.columns()))
+
+    def between(self, start: str | None = None, end: str | None = None) -> "Bars":
+        """Rows with start <= t <= end (both inclusive, like the CLI's --start/--end)."""
+        lo = bisect.bisect_left(self.t, timestamp_ns(start)) if start else 0
+        hi = bisect.bisect_right(self.t, timestamp_ns(end)) if end else len(self)
+        return self.window(lo, max(lo, hi))
+
+
+def _num(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+@profiled("lite.load")
+def read_ohlcv_csv(path: str | pathlib.Path, *, column_map: Optional[Mapping[str, str]] = None) -> Bars:
+    """
+    Same rules as fxbot.data.csv_loader.load_ohlcv_csv: flexible column names,
+    optional volume (0.0 when the column is absent), rows with an unparsable
+    timestamp or OHLC value dropped, sorted by time.
+    """
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        cols = resolve_ohlcv_columns(header, column_map)
+        it, io, ih, il, ic = (header.index(cols[k]) for k in ("timestamp", "open", "high", "low", "close"))
+        iv = header.index(cols["volume"]) if "volume" in cols else None
+        rows = []
+        for rec in reader:
+            try:
+                ns = timestamp_ns(rec[it])
+                o, h, l, c = float(rec[io]), float(rec[ih]), float(rec[il]), float(rec[ic])
+            except (ValueError, IndexError):
+                continue
+            if o != o or h != h or l != l or c != c:
+                continue
+            v = (_num(rec[iv]) if iv < len(rec) else math.nan) if iv is not None else 0.0
+            rows.append((ns, o, h, l, c, v))
+    rows.sort(key=lambda r: r[0])
+    count("load.rows", len(rows))
+    cols_out = list(zip(*rows)) if rows else [(), (), (), (), (), ()]
+    return Bars(array("q", cols_out[0]), *(array("d", c) for c in cols_out[1:]))
+
+
+def load_events_csv(path: str | pathlib.Path) -> List[int]:
+    """Event times (epoch ns, sorted) from a CSV with a 'timestamp' (or 'date') column."""
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [h.lower() for h in (next(reader, None) or [])]
+        col = "timestamp" if "timestamp" in header else "date" if "date" in header else None
+        if col is None:
+            raise ValueError("events CSV must include a 'timestamp' column")
+        i = header.index(col)
+        return sorted(timestamp_ns(rec[i]) for rec in reader if i < len(rec) and rec[i].strip())
+
+
+def blackout_allow(t: Sequence[int], events: Sequence[int], *, before_min: int, after_min: int) -> List[bool]:
+    """
+    True where entries are allowed; False within [event - before_min, event + after_min]
+    of any event (fxbot.events.build_blackout_mask). 'events' must be sorted.
+    """
+    if not events:
+        return [True] * len(t)
+    before, after = int(before_min) * 60 * _NS, int(after_min) * 60 * _NS
+    n_ev = len(events)
+    out = []
+    for ts in t:
+        j = bisect.bisect_left(events, ts - after)
+        out.append(not (j < n_ev and events[j] <= ts + before))
+    return out
+
+
+def trading_day_ids(t: Sequence[int], *, rollover: str | int | None = "00:00", tz: str | None = "UTC") -> List[int]:
+    """fxbot.risk.trading_day_ids on epoch-ns timestamps (UTC offsets looked up once per UTC day)."""
+    off = rollover_minutes(rollover) * 60 * _NS
+    if not tz or tz.upper() == "UTC":
+        return [(ns - off) // NS_PER_DAY for ns in t]
+    from zoneinfo import ZoneInfo
+
+    zone = ZoneInfo(tz)
+    offsets: Dict[int, Optional[int]] = {}  # UTC day -> offset, None if a DST transition falls inside
+
+    def utc_offset(ns: int) -> int:
+        d = to_datetime(ns).astimezone(zone).utcoffset()
+        return (d.days * 86_400 + d.seconds) * _NS
+
+    out = []
+    for ns in t:
+        day = ns // NS_PER_DAY
+        if day not in offsets:
+            a, b = utc_offset(day * NS_PER_DAY), utc_offset((day + 1) * NS_PER_DAY - 1)
+            offsets[day] = a if a == b else None
+        o = offsets[day]
+        out.append((ns + (o if o is not None else utc_offset(ns)) - off) // NS_PER_DAY)
+    return out
+
+
+# -------- Indicators and signals --------
+
+def ema(values: Sequence[float], span: int) -> List[float]:
+    """
+    EMA with adjust=False. Uses pandas' alpha and normalisation step
+    (((1 - a) * y + a * x) / ((1 - a) + a)) so the values are bit-identical to ewm().mean().
+    """
+    alpha = 1.0 / (1.0 + (span - 1) / 2.0)
+    keep = 1.0 - alpha
+    norm = keep + alpha
+    out = [float(v) for v in values]
+    if not out:
+        return out
+    y = out[0]
+    for i in range(1, len(out)):
+        y = (keep * y + alpha * out[i]) / norm
+        out[i] = y
+    return out
+
+
+def true_range(high: Sequence[float], low: Sequence[float], close: Sequence[float]) -> List[float]:
+    n = len(close)
+    if n == 0:
+        return []
+    tr = [high[0] - low[0]]
+    for i in range(1, n):
+        h, l, pc = high[i], low[i], close[i - 1]
+        tr.append(max(h - l, abs(h - pc), abs(l - pc)))
+    return tr
+
+
+def atr(high: Sequence[float], low: Sequence[float], close: Sequence[float], window: int = 14) -> List[float]:
+    return ema(true_range(high, low, close), window)
+
+
+@dataclass
+class Signals:
+    """Kernel inputs of one parameter set (rows dropped the way generate_signals' dropna() does)."""
+
+    t: Sequence[int]
+    open: Sequence[float]
+    high: Sequence[float]
+    low: Sequence[float]
+    close: Sequence[float]
+    atr: Sequence[float]
+    signal: List[int]
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+
+def _subset(values: Sequence[Any], keep: Optional[List[int]]) -> Sequence[Any]:
+    return values if keep is None else [values[i] for i in keep]
+
+
+@profiled("lite.signals")
+def generate_signals(bars: Bars, *, ema_fast: int, ema_slow: int, atr_window: int,
+                     vol_filter_min_atr_pct: float = 0.0, cache: Optional[Dict[Any, Any]] = None) -> Signals:
+    """
+    fxbot.strategies.momo_atr.generate_signals on Bars. 'cache' (a dict reused across
+    calls on the same bars) memoizes EMA/ATR per span/window, e.g. within a grid search.
+    """
+    cache = {} if cache is None else cache
+    close = bars.close
+
+    def cached(key: Any, compute: Callable[[], Any]) -> Any:
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
+    ef = cached(("ema", ema_fast), lambda: ema(close, ema_fast))
+    es = cached(("ema", ema_slow), lambda: ema(close, ema_slow))
+    a = cached(("atr", atr_window), lambda: atr(bars.high, bars.low, close, atr_window))
+    if vol_filter_min_atr_pct and vol_filter_min_atr_pct > 0:
+        vf = vol_filter_min_atr_pct
+        sig = [1 if f > s and c != 0 and x / c >= vf else 0 for f, s, x, c in zip(ef, es, a, close)]
+    else:
+        sig = [1 if f > s else 0 for f, s in zip(ef, es)]
+    # generate_signals drops rows with NaN anywhere: zero close (rel_atr) or a missing volume
+    keep = cached("keep", lambda: _valid_rows(bars))
+    return Signals(
+        t=_subset(bars.t, keep), open=_subset(bars.open, keep), high=_subset(bars.high, keep),
+        low=_subset(bars.low, keep), close=_subset(close, keep), atr=_subset(a, keep), signal=_subset(sig, keep),
+    )
+
+
+def _valid_rows(bars: Bars) -> Optional[List[int]]:
+    bad = [i for i, (c, v) in enumerate(zip(bars.close, bars.volume)) if c == 0 or v != v]
+    if not bad:
+        return None
+    drop = set(bad)
+    return [i for i in range(len(bars)) if i not in drop]
+
+
+# -------- Backtest --------
+
+@dataclass
+class Trade:
+    """Same fields as fxbot.backtest.Trade, with datetime timestamps."""
+
+    entry_time: datetime
+    exit_time: Optional[datetime]
+    entry: float
+    exit: Optional[float]
+    size: float
+    atr_stop: float
+
+
+def _trades_from_fills(fills: List[Fill], t: Sequence[int]) -> tuple[List[Trade], Optional[Trade]]:
+    trades: List[Trade] = []
+    open_trade = None
+    for f in fills:
+        if f.side == "entry":
+            open_trade = Trade(to_datetime(t[f.i]), None, f.price, None, f.size, f.atr_stop)
+            trades.append(open_trade)
+        elif open_trade is not None:
+            open_trade.exit_time = to_datetime(t[f.i])
+            open_trade.exit = f.price
+            open_trade = None
+    return trades, open_trade
+
+
+@profiled("lite.backtest")
+def run_backtest(
+    sig: Signals,
+    *,
+    start_cash: float,
+    atr_k_stop: float,
+    slippage_pct: float = 0.0,
+    fee_perc_roundturn: float = 0.0,
+    per_trade_risk_pct: float = 0.25,
+    daily_loss_stop_pct: float | None = None,
+    entry_allowed: Optional[Sequence[bool]] = None,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+    day_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    fxbot.backtest.run_backtest on Signals. Returns start_cash, end_cash, trades and
+    'pnl_series' as a plain list aligned with 't' (epoch ns). 'entry_allowed' is aligned
+    with the signal rows; 'day_ids' may pass precomputed trading_day_ids.
+    """
+    params = EngineParams(
+        start_cash=start_cash,
+        atr_k_stop=atr_k_stop,
+        slippage_pct=slippage_pct,
+        fee_perc_roundturn=fee_perc_roundturn,
+        per_trade_risk_pct=per_trade_risk_pct,
+        daily_loss_stop_pct=daily_loss_stop_pct,
+        stop_model=stop_model,
+        intrabar_path=intrabar_path,
+        take_profit_k=take_profit_k,
+    )
+    state = EngineState.initial(start_cash)
+    count("backtest.bars", len(sig))
+    day = None
+    if daily_loss_stop_pct is not None:
+        day = day_ids if day_ids is not None else trading_day_ids(sig.t, rollover=day_rollover, tz=day_rollover_tz)
+    bars = {"open_": sig.open, "high": sig.high, "low": sig.low} if stop_model == "intrabar" else {}
+    pnl, fills = run_bars(state, params, sig.close, sig.signal, sig.atr, allow=entry_allowed, day=day, **bars)
+    trades, open_trade = _trades_from_fills(fills, sig.t)
+    last = close_out(state, params, float(sig.close[-1])) if len(sig) else None
+    if last is not None and open_trade is not None:
+        open_trade.exit_time = to_datetime(sig.t[-1])
+        open_trade.exit = last.price
+        pnl[-1] = last.pnl
+    return {"start_cash": start_cash, "end_cash": state.cash, "trades": trades, "pnl_series": pnl, "t": sig.t}
+
+
+@profiled("lite.metrics")
+def metrics_from_pnl(pnl: Sequence[float], start_cash: float, end_cash: float, periods_per_year: int | None = None) -> Dict[str, Any]:
+    """
+    fxbot.report.metrics_from_pnl on a per-bar PnL list. Flat bars change neither
+    equity nor drawdown, so after one scan for nonzero bars the work is O(trades).
+    """
+    n = len(pnl)
+    nz = [(i, x) for i, x in enumerate(pnl) if x != 0.0 and x == x]
+    ann_factor = periods_per_year if periods_per_year else 24 * 252
+    # Per-bar returns pnl / previous equity (0 for the first bar and flat bars);
+    # equity is start_cash + cumsum(pnl), summed in that order as pandas does
+    rets: List[float] = []
+    cum = 0.0
+    first = float(pnl[0]) if n and pnl[0] == pnl[0] else 0.0
+    peak = start_cash + first
+    max_dd = 0.0
+    for i, x in nz:
+        prev = start_cash + cum
+        cum += x
+        if i > 0:
+            rets.append(x / prev if prev != 0 else 0.0)
+            eq = start_cash + cum
+            peak = max(peak, eq)
+            max_dd = min(max_dd, (eq - peak) / peak)
+    sharpe = 0.0
+    if n:
+        mean = math.fsum(rets) / n
+        var = (math.fsum((r - mean) ** 2 for r in rets) + (n - len(rets)) * mean * mean) / n
+        std = math.sqrt(var)
+        sharpe = 0.0 if std == 0 else (mean / std) * math.sqrt(ann_factor)
+    total_return = (end_cash / start_cash) - 1.0 if start_cash > 0 else 0.0
+
+    trades_pnl = [x for _, x in nz]
+    num_trades = len(trades_pnl)
+    wins = [x for x in trades_pnl if x > 0]
+    losses = [x for x in trades_pnl if x < 0]
+    gross_profit = math.fsum(wins)
+    gross_loss = math.fsum(losses)
+    profit_factor = (gross_profit / abs(gross_loss)) if gross_loss != 0 else (math.inf if gross_profit > 0 else 0.0)
+    return {
+        "total_return": float(total_return),
+        "sharpe_approx": float(sharpe),
+        "max_drawdown": float(max_dd),
+        "num_trades": num_trades,
+        "win_rate": float(len(wins)) / num_trades if num_trades > 0 else 0.0,
+        "avg_trade": math.fsum(trades_pnl) / num_trades if num_trades > 0 else 0.0,
+        "avg_win": gross_profit / len(wins) if wins else 0.0,
+        "avg_loss": gross_loss / len(losses) if losses else 0.0,
+        "profit_factor": float(profit_factor) if math.isfinite(profit_factor) else None,
+    }
+
+
+# -------- Optimization --------
+
+@profiled("lite.grid_search")
+def grid_search(
+    bars: Bars,
+    *,
+    ema_fast_list: List[int],
+    ema_slow_list: List[int],
+    atr_window_list: List[int],
+    atr_k_list: List[float],
+    vol_filter_min_atr_pct_list: List[float] | None = None,
+    start_cash: float,
+    slippage_pct: float,
+    fee_perc_roundturn: float,
+    per_trade_risk_pct: float,
+    daily_loss_stop_pct: float,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+    periods_per_year: int = 24 * 252,
+    max_dd_limit: float | None = None,
+    top_n: int | None = 10,
+    progress: Callable[[int, int], None] | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    fxbot.optimize.grid_search on Bars (same rows, order and top_n; top_n=None keeps all).
+    EMA/ATR series and trading-day ids are computed once per grid, not per combination.
+    """
+    vol_list = vol_filter_min_atr_pct_list or [0.0]
+    combos = [
+        (ef, es, aw, ak, vf)
+        for ef in ema_fast_list for es in ema_slow_list for aw in atr_window_list for ak in atr_k_list for vf in vol_list
+        if ef < es
+    ]
+    total = len(combos)
+    cache: Dict[Any, Any] = {}
+    day_ids = None
+    results: List[Dict[str, Any]] = []
+    for done, (ef, es, aw, ak, vf) in enumerate(combos, start=1):
+        count("optimize.combos")
+        sig = generate_signals(bars, ema_fast=int(ef), ema_slow=int(es), atr_window=int(aw),
+                               vol_filter_min_atr_pct=float(vf), cache=cache)
+        if day_ids is None and daily_loss_stop_pct is not None:
+            day_ids = trading_day_ids(sig.t, rollover=day_rollover, tz=day_rollover_tz)
+        res = run_backtest(
+            sig,
+            start_cash=start_cash,
+            atr_k_stop=float(ak),
+            slippage_pct=slippage_pct,
+            fee_perc_roundturn=fee_perc_roundturn,
+            per_trade_risk_pct=per_trade_risk_pct,
+            daily_loss_stop_pct=daily_loss_stop_pct,
+            stop_model=stop_model,
+            intrabar_path=intrabar_path,
+            take_profit_k=take_profit_k,
+            day_ids=day_ids,
+        )
+        met = metrics_from_pnl(res["pnl_series"], start_cash, res["end_cash"], periods_per_year)
+        if progress is not None:
+            progress(done, total)
+        if max_dd_limit is not None and abs(float(met.get("max_drawdown", 0.0))) > max_dd_limit:
+            continue
+        results.append({
+            "ema_fast": int(ef),
+            "ema_slow": int(es),
+            "atr_window": int(aw),
+            "atr_k": float(ak),
+            "vol_filter_min_atr_pct": float(vf),
+            **{k: float(v) if isinstance(v, (int, float)) else v for k, v in met.items()},
+        })
+    results.sort(key=lambda x: (float(x.get("sharpe_approx", 0.0)), float(x.get("total_return", 0.0))), reverse=True)
+    return results if top_n is None else results[: max(1, int(top_n))]
+
+
+def select_best(results: List[Dict[str, Any]], *, objective: str = "sharpe", min_trades: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Best grid row by objective ("sharpe" | "total_return"), preferring rows with at
+    least min_trades trades (all rows if none qualify). None for an empty grid.
+    """
+    cand = [r for r in results if r.get("num_trades", 0) >= min_trades] or results
+    if not cand:
+        return None
+    key = "sharpe_approx" if objective == "sharpe" else "total_return"
+    return max(cand, key=lambda r: float(r.get(key, 0.0)))
+
+
+@profiled("lite.walkforward")
+def walk_forward(
+    bars: Bars,
+    *,
+    train_bars: int,
+    test_bars: int,
+    step_bars: int | None,
+    ema_fast_list: List[int],
+    ema_slow_list: List[int],
+    atr_window_list: List[int],
+    atr_k_list: List[float],
+    vol_filter_min_atr_pct_list: List[float] | None,
+    start_cash: float,
+    slippage_pct: float,
+    fee_perc_roundturn: float,
+    per_trade_risk_pct: float,
+    daily_loss_stop_pct: float,
+    periods_per_year: int,
+    entry_allowed: Optional[Sequence[bool]] = None,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+    objective: str = "sharpe",
+    min_trades: int = 0,
+    progress: Callable[[int, int], None] | None = None,
+) -> Dict[str, Any]:
+    """
+    fxbot.walkforward.walk_forward on Bars ('entry_allowed' aligned with the bars).
+    Each fold's parameters come from select_best(objective, min_trades); the defaults
+    pick the same row as the pandas version. Also returns the stitched test-window
+    PnL as 'pnl_series' / 't'.
+    """
+    n = len(bars)
+    if n < train_bars + test_bars:
+        raise ValueError("Not enough data for one fold")
+    step = step_bars or test_bars
+    num_folds = (n - train_bars - test_bars) // step + 1
+    per_fold = sum(1 for ef in ema_fast_list for es in ema_slow_list if ef < es) \
+        * len(atr_window_list) * len(atr_k_list) * len(vol_filter_min_atr_pct_list or [0.0])
+    costs = {"slippage_pct": slippage_pct, "fee_perc_roundturn": fee_perc_roundturn,
+             "per_trade_risk_pct": per_trade_risk_pct, "daily_loss_stop_pct": daily_loss_stop_pct,
+             "day_rollover": day_rollover, "day_rollover_tz": day_rollover_tz,
+             "stop_model": stop_model, "intrabar_path": intrabar_path, "take_profit_k": take_profit_k}
+    i = 0
+    folds: List[Dict[str, Any]] = []
+    pnl_all: List[float] = []
+    t_all: List[int] = []
+    cash = start_cash
+    fold_progress = None
+    while i + train_bars + test_bars <= n:
+        trn = bars.window(i, i + train_bars)
+        tst = bars.window(i + train_bars, i + train_bars + test_bars)
+        if progress is not None:
+            offset = len(folds) * per_fold
+            fold_progress = lambda done, _total, offset=offset: progress(offset + done, num_folds * per_fold)
+        top = grid_search(
+            trn, ema_fast_list=ema_fast_list, ema_slow_list=ema_slow_list, atr_window_list=atr_window_list,
+            atr_k_list=atr_k_list, vol_filter_min_atr_pct_list=vol_filter_min_atr_pct_list, start_cash=cash,
+            periods_per_year=periods_per_year, max_dd_limit=None, progress=fold_progress, **costs,
+            top_n=1 if objective == "sharpe" and min_trades <= 0 else None,
+        )
+        best = select_best(top, objective=objective, min_trades=min_trades)
+        if best is None:
+            break
+        ef, es = int(best["ema_fast"]), int(best["ema_slow"])
+        aw, ak = int(best["atr_window"]), float(best["atr_k"])
+        vmin = float(best.get("vol_filter_min_atr_pct", 0.0))
+        sig = generate_signals(tst, ema_fast=ef, ema_slow=es, atr_window=aw, vol_filter_min_atr_pct=vmin)
+        allow = None
+        if entry_allowed is not None:
+            pos = {ts: k for k, ts in enumerate(bars.t[i + train_bars: i + train_bars + test_bars], start=i + train_bars)}
+            allow = [bool(entry_allowed[pos[ts]]) for ts in sig.t]
+        res = run_backtest(sig, start_cash=cash, atr_k_stop=ak, entry_allowed=allow, **costs)
+        met = metrics_from_pnl(res["pnl_series"], cash, res["end_cash"], periods_per_year)
+        folds.append({
+            "train_start": _ts_str(trn.t[0]),
+            "train_end": _ts_str(trn.t[-1]),
+            "test_start": _ts_str(tst.t[0]),
+            "test_end": _ts_str(tst.t[-1]),
+            "params": {"ema_fast": ef, "ema_slow": es, "atr_window": aw, "atr_k": ak, "vol_filter_min_atr_pct": vmin},
+            "metrics": met,
+        })
+        pnl_all.extend(res["pnl_series"])
+        t_all.extend(sig.t)
+        cash = float(res["end_cash"])
+        count("walkforward.folds")
+        i += step
+
+    # Overlapping test windows (step < test_bars) are stitched in time order, like pd.concat().sort_index()
+    order = sorted(range(len(t_all)), key=t_all.__getitem__)
+    pnl_sorted = [pnl_all[k] for k in order]
+    summary = metrics_from_pnl(pnl_sorted, start_cash, cash, periods_per_year) if pnl_sorted else {}
+    return {"start_cash": start_cash, "end_cash": cash, "summary": summary, "folds": folds,
+            "pnl_series": pnl_sorted, "t": [t_all[k] for k in order]}
+
+
+# -------- Reports --------
+
+def trade_rows(trades: Iterable[Trade]) -> List[Dict[str, Any]]:
+    """Trades with pnl (gross), ret_pct and hold_min, as in fxbot.report.trades_frame."""
+    out = []
+    for tr in trades:
+        row = {k: getattr(tr, k) for k in TRADE_FIELDS}
+        closed = tr.exit is not None
+        move = (tr.exit - tr.entry) if closed else None
+        row["pnl"] = move * tr.size if closed else None
+        row["ret_pct"] = move / tr.entry if closed and tr.entry != 0 else None
+        row["hold_min"] = (tr.exit_time - tr.entry_time).total_seconds() / 60.0 if tr.exit_time is not None else None
+        out.append(row)
+    return out
+
+
+def save_report(path: str | pathlib.Path, result: Dict[str, Any], *, periods_per_year: int | None = None,
+                extra: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Report JSON in the layout of fxbot.report.save_report (full per-bar PnL keyed by ISO time).
+    'extra' adds top-level keys (e.g. walk-forward folds).
+    """
+    pnl, t = result.get("pnl_series"), result.get("t")
+    has_pnl = pnl is not None and t is not None
+    summary = metrics_from_pnl(pnl, result["start_cash"], result["end_cash"], periods_per_year) if has_pnl else {}
+    payload = {
+        "start_cash": result.get("start_cash"),
+        "end_cash": result.get("end_cash"),
+        "summary": summary,
+        "trades": [
+            {k: (str(v) if isinstance(v, datetime) else v) for k, v in zip(TRADE_FIELDS, (getattr(tr, f) for f in TRADE_FIELDS))}
+            for tr in result.get("trades", [])
+        ],
+        "pnl": {to_datetime(ts).isoformat(): float(v) for ts, v in zip(t, pnl)} if has_pnl else {},
+        **(extra or {}),
+    }
+    out = pathlib.Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2, default=str)
+
+
+def _cell(v: Any) -> Any:
+    return "" if v is None else v
+
+
+def export_report_to_csvs(path: str | pathlib.Path, out_dir: str | pathlib.Path) -> Dict[str, str]:
+    """pnl.csv / trades.csv / summary.csv from a report JSON (fxbot.report.export_report_to_csvs without pandas)."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    out_dir = pathlib.Path(out_dir)
+    out: Dict[str, str] = {}
+
+    def write(name: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+        fp = out_dir / f"{name}.csv"
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        with open(fp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, lineterminator="\n")
+            w.writerow(header)
+            w.writerows(rows)
+        out[name] = str(fp)
+
+    pnl = data.get("pnl", {})
+    if isinstance(pnl, dict) and pnl:
+        items = sorted((timestamp_ns(k), v) for k, v in pnl.items())
+        write("pnl", ("timestamp", "pnl"), ((_ts_str(ns), v) for ns, v in items))
+    trades = data.get("trades", [])
+    if isinstance(trades, list) and trades:
+        recs = [
+            Trade(
+                entry_time=to_datetime(timestamp_ns(tr["entry_time"])),
+                exit_time=to_datetime(timestamp_ns(tr["exit_time"])) if tr.get("exit_time") else None,
+                entry=float(tr["entry"]), exit=None if tr.get("exit") is None else float(tr["exit"]),
+                size=float(tr["size"]), atr_stop=float(tr["atr_stop"]),
+            )
+            for tr in trades
+        ]
+        rows = trade_rows(recs)
+        header = list(rows[0])
+        write("trades", header, ([_cell(str(r[k]) if isinstance(r[k], datetime) else r[k]) for k in header] for r in rows))
+    summary = data.get("summary", {})
+    if isinstance(summary, dict) and summary:
+        # pandas stores an all-numeric value column as float64 (98 -> "98.0", NaN -> "")
+        numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in summary.values())
+        cells = [("" if math.isnan(v) else float(v)) if numeric else _cell(v) for v in summary.values()]
+        write("summary", ("metric", "value"), zip(summary.keys(), cells))
+    return out
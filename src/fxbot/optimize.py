@@ -1,72 +1,96 @@
 from __future__ import annotations
 
-import itertools
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List
 
+import numpy as np
 import pandas as pd
 
-from .strategies.momo_atr import generate_signals
 from .backtest import run_backtest
+from .features import FeatureStore
+from .strategies.registry import Strategy, get_strategy
 from .report import metrics_from_pnl
+from .profiling import count, profiled
 
 
+@profiled("optimize.grid_search")
 def grid_search(
     df: pd.DataFrame,
     *,
-    ema_fast_list: List[int],
-    ema_slow_list: List[int],
-    atr_window_list: List[int],
-    atr_k_list: List[float],
+    strategy: str | Strategy | None = "momo_atr",
+    grid: Dict[str, List[Any]] | None = None,
+    ema_fast_list: List[int] | None = None,
+    ema_slow_list: List[int] | None = None,
+    atr_window_list: List[int] | None = None,
+    atr_k_list: List[float] | None = None,
     vol_filter_min_atr_pct_list: List[float] | None = None,
     start_cash: float,
     slippage_pct: float,
     fee_perc_roundturn: float,
     per_trade_risk_pct: float,
     daily_loss_stop_pct: float,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
     periods_per_year: int = 24 * 252,
     max_dd_limit: float | None = None,
     top_n: int = 10,
+    progress: Callable[[int, int], None] | None = None,
+    cache: FeatureStore | None = None,
 ) -> List[Dict[str, Any]]:
-    results: List[Dict[str, Any]] = []
-    vol_list = vol_filter_min_atr_pct_list or [0.0]
-    for ef, es, aw, ak, vf in itertools.product(
-        ema_fast_list, ema_slow_list, atr_window_list, atr_k_list, vol_list
-    ):
-        # Enforce fast < slow to remove redundant/degenerate combos
-        if ef >= es:
-            continue
-        sig = generate_signals(
-            df,
-            ema_fast=int(ef),
-            ema_slow=int(es),
-            atr_window=int(aw),
-            vol_filter_min_atr_pct=float(vf),
-        )
-        res = run_backtest(
-            sig,
-            start_cash=start_cash,
-            atr_k_stop=float(ak),
-            slippage_pct=slippage_pct,
-            fee_perc_roundturn=fee_perc_roundturn,
-            per_trade_risk_pct=per_trade_risk_pct,
-            daily_loss_stop_pct=daily_loss_stop_pct,
-        )
-        met = metrics_from_pnl(res["pnl_series"], start_cash, res["end_cash"], periods_per_year)
-        # Filter by max drawdown if provided (limit as positive fraction, e.g., 0.2 for -20%)
-        if max_dd_limit is not None:
-            dd = float(met.get("max_drawdown", 0.0))
-            if abs(dd) > max_dd_limit:
-                continue
-        results.append(
-            {
-                "ema_fast": int(ef),
-                "ema_slow": int(es),
-                "atr_window": int(aw),
-                "atr_k": float(ak),
-                "vol_filter_min_atr_pct": float(vf),
-                **{k: float(v) if isinstance(v, (int, float)) else v for k, v in met.items()},
-            }
-        )
+    """
+    Exhaustive search over a registered strategy's parameter grid, best Sharpe first.
+    'grid' maps parameter names to value lists (the *_list arguments are the
+    momo_atr names); parameters not in the grid stay at their defaults.
+    progress(done, total) is called after each evaluated combination; raising
+    from it (e.g. a cancelled job) aborts the search.
+    Signals are built once per signal-parameter set (atr_k only changes the
+    backtest) from the feature store 'cache' (default: a fresh in-memory one);
+    pass df's store to share indicators with other calls on df (fxbot.pipeline).
+    """
+    strat = get_strategy(strategy)
+    legacy = {"ema_fast": ema_fast_list, "ema_slow": ema_slow_list, "atr_window": atr_window_list,
+              "atr_k": atr_k_list, "vol_filter_min_atr_pct": vol_filter_min_atr_pct_list}
+    combos = strat.grid({**{k: v for k, v in legacy.items() if v is not None}, **(grid or {})})
+    features = cache if cache is not None else FeatureStore(df)
+    # Combinations sharing signal parameters are evaluated together; rows keep grid order
+    groups: Dict[tuple, List[int]] = {}
+    for i, c in enumerate(combos):
+        groups.setdefault(tuple(strat.signal_params(c).values()), []).append(i)
+    rows: Dict[int, Dict[str, Any]] = {}
+    total = len(combos)
+    done = 0
+    for idxs in groups.values():
+        count("optimize.signals")
+        sig = strat.generate(df, combos[idxs[0]], features=features)
+        for i in idxs:
+            count("optimize.combos")
+            done += 1
+            res = run_backtest(
+                sig,
+                start_cash=start_cash,
+                atr_k_stop=float(combos[i]["atr_k"]),
+                slippage_pct=slippage_pct,
+                fee_perc_roundturn=fee_perc_roundturn,
+                per_trade_risk_pct=per_trade_risk_pct,
+                daily_loss_stop_pct=daily_loss_stop_pct,
+                day_rollover=day_rollover,
+                day_rollover_tz=day_rollover_tz,
+                stop_model=stop_model,
+                intrabar_path=intrabar_path,
+                take_profit_k=take_profit_k,
+            )
+            met = metrics_from_pnl(res["pnl_series"], start_cash, res["end_cash"], periods_per_year)
+            if progress is not None:
+                progress(done, total)
+            # Filter by max drawdown if provided (limit as positive fraction, e.g., 0.2 for -20%)
+            if max_dd_limit is not None:
+                dd = float(met.get("max_drawdown", 0.0))
+                if abs(dd) > max_dd_limit:
+                    continue
+            rows[i] = {**combos[i], **{k: float(v) if isinstance(v, (int, float)) else v for k, v in met.items()}}
+    results = [rows[i] for i in sorted(rows)]
 
     # Sort by Sharpe approx desc, then total return desc
     def _key(x: Dict[str, Any]):
@@ -77,3 +101,91 @@ def grid_search(
 
     results.sort(key=_key, reverse=True)
     return results[: max(1, int(top_n))]
+
+
+def _frame_with_atr(df: pd.DataFrame) -> pd.DataFrame:
+    from .strategies.ai_bridge import dummy_atr
+
+    if "atr" in df.columns:
+        return df
+    out = df.copy()
+    out["atr"] = dummy_atr(out)
+    return out
+
+
+@profiled("optimize.threshold_search")
+def threshold_search(
+    df: pd.DataFrame,
+    scores: pd.Series | np.ndarray,
+    *,
+    threshold_list: List[float],
+    atr_k_list: List[float],
+    start_cash: float,
+    slippage_pct: float,
+    fee_perc_roundturn: float,
+    per_trade_risk_pct: float,
+    daily_loss_stop_pct: float,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+    periods_per_year: int = 24 * 252,
+    max_dd_limit: float | None = None,
+    top_n: int | None = 10,
+    progress: Callable[[int, int], None] | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    grid_search for AI-callable strategies: threshold x atr_k over precomputed scores
+    (ai_bridge.score_callable), best Sharpe first; top_n=None keeps all rows.
+    Each row matches generate_signals_from_callable(threshold) + run_backtest(atr_k),
+    but the callable is not invoked again: the signals of all thresholds are built as
+    one matrix and run through backtest.run_backtest_matrix.
+    """
+    from .backtest import run_backtest_matrix
+    from .strategies.ai_bridge import threshold_signals
+
+    for c in ("open", "high", "low", "close"):
+        if c not in df.columns:
+            raise ValueError(f"input DataFrame missing required column: {c}")
+    frame = _frame_with_atr(df)
+    sig = threshold_signals(scores, threshold_list)  # scores are row-aligned with df
+    runs = run_backtest_matrix(
+        frame,
+        sig,
+        atr_k_list=atr_k_list,
+        start_cash=start_cash,
+        slippage_pct=slippage_pct,
+        fee_perc_roundturn=fee_perc_roundturn,
+        per_trade_risk_pct=per_trade_risk_pct,
+        daily_loss_stop_pct=daily_loss_stop_pct,
+        day_rollover=day_rollover,
+        day_rollover_tz=day_rollover_tz,
+        stop_model=stop_model,
+        intrabar_path=intrabar_path,
+        take_profit_k=take_profit_k,
+    )
+    total = len(threshold_list) * len(atr_k_list)
+    results: List[Dict[str, Any]] = []
+    metrics: Dict[int, Dict[str, Any]] = {}  # identical runs (same signals) share metrics
+    done = 0
+    for th, row in zip(threshold_list, runs):
+        for ak, res in zip(atr_k_list, row):
+            count("optimize.combos")
+            done += 1
+            met = metrics.get(id(res))
+            if met is None:
+                met = metrics[id(res)] = metrics_from_pnl(res["pnl_series"], start_cash, res["end_cash"], periods_per_year)
+            if progress is not None:
+                progress(done, total)
+            if max_dd_limit is not None and abs(float(met.get("max_drawdown", 0.0))) > max_dd_limit:
+                continue
+            results.append(
+                {
+                    "threshold": float(th),
+                    "atr_k": float(ak),
+                    **{k: float(v) if isinstance(v, (int, float)) else v for k, v in met.items()},
+                }
+            )
+    results.sort(key=lambda x: (float(x.get("sharpe_approx", 0.0)), float(x.get("total_return", 0.0))), reverse=True)
+    return results if top_n is None else results[: max(1, int(top_n))]
@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import os
+import pathlib
+import re
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .backtest import kernel_inputs
+from .engine import EngineParams, EngineState, Fill, run_bars
+from .report import metrics_from_pnl
+
+try:  # cross-process session locks (POSIX); Windows falls back to in-process locks
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+# Step-by-step paper trading and the per-session registry used by the web UI.
+# Each session owns one PaperEngine. Its mutable state (a few scalars plus the
+# realized trades) is saved as JSON under <state_dir>/<session>/ after every
+# change; the signal frame is not saved but rebuilt from the session spec by a
+# factory, so any worker process can pick a session up after a restart.
+# Engines idle longer than idle_ttl_s are dropped from memory (not from disk).
+
+_SID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def valid_session_id(sid: Any) -> bool:
+    return isinstance(sid, str) and bool(_SID_RE.match(sid))
+
+
+class PaperEngine:
+    """
+    Bar-by-bar replay of a signal frame through the backtest kernel (fxbot.engine.run_bars
+    with a carried EngineState), so paper fills match run_backtest's bar for bar.
+    Settings are run_backtest's; 'entry_allowed_mask' blocks entries (blackout).
+    """
+
+    def __init__(self, sig_df: pd.DataFrame, *, start_cash: float, atr_k_stop: float, slippage_pct: float, fee_perc_roundturn: float, per_trade_risk_pct: float, daily_loss_stop_pct: float | None, day_rollover: str | int | None = "00:00", day_rollover_tz: str | None = "UTC",
+                 stop_model: str = "close", intrabar_path: str = "worst", take_profit_k: float | None = None,
+                 entry_allowed_mask: pd.Series | None = None):
+        self.df = sig_df.copy()
+        self.idx = list(sig_df.index)
+        self.ptr = 0
+        self.start_cash = float(start_cash)
+        self.params = EngineParams(
+            start_cash=float(start_cash),
+            atr_k_stop=float(atr_k_stop),
+            slippage_pct=float(slippage_pct),
+            fee_perc_roundturn=float(fee_perc_roundturn),
+            per_trade_risk_pct=float(per_trade_risk_pct),
+            daily_loss_stop_pct=float(daily_loss_stop_pct) if daily_loss_stop_pct is not None else None,
+            stop_model=stop_model,
+            intrabar_path=intrabar_path,
+            take_profit_k=float(take_profit_k) if take_profit_k is not None else None,
+        )
+        self.state = EngineState.initial(start_cash)
+        # Kernel inputs (close/signal/atr, blackout, trading-day ids, OHLC) built once, sliced per step
+        self._inputs = kernel_inputs(self.df, entry_allowed_mask, self.params.daily_loss_stop_pct,
+                                     day_rollover, day_rollover_tz, stop_model)
+        self.pnl_series = pd.Series(0.0, index=self.df.index)
+        # (bar position, realized pnl) per exit; what state_dict() persists instead of pnl_series
+        self.realized: List[Tuple[int, float]] = []
+        self.last_exit_price: float | None = None
+
+    @property
+    def cash(self) -> float:
+        return self.state.cash
+
+    @property
+    def equity(self) -> float:
+        return self.state.equity
+
+    @property
+    def position(self) -> float:
+        return self.state.position
+
+    @property
+    def entry_price(self) -> float | None:
+        return self.state.entry_price if self.state.position > 0 else None
+
+    def _advance(self, n: int) -> List[Fill]:
+        """Run the kernel over the next n bars; fills carry absolute bar positions."""
+        i = self.ptr
+        j = min(i + max(0, int(n)), len(self.idx))
+        if j <= i:
+            return []
+        chunk = {k: (v[i:j] if v is not None else None) for k, v in self._inputs.items()}
+        _, fills = run_bars(self.state, self.params, **chunk)
+        fills = [f._replace(i=i + f.i) for f in fills]
+        for f in fills:
+            if f.side == "exit":
+                self.pnl_series.iloc[f.i] = f.pnl
+                self.realized.append((f.i, float(f.pnl)))
+                self.last_exit_price = f.price
+        self.ptr = j
+        return fills
+
+    def step_one(self) -> bool:
+        if self.ptr >= len(self.idx):
+            return False
+        self._advance(1)
+        return True
+
+    def step_many(self, n: int) -> Dict[str, Any]:
+        """
+        Advance up to n bars and return only what changed, for streaming:
+        per-bar epoch-ms timestamps and equity, fills (entries/exits) and the resulting position.
+        """
+        start, equity_now = self.ptr, self.equity
+        fills = self._advance(n)
+        ts_ms: List[int] = []
+        equity: List[float] = []
+        out_fills: List[Dict[str, Any]] = []
+        k = 0
+        for i in range(start, self.ptr):
+            ts = self.idx[i]
+            while k < len(fills) and fills[k].i == i:
+                f = fills[k]
+                # Cash (= equity) moves only on fills: +pnl on exits, -fee on entries
+                equity_now += f.pnl
+                fill = {"t": ts.isoformat(), "side": f.side, "price": f.price, "size": f.size}
+                if f.side == "exit":
+                    fill["pnl"] = f.pnl
+                out_fills.append(fill)
+                k += 1
+            ts_ms.append(ts.value // 1_000_000)
+            equity.append(round(equity_now, 2))
+        return {
+            "ptr": self.ptr,
+            "total": len(self.idx),
+            "t": ts_ms,
+            "equity": equity,
+            "fills": out_fills,
+            "position": float(self.position),
+            "entry_price": float(self.entry_price) if self.entry_price is not None else None,
+            "done": self.ptr >= len(self.idx),
+        }
+
+    def status(self) -> dict:
+        last_ts = self.idx[self.ptr - 1] if self.ptr > 0 and self.ptr <= len(self.idx) else None
+        start_cash = float(self.start_cash)
+        end_cash = float(self.cash)
+        summary = metrics_from_pnl(self.pnl_series.iloc[: self.ptr], start_cash, end_cash) if self.ptr > 0 else {}
+        return {
+            "ptr": self.ptr,
+            "total": len(self.idx),
+            "last_ts": last_ts.isoformat() if last_ts is not None else None,
+            "position": float(self.position),
+            "entry_price": float(self.entry_price) if self.entry_price is not None else None,
+            "equity": float(self.equity),
+            "summary": summary,
+        }
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Mutable state only (JSON-safe); the signal frame and settings come from the session spec."""
+        st = self.state
+        flat = st.position <= 0
+        return {
+            "total": len(self.idx),
+            "ptr": self.ptr,
+            "cash": st.cash,
+            "equity": st.equity,
+            "position": st.position,
+            "entry_price": None if flat else st.entry_price,
+            "atr_stop": None if flat or st.atr_stop != st.atr_stop else st.atr_stop,
+            "take_profit": None if st.take_profit != st.take_profit else st.take_profit,
+            "day": st.day,
+            "day_realized": st.day_realized,
+            "realized": self.realized,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        if int(state.get("total", len(self.idx))) != len(self.idx):
+            raise ValueError("paper session data changed (bar count differs); re-initialize the session")
+        self.ptr = int(state["ptr"])
+        st = self.state = EngineState.initial(self.start_cash)
+        st.cash = float(state["cash"])
+        st.equity = float(state["equity"])
+        st.position = float(state["position"])
+        st.entry_price = float(state.get("entry_price") or 0.0)
+        stop, tp = state.get("atr_stop"), state.get("take_profit")
+        st.atr_stop = math.nan if stop is None else float(stop)
+        st.take_profit = math.nan if tp is None else float(tp)
+        st.day = state.get("day")
+        st.day_realized = float(state.get("day_realized", 0.0))
+        self.realized = [(int(i), float(v)) for i, v in state.get("realized", [])]
+        self.last_exit_price = None
+        self.pnl_series[:] = 0.0
+        for i, v in self.realized:
+            self.pnl_series.iloc[i] = v
+
+
+class _Entry:
+    __slots__ = ("lock", "engine", "spec", "stamp", "last_used")
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.engine: Optional[PaperEngine] = None
+        self.spec: Optional[Dict[str, Any]] = None
+        self.stamp: Optional[Tuple[int, int]] = None
+        self.last_used = time.monotonic()
+
+
+def _stamp(path: pathlib.Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _write_json(path: pathlib.Path, data: Any) -> None:
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+class SessionRegistry:
+    """
+    Session-keyed paper engines plus small per-session JSON artifacts (last trades, WF folds).
+
+    factory(spec) -> PaperEngine rebuilds an engine (fresh state) from the spec given to create().
+    All access goes through session(), which holds the session's lock (thread + file lock),
+    reloads the engine when another process saved a newer state, and saves it back afterwards.
+    """
+
+    def __init__(self, state_dir: str | pathlib.Path, factory: Callable[[Dict[str, Any]], PaperEngine], *,
+                 idle_ttl_s: float = 1800.0, max_sessions: int = 64, retention_s: float = 7 * 86_400):
+        self.state_dir = pathlib.Path(state_dir)
+        self.factory = factory
+        self.idle_ttl_s = float(idle_ttl_s)
+        self.max_sessions = max(1, int(max_sessions))
+        self.retention_s = float(retention_s)
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.loads = 0
+        self.evictions = 0
+        self.prune()
+
+    # ---- paths / locks
+    def _dir(self, sid: str) -> pathlib.Path:
+        if not valid_session_id(sid):
+            raise ValueError("invalid session id")
+        return self.state_dir / sid
+
+    @contextlib.contextmanager
+    def _file_lock(self, sid: str) -> Iterator[None]:
+        d = self._dir(sid)
+        d.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(d / ".lock", "a+") as fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def _entry(self, sid: str) -> _Entry:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                entry = self._entries[sid] = _Entry()
+            entry.last_used = now
+            sweep = now - self._last_sweep >= 30.0 or len(self._entries) > self.max_sessions
+            if sweep:
+                self._last_sweep = now
+        if sweep:
+            self.evict_idle()
+        return entry
+
+    # ---- engines
+    def create(self, sid: str, spec: Dict[str, Any]) -> PaperEngine:
+        """Build a fresh engine for sid (replacing any existing one) and persist it."""
+        engine = self.factory(spec)
+        entry = self._entry(sid)
+        with entry.lock, self._file_lock(sid):
+            entry.engine, entry.spec = engine, dict(spec)
+            self._save(sid, entry)
+        return engine
+
+    @contextlib.contextmanager
+    def session(self, sid: str, *, write: bool = True) -> Iterator[Optional[PaperEngine]]:
+        """Locked access to the session's engine (None if the session was never configured)."""
+        entry = self._entry(sid)
+        with entry.lock:
+            if not self._dir(sid).exists():
+                # Never configured (or dropped); don't create a directory just to look
+                entry.engine = entry.spec = entry.stamp = None
+                yield None
+                return
+            with self._file_lock(sid):
+                yield from self._locked_session(sid, entry, write)
+
+    def _locked_session(self, sid: str, entry: _Entry, write: bool) -> Iterator[Optional[PaperEngine]]:
+        path = self._dir(sid) / "paper.json"
+        stamp = _stamp(path)
+        if stamp is None:
+            entry.engine = entry.spec = entry.stamp = None
+        elif entry.engine is None or entry.stamp != stamp:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            engine = self.factory(saved["spec"])
+            engine.load_state(saved["state"])
+            entry.engine, entry.spec, entry.stamp = engine, saved["spec"], stamp
+            self.loads += 1
+        yield entry.engine
+        if write and entry.engine is not None:
+            self._save(sid, entry)
+        entry.last_used = time.monotonic()
+
+    def _save(self, sid: str, entry: _Entry) -> None:
+        path = self._dir(sid) / "paper.json"
+        _write_json(path, {"spec": entry.spec, "state": entry.engine.state_dict(), "saved_at": time.time()})  # type: ignore[union-attr]
+        entry.stamp = _stamp(path)
+
+    def drop(self, sid: str) -> None:
+        """Forget a session everywhere (memory and disk)."""
+        entry = self._entry(sid)
+        with entry.lock:
+            shutil.rmtree(self._dir(sid), ignore_errors=True)
+            with self._lock:
+                self._entries.pop(sid, None)
+
+    def evict_idle(self) -> int:
+        """Release engines idle past idle_ttl_s (and the least recently used beyond max_sessions)."""
+        now = time.monotonic()
+        with self._lock:
+            by_age = sorted(self._entries.items(), key=lambda kv: kv[1].last_used)
+            excess = len(by_age) - self.max_sessions
+            victims = [sid for i, (sid, e) in enumerate(by_age) if i < excess or now - e.last_used > self.idle_ttl_s]
+        n = 0
+        for sid in victims:
+            entry = self._entries.get(sid)
+            if entry is None or not entry.lock.acquire(blocking=False):
+                continue  # in use right now
+            try:
+                with self._lock:
+                    self._entries.pop(sid, None)
+                n += entry.engine is not None
+            finally:
+                entry.lock.release()
+        self.evictions += n
+        return n
+
+    def prune(self) -> int:
+        """Delete on-disk sessions untouched for retention_s."""
+        if not self.state_dir.exists():
+            return 0
+        cutoff = time.time() - self.retention_s
+        n = 0
+        for d in self.state_dir.iterdir():
+            if d.is_dir() and valid_session_id(d.name):
+                try:
+                    newest = max((p.stat().st_mtime for p in d.iterdir()), default=d.stat().st_mtime)
+                except OSError:
+                    continue  # being written/removed by another worker
+                if newest < cutoff:
+                    shutil.rmtree(d, ignore_errors=True)
+                    n += 1
+        return n
+
+    # ---- artifacts
+    def save_artifact(self, sid: str, name: str, data: Any) -> None:
+        with self._file_lock(sid):
+            _write_json(self._dir(sid) / f"{name}.json", data)
+
+    def load_artifact(self, sid: str, name: str, default: Any = None) -> Any:
+        try:
+            with open(self._dir(sid) / f"{name}.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return default
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = sum(1 for e in self._entries.values() if e.engine is not None)
+        on_disk = sum(1 for d in self.state_dir.iterdir() if d.is_dir()) if self.state_dir.exists() else 0
+        return {"in_memory": active, "on_disk": on_disk, "loads": self.loads, "evictions": self.evictions,
+                "idle_ttl_s": self.idle_ttl_s, "max_sessions": self.max_sessions}
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import file_stamp
+from .profiling import stage
+
+
+# In-process step graph for multi-stage runs (scripts/fx_pipeline.py).
+# A Step declares its dependencies, the files it reads (inputs) and writes
+# (outputs), and a JSON-able key of everything else its result depends on.
+# Its fingerprint hashes the key, the input files' contents and the
+# dependencies' fingerprints; a step whose fingerprint matches the state file
+# and whose recorded outputs still exist is skipped (its outputs are copied
+# to the new paths if they moved). Results live in memory for dependents:
+# a skipped step is re-read through Step.load, and steps without outputs
+# (e.g. the loaded frame) only run when a stale dependent needs them.
+# Independent steps run concurrently on a thread pool.
+
+STATE_VERSION = 1
+
+
+@dataclass
+class Step:
+    name: str
+    fn: Callable[[Dict[str, Any]], Any]  # receives {dep name: result}
+    deps: Tuple[str, ...] = ()
+    key: Any = None
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    load: Optional[Callable[[], Any]] = None  # result from outputs when skipped
+
+
+@dataclass
+class StepRun:
+    name: str
+    status: str  # ran | cached | skipped
+    seconds: float = 0.0
+    fingerprint: str = ""
+    outputs: List[str] = field(default_factory=list)
+
+
+class PipelineError(RuntimeError):
+    """A step failed; the original exception is chained."""
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _copy_output(src: str, dst: str) -> None:
+    pathlib.Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst, dirs_exist_ok=True)
+    else:
+        shutil.copy2(src, dst)
+
+
+class Pipeline:
+    """Dependency-ordered runner with fingerprint memoization (state_path=None disables skipping)."""
+
+    def __init__(self, steps: Sequence[Step], *, state_path: str | pathlib.Path | None = None,
+                 max_workers: int = 4, log: Callable[[str], None] | None = print):
+        self.steps: Dict[str, Step] = {}
+        for s in steps:
+            if s.name in self.steps:
+                raise ValueError(f"duplicate step: {s.name}")
+            missing = [d for d in s.deps if d not in self.steps]
+            if missing:
+                # Steps are listed in dependency order, which also rules out cycles
+                raise ValueError(f"step {s.name!r} depends on unknown or later steps: {missing}")
+            self.steps[s.name] = s
+        self.state_path = pathlib.Path(state_path) if state_path else None
+        self.max_workers = max(1, int(max_workers))
+        self.log = log or (lambda _msg: None)
+        self._file_shas: Dict[str, Any] = {}
+
+    # -- state -------------------------------------------------------------
+
+    def _read_state(self) -> Dict[str, Any]:
+        if self.state_path is None or not self.state_path.exists():
+            return {"version": STATE_VERSION, "steps": {}, "files": {}}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {"version": STATE_VERSION, "steps": {}, "files": {}}
+        if state.get("version") != STATE_VERSION:
+            return {"version": STATE_VERSION, "steps": {}, "files": {}}
+        return state
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def file_fingerprint(self, path: str, known: Dict[str, Any]) -> str:
+        """Content hash of a file; reuses the recorded hash while (mtime_ns, size) is unchanged."""
+        p, mtime_ns, size = file_stamp(path)
+        rec = known.get(p)
+        if rec and rec.get("mtime_ns") == mtime_ns and rec.get("size") == size:
+            sha = rec["sha256"]
+        else:
+            sha = _sha256_file(p)
+        self._file_shas[p] = {"mtime_ns": mtime_ns, "size": size, "sha256": sha}
+        return sha
+
+    def fingerprints(self, known_files: Dict[str, Any] | None = None) -> Dict[str, str]:
+        known = known_files or {}
+        out: Dict[str, str] = {}
+        for name, s in self.steps.items():
+            doc = {
+                "step": name,
+                "key": s.key,
+                "inputs": [self.file_fingerprint(p, known) for p in s.inputs],
+                "deps": [out[d] for d in s.deps],
+            }
+            out[name] = hashlib.sha256(json.dumps(doc, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return out
+
+    # -- planning ----------------------------------------------------------
+
+    def plan(self, state: Dict[str, Any], fps: Dict[str, str], *, force: bool = False) -> Tuple[Dict[str, str], set]:
+        """(status per step, steps whose result must be computed or loaded)."""
+        status: Dict[str, str] = {}
+        for name, s in self.steps.items():
+            rec = state["steps"].get(name)
+            fresh = (
+                not force
+                and bool(s.outputs)
+                and rec is not None
+                and rec.get("fingerprint") == fps[name]
+                and len(rec.get("outputs", [])) == len(s.outputs)
+                and all(os.path.exists(p) for p in rec["outputs"])
+            )
+            status[name] = "cached" if fresh else "run"
+        # Stale steps (and terminal steps without outputs) need their dependencies'
+        # results; pull those in transitively
+        has_dependents = {d for s in self.steps.values() for d in s.deps}
+        needed = {
+            n for n, st in status.items()
+            if st == "run" and (self.steps[n].outputs or n not in has_dependents)
+        }
+        stack = list(needed)
+        while stack:
+            for d in self.steps[stack.pop()].deps:
+                if d not in needed:
+                    needed.add(d)
+                    if status[d] == "run" or self.steps[d].load is None:
+                        status[d] = "run"
+                        stack.append(d)
+        for n, st in status.items():
+            if st == "run" and n not in needed:
+                status[n] = "skipped"  # output-less step nobody needs this time
+        return status, needed
+
+    # -- execution ---------------------------------------------------------
+
+    def run(self, *, force: bool = False) -> Dict[str, StepRun]:
+        state = self._read_state()
+        fps = self.fingerprints(state.get("files", {}))
+        status, needed = self.plan(state, fps, force=force)
+        results: Dict[str, Any] = {}
+        runs: Dict[str, StepRun] = {}
+        lock = threading.Lock()
+
+        for name, st in status.items():
+            if st == "cached":
+                s = self.steps[name]
+                prev = state["steps"][name]["outputs"]
+                for src, dst in zip(prev, s.outputs):
+                    if os.path.abspath(src) != os.path.abspath(dst):
+                        _copy_output(src, dst)
+                runs[name] = StepRun(name, "cached", fingerprint=fps[name], outputs=list(s.outputs))
+                self.log(f"[cached] {name}")
+            elif st == "skipped":
+                runs[name] = StepRun(name, "skipped", fingerprint=fps[name])
+
+        def execute(name: str) -> Any:
+            s = self.steps[name]
+            t0 = time.perf_counter()
+            with stage(f"pipeline.{name}"):
+                value = s.fn({d: results[d] for d in s.deps})
+            dt = time.perf_counter() - t0
+            with lock:
+                runs[name] = StepRun(name, "ran", dt, fps[name], list(s.outputs))
+            self.log(f"[ran {dt:.2f}s] {name}")
+            return value
+
+        # Cached results are loaded lazily on the pool too (they may be large files)
+        todo = {n for n, st in status.items() if st == "run"} | {n for n in needed if status[n] == "cached"}
+        pending: Dict[Future, str] = {}
+        done_names = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline") as pool:
+                while todo or pending:
+                    # Loading a cached result needs nothing; running needs every dependency's result
+                    ready = [
+                        n for n in self.steps
+                        if n in todo and (status[n] == "cached" or all(d in done_names for d in self.steps[n].deps))
+                    ]
+                    for n in ready:
+                        todo.discard(n)
+                        fn = execute if status[n] == "run" else (lambda n: self.steps[n].load())
+                        pending[pool.submit(fn, n)] = n
+                    if not pending:
+                        raise PipelineError(f"unresolvable steps: {sorted(todo)}")
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        n = pending.pop(fut)
+                        try:
+                            results[n] = fut.result()
+                        except Exception as e:
+                            for f in pending:
+                                f.cancel()
+                            raise PipelineError(f"step {n!r} failed: {e}") from e
+                        done_names.add(n)
+        finally:
+            # Record what succeeded so a rerun after a failure resumes from there
+            for n, r in runs.items():
+                if r.status in ("ran", "cached") and self.steps[n].outputs:
+                    state["steps"][n] = {"fingerprint": r.fingerprint, "outputs": [os.path.abspath(p) for p in r.outputs]}
+            state["files"] = {**state.get("files", {}), **self._file_shas}
+            self._write_state(state)
+        return {n: runs[n] for n in self.steps if n in runs}
+
+
+def _write_json(path: pathlib.Path, obj: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+def fx_pipeline_steps(
+    *,
+    csv: str,
+    config: str,
+    out_dir: str | pathlib.Path,
+    grid: Dict[str, List[Any]],
+    start: str | None = None,
+    end: str | None = None,
+    ppyear: int = 6048,
+    train_bars: int = 2000,
+    test_bars: int = 500,
+) -> List[Step]:
+    """
+    backtest / optimize / backtest-with-opt / report-export / walkforward as one graph.
+    Outputs match the fxbot.cli subcommands for the config's strategy (strategy.name);
+    the CSV is parsed once and the full-frame steps share one feature store
+    (fxbot.features). grid maps the strategy's parameter names (or "<name>_list",
+    e.g. ema_fast_list) to value lists.
+    """
+    from .backtest import run_backtest
+    from .config import engine_kwargs, load_config
+    from .data.csv_loader import load_ohlcv_csv
+    from .features import open_features
+    from .optimize import grid_search
+    from .report import export_report_to_csvs, save_report
+    from .strategies.registry import get_strategy
+    from .walkforward import walk_forward
+
+    out = pathlib.Path(out_dir)
+    # Parameter name -> values for the config's strategy ("<name>_list" keys accepted)
+    params_grid = {k[: -len("_list")] if k.endswith("_list") else k: v for k, v in grid.items()}
+    report, opt, report_best = out / "report.json", out / "opt.json", out / "report_best.json"
+    out_csv, wf = out / "csv", out / "walkforward.json"
+
+    def load_data(_deps: Dict[str, Any]) -> Dict[str, Any]:
+        import pandas as pd
+
+        df = load_ohlcv_csv(csv)
+        if start:
+            df = df[df.index >= pd.to_datetime(start, utc=True)]
+        if end:
+            df = df[df.index <= pd.to_datetime(end, utc=True)]
+        return {"df": df, "indicators": open_features(df)}
+
+    def backtest(deps: Dict[str, Any]) -> str:
+        cfg, data = deps["config"], deps["data"]
+        strat = get_strategy(cfg.strategy_name)
+        params = strat.resolve(cfg.strategy_params)
+        sig = strat.generate(data["df"], params, features=data["indicators"])
+        kw = engine_kwargs(cfg)
+        res = run_backtest(sig, atr_k_stop=params["atr_k"], **kw)
+        report.parent.mkdir(parents=True, exist_ok=True)
+        save_report(str(report), res)
+        return str(report)
+
+    def optimize(deps: Dict[str, Any]) -> List[Dict[str, Any]]:
+        data = deps["data"]
+        res = grid_search(data["df"], strategy=deps["config"].strategy_name, grid=params_grid,
+                          **engine_kwargs(deps["config"]), periods_per_year=int(ppyear),
+                          max_dd_limit=None, top_n=10, cache=data["indicators"])
+        _write_json(opt, res)
+        return res
+
+    def load_opt() -> List[Dict[str, Any]]:
+        with open(opt, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def backtest_best(deps: Dict[str, Any]) -> str:
+        if not deps["optimize"]:
+            raise ValueError("opt results empty")
+        data = deps["data"]
+        strat = get_strategy(deps["config"].strategy_name)
+        top = strat.resolve(deps["optimize"][0])
+        sig = strat.generate(data["df"], top, features=data["indicators"])
+        res = run_backtest(sig, atr_k_stop=top["atr_k"], **engine_kwargs(deps["config"]))
+        report_best.parent.mkdir(parents=True, exist_ok=True)
+        save_report(str(report_best), res)
+        return str(report_best)
+
+    def export(deps: Dict[str, Any]) -> Dict[str, str]:
+        return export_report_to_csvs(deps["backtest_best"], str(out_csv))
+
+    def walkforward(deps: Dict[str, Any]) -> None:
+        result = walk_forward(deps["data"]["df"], train_bars=int(train_bars), test_bars=int(test_bars), step_bars=None,
+                              strategy=deps["config"].strategy_name, grid=params_grid,
+                              **engine_kwargs(deps["config"]), periods_per_year=int(ppyear))
+        _write_json(wf, result)
+
+    span = {"start": start, "end": end}
+    return [
+        Step("config", lambda _deps: load_config(config), inputs=(config,)),
+        Step("data", load_data, key=span, inputs=(csv,)),
+        Step("backtest", backtest, deps=("config", "data"), outputs=(str(report),)),
+        Step("optimize", optimize, deps=("config", "data"), key={"grid": grid, "ppyear": ppyear},
+             outputs=(str(opt),), load=load_opt),
+        Step("backtest_best", backtest_best, deps=("config", "data", "optimize"), outputs=(str(report_best),),
+             load=lambda: str(report_best)),
+        Step("export", export, deps=("backtest_best",), outputs=(str(out_csv),)),
+        Step("walkforward", walkforward, deps=("config", "data"),
+             key={"grid": grid, "ppyear": ppyear, "train_bars": train_bars, "test_bars": test_bars},
+             outputs=(str(wf),)),
+    ]
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+
+# Lightweight per-stage timers and counters.
+# Instrumented code calls stage()/count() or is wrapped with @profiled; while no
+# profiler is active these reduce to one global check, so the hooks can stay in
+# hot paths (optimize / walk-forward loops) permanently.
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_MAX_TRACE_EVENTS = 1_000_000
+
+
+class Profiler:
+    """Aggregated stage timings (inclusive wall time) and counters; optional Chrome trace events."""
+
+    def __init__(self, *, trace: bool = False):
+        self.trace = trace
+        self.t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, List[float]] = {}  # name -> [calls, total, min, max]
+        self.counters: Dict[str, float] = {}
+        self.events: List[Dict[str, Any]] = []
+
+    def record(self, name: str, start: float, end: float) -> None:
+        dt = end - start
+        with self._lock:
+            st = self.stages.get(name)
+            if st is None:
+                self.stages[name] = [1, dt, dt, dt]
+            else:
+                st[0] += 1
+                st[1] += dt
+                st[2] = min(st[2], dt)
+                st[3] = max(st[3], dt)
+            if self.trace and len(self.events) < _MAX_TRACE_EVENTS:
+                self.events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.t0) * 1e6,
+                    "dur": dt * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                })
+
+    def add(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self) -> None:
+        with self._lock:
+            self.t0 = time.perf_counter()
+            self.stages.clear()
+            self.counters.clear()
+            self.events.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                k: {"calls": int(v[0]), "total_s": v[1], "mean_s": v[1] / v[0], "min_s": v[2], "max_s": v[3]}
+                for k, v in sorted(self.stages.items(), key=lambda kv: kv[1][1], reverse=True)
+            }
+            return {
+                "wall_s": time.perf_counter() - self.t0,
+                "stages": stages,
+                "counters": dict(self.counters),
+            }
+
+    def format_table(self) -> str:
+        s = self.summary()
+        lines = [f"{'stage':<32} {'calls':>8} {'total_s':>10} {'mean_ms':>10} {'max_ms':>10}"]
+        for name, st in s["stages"].items():
+            lines.append(
+                f"{name:<32} {st['calls']:>8d} {st['total_s']:>10.4f} {st['mean_s'] * 1e3:>10.3f} {st['max_s'] * 1e3:>10.3f}"
+            )
+        for name, v in s["counters"].items():
+            lines.append(f"{name:<32} {v:>8g}")
+        lines.append(f"{'wall':<32} {'':>8} {s['wall_s']:>10.4f}")
+        return "\n".join(lines)
+
+    def write_json(self, path: str | pathlib.Path) -> pathlib.Path:
+        out = pathlib.Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        return out
+
+    def write_chrome_trace(self, path: str | pathlib.Path) -> pathlib.Path:
+        """Trace Event Format; open in chrome://tracing or https://ui.perfetto.dev."""
+        out = pathlib.Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            events = list(self.events)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return out
+
+
+_ACTIVE: Optional[Profiler] = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _ACTIVE
+
+
+def enable(*, trace: bool = False) -> Profiler:
+    """Install a process-wide profiler (replacing any active one) and return it."""
+    global _ACTIVE
+    _ACTIVE = Profiler(trace=trace)
+    return _ACTIVE
+
+
+def disable() -> Optional[Profiler]:
+    global _ACTIVE
+    prof, _ACTIVE = _ACTIVE, None
+    return prof
+
+
+@contextlib.contextmanager
+def profile(*, trace: bool = False) -> Iterator[Profiler]:
+    """Profile everything inside the block; the previous profiler (if any) is restored after."""
+    global _ACTIVE
+    prev = _ACTIVE
+    prof = enable(trace=trace)
+    try:
+        yield prof
+    finally:
+        _ACTIVE = prev
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "start")
+
+    def __init__(self, prof: Profiler, name: str):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.prof.record(self.name, self.start, time.perf_counter())
+
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def stage(name: str):
+    """Context manager timing the enclosed block as 'name' (no-op when profiling is off)."""
+    prof = _ACTIVE
+    if prof is None:
+        return _NULL_STAGE
+    return _Stage(prof, name)
+
+
+def count(name: str, n: float = 1) -> None:
+    """Increment a counter (e.g. bars processed); no-op when profiling is off."""
+    prof = _ACTIVE
+    if prof is not None:
+        prof.add(name, n)
+
+
+def profiled(name: str) -> Callable[[F], F]:
+    """Decorator form of stage() for whole functions."""
+
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            prof = _ACTIVE
+            if prof is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.record(name, start, time.perf_counter())
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
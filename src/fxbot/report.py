@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import json
-from dataclasses import asdict
 import pathlib
-from typing import Dict, Any
+from typing import Any, Dict, Iterable, List, Optional
 
 import numpy as np
 import pandas as pd
 
+from .profiling import profiled
 
+
+@profiled("metrics")
 def metrics_from_pnl(pnl: pd.Series, start_cash: float, end_cash: float, periods_per_year: int | None = None) -> Dict[str, Any]:
     pnl = pnl.fillna(0.0)
     equity_curve = start_cash + pnl.cumsum()
@@ -47,14 +49,170 @@ def metrics_from_pnl(pnl: pd.Series, start_cash: float, end_cash: float, periods
     }
 
 
-def save_report(path: str, result: Dict[str, Any]) -> None:
+class PnlAccumulator:
+    """
+    Incremental counterpart of metrics_from_pnl for streamed PnL chunks.
+    Keeps O(1) state (running moments, peak, trade stats) instead of the full series.
+    """
+
+    def __init__(self, start_cash: float):
+        self.start_cash = float(start_cash)
+        self.equity = float(start_cash)
+        self.n = 0
+        self.ret_mean = 0.0
+        self.ret_m2 = 0.0
+        self.peak = -np.inf
+        self.max_dd = 0.0
+        self.num_trades = 0
+        self.num_wins = 0
+        self.num_losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+
+    def update(self, pnl: np.ndarray) -> None:
+        pnl = np.nan_to_num(np.asarray(pnl, dtype=float), nan=0.0)
+        if len(pnl) == 0:
+            return
+        eq = self.equity + np.cumsum(pnl)
+        prev = np.concatenate(([self.equity], eq[:-1]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = np.where(prev != 0, pnl / prev, 0.0)
+        if self.n == 0:
+            ret[0] = 0.0  # metrics_from_pnl has no prior equity for the first bar
+        # Chan et al. parallel update of mean / M2
+        nb = len(ret)
+        mb = float(ret.mean())
+        m2b = float(((ret - mb) ** 2).sum())
+        delta = mb - self.ret_mean
+        tot = self.n + nb
+        self.ret_mean += delta * nb / tot
+        self.ret_m2 += m2b + delta * delta * self.n * nb / tot
+        self.n = tot
+        peak = np.maximum.accumulate(np.concatenate(([self.peak], eq)))[1:]
+        dd = (eq - peak) / peak
+        self.max_dd = min(self.max_dd, float(dd.min()))
+        self.peak = float(peak[-1])
+        self.equity = float(eq[-1])
+        wins = pnl[pnl > 0]
+        losses = pnl[pnl < 0]
+        self.num_trades += int(np.count_nonzero(pnl))
+        self.num_wins += len(wins)
+        self.num_losses += len(losses)
+        self.gross_profit += float(wins.sum())
+        self.gross_loss += float(losses.sum())
+
+    def metrics(self, end_cash: float, periods_per_year: int | None = None) -> Dict[str, Any]:
+        ann_factor = periods_per_year if periods_per_year else 24 * 252
+        std = np.sqrt(self.ret_m2 / self.n) if self.n else 0.0
+        sharpe = 0.0 if std == 0 else (self.ret_mean / std) * np.sqrt(ann_factor)
+        total_return = (end_cash / self.start_cash) - 1.0 if self.start_cash > 0 else 0.0
+        n = self.num_trades
+        pf = (self.gross_profit / abs(self.gross_loss)) if self.gross_loss != 0 else (np.inf if self.gross_profit > 0 else 0.0)
+        return {
+            "total_return": float(total_return),
+            "sharpe_approx": float(sharpe),
+            "max_drawdown": float(self.max_dd),
+            "num_trades": n,
+            "win_rate": float(self.num_wins) / n if n > 0 else 0.0,
+            "avg_trade": (self.gross_profit + self.gross_loss) / n if n > 0 else 0.0,
+            "avg_win": self.gross_profit / self.num_wins if self.num_wins else 0.0,
+            "avg_loss": self.gross_loss / self.num_losses if self.num_losses else 0.0,
+            "profit_factor": float(pf) if np.isfinite(pf) else None,
+        }
+
+
+TRADE_FIELDS = ("entry_time", "exit_time", "entry", "exit", "size", "atr_stop")
+
+
+def timestamp_strings(ts: Iterable[Any], *, iso: bool = True) -> List[Optional[str]]:
+    """
+    Timestamps as strings (None for NaT): isoformat() when iso, else str().
+    Whole-second UTC timestamps (the loader's output) are formatted in one numpy call.
+    """
+    idx = pd.DatetimeIndex(ts)
+    na = idx.isna()
+    if str(idx.tz) == "UTC" and (na | (idx.as_unit("ns").asi8 % 1_000_000_000 == 0)).all():
+        s = np.datetime_as_string(idx.tz_localize(None).as_unit("s").to_numpy(), unit="s")
+        if not iso:
+            s = np.char.replace(s, "T", " ")
+        s = np.char.add(s, "+00:00").tolist()
+        return [None if m else v for v, m in zip(s, na)] if na.any() else s
+    return [None if pd.isna(t) else (t.isoformat() if iso else str(t)) for t in idx]
+
+
+def trades_frame(trades: Iterable[Any]) -> pd.DataFrame:
+    """
+    Columnar trade table from Trade records (or dicts / an existing frame), one row per trade,
+    with vectorized pnl (gross, before fees), ret_pct and hold_min. Open trades have NaN/NaT exits.
+    """
+    if isinstance(trades, pd.DataFrame):
+        df = trades.copy()
+    else:
+        items = list(trades)
+        if items and isinstance(items[0], dict):
+            df = pd.DataFrame(items)
+        else:
+            df = pd.DataFrame([tuple(getattr(t, c, None) for c in TRADE_FIELDS) for t in items], columns=list(TRADE_FIELDS))
+    for c in TRADE_FIELDS:
+        if c not in df.columns:
+            df[c] = None
+    for c in ("entry_time", "exit_time"):
+        df[c] = pd.to_datetime(df[c], utc=True, format="ISO8601")
+    for c in ("entry", "exit", "size", "atr_stop"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype(float)
+    move = df["exit"] - df["entry"]
+    df["pnl"] = move * df["size"]
+    df["ret_pct"] = (move / df["entry"]).where(df["entry"] != 0)
+    df["hold_min"] = (df["exit_time"] - df["entry_time"]).dt.total_seconds() / 60.0
+    return df
+
+
+def trades_records(df: pd.DataFrame, *, iso: bool = True, columns: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+    """JSON-safe rows of a trades_frame (timestamps as strings, NaN/NaT as None)."""
+    cols = list(columns) if columns is not None else list(df.columns)
+    data: Dict[str, List[Any]] = {}
+    for c in cols:
+        col = df[c]
+        if isinstance(col.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_any_dtype(col.dtype):
+            data[c] = timestamp_strings(col, iso=iso)
+        else:
+            vals = col.to_numpy(dtype=float) if pd.api.types.is_numeric_dtype(col.dtype) else col.to_numpy(dtype=object)
+            data[c] = [None if v is None or v != v else v for v in vals.tolist()]
+    return [dict(zip(cols, row)) for row in zip(*(data[c] for c in cols))]
+
+
+REPORT_FORMATS = ("json", "npz")
+_NPZ_VERSION = 1
+
+
+def report_format_for(path: str | pathlib.Path, fmt: str | None = None) -> str:
+    """Explicit fmt, else by suffix: .npz -> npz, anything else -> json."""
+    if fmt:
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"report format must be one of {REPORT_FORMATS}")
+        return fmt
+    return "npz" if pathlib.Path(path).suffix.lower() == ".npz" else "json"
+
+
+def save_report(path: str, result: Dict[str, Any], fmt: str | None = None) -> None:
+    """
+    Write a backtest result. json: human-readable (full PnL keyed by ISO time).
+    npz: compressed column bundle (bar index, sparse PnL, trade columns); see load_report.
+    """
+    if report_format_for(path, fmt) == "npz":
+        _save_report_npz(path, result)
+        return
     trades = result.get("trades", [])
-    trades_ser = [asdict(t) for t in trades]
+    # Same shape as asdict(Trade): timestamps via str(), open exits as null
+    trades_ser = trades_records(trades_frame(trades), iso=False, columns=TRADE_FIELDS) if len(trades) else []
     pnl = result.get("pnl_series")
     # JSONは辞書キーに非文字列を許容しないため、TimestampをISO文字列化
     if isinstance(pnl, pd.Series):
         pnl = pnl.astype(float)
-        pnl_ser = { (ts.isoformat() if hasattr(ts, 'isoformat') else str(ts)) : float(v) for ts, v in pnl.items() }
+        if isinstance(pnl.index, pd.DatetimeIndex):
+            pnl_ser = dict(zip(timestamp_strings(pnl.index), pnl.tolist()))
+        else:
+            pnl_ser = { (ts.isoformat() if hasattr(ts, 'isoformat') else str(ts)) : float(v) for ts, v in pnl.items() }
     else:
         pnl_ser = {}
     summary = metrics_from_pnl(pnl, result["start_cash"], result["end_cash"]) if isinstance(pnl, pd.Series) else {}
@@ -69,24 +227,115 @@ def save_report(path: str, result: Dict[str, Any]) -> None:
         json.dump(payload, f, ensure_ascii=False, indent=2, default=str)
 
 
-def export_report_to_csvs(path: str, out_dir: str) -> Dict[str, str]:
+def _ns(values: Any) -> tuple[np.ndarray, Optional[str]]:
+    """UTC int64 ns (NaT -> int64 min) and the original tz name."""
+    idx = pd.DatetimeIndex(values)
+    tz = str(idx.tz) if idx.tz is not None else None
+    if tz is not None:
+        idx = idx.tz_convert("UTC")
+    return idx.as_unit("ns").asi8.astype(np.int64), tz
+
+
+def _from_ns(ns: np.ndarray, tz: Optional[str]) -> pd.DatetimeIndex:
+    # int64 -> datetime64 is a reinterpretation, not a parse
+    idx = pd.DatetimeIndex(np.asarray(ns, dtype=np.int64).view("datetime64[ns]"))
+    if tz is not None:
+        idx = idx.tz_localize("UTC").tz_convert(tz)
+    return idx
+
+
+def _save_report_npz(path: str, result: Dict[str, Any]) -> None:
+    pnl = result.get("pnl_series")
+    arrays: Dict[str, np.ndarray] = {}
+    summary: Dict[str, Any] = {}
+    tz = None
+    if isinstance(pnl, pd.Series):
+        pnl = pnl.astype(float)
+        summary = metrics_from_pnl(pnl, result["start_cash"], result["end_cash"])
+        values = pnl.to_numpy()
+        nz = np.flatnonzero(values != 0.0)
+        arrays["bars_t"], tz = _ns(pnl.index)
+        arrays["pnl_i"] = nz.astype(np.int64)
+        arrays["pnl_v"] = values[nz]
+    tr = trades_frame(result.get("trades", []))
+    for c in ("entry_time", "exit_time"):
+        arrays[f"tr_{c}"] = _ns(tr[c])[0]
+    for c in ("entry", "exit", "size", "atr_stop"):
+        arrays[f"tr_{c}"] = tr[c].to_numpy(dtype=float)
+    meta = {
+        "format": "fxbot-report",
+        "version": _NPZ_VERSION,
+        "start_cash": result.get("start_cash"),
+        "end_cash": result.get("end_cash"),
+        "summary": summary,
+        "tz": tz,
+        "has_pnl": isinstance(pnl, pd.Series),
+    }
+    arrays["meta"] = np.frombuffer(json.dumps(meta, ensure_ascii=False, default=str).encode("utf-8"), dtype=np.uint8)
+    out = pathlib.Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    # np.savez appends .npz to other suffixes; write through a handle to keep the exact name
+    with open(out, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def load_report(path: str | pathlib.Path) -> Dict[str, Any]:
+    """
+    Read a report written by save_report (either format) as
+    {start_cash, end_cash, summary, pnl: Series (full bar index), trades: trades_frame}.
+    npz needs no text parsing: timestamps are int64 arrays reinterpreted as datetime64.
+    """
+    with open(path, "rb") as f:
+        is_zip = f.read(4) == b"PK\x03\x04"  # sniffed, so a bundle saved under another suffix still loads
+    if is_zip:
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+            if meta.get("format") != "fxbot-report":
+                raise ValueError(f"not an fxbot report bundle: {path}")
+            tz = meta.get("tz")
+            pnl = None
+            if meta.get("has_pnl"):
+                index = _from_ns(z["bars_t"], tz)
+                values = np.zeros(len(index), dtype=float)
+                values[z["pnl_i"]] = z["pnl_v"]
+                pnl = pd.Series(values, index=index)
+            cols: Dict[str, Any] = {}
+            for c in ("entry_time", "exit_time"):
+                # int64 min is NaT (open trade)
+                cols[c] = _from_ns(z[f"tr_{c}"], "UTC")
+            for c in ("entry", "exit", "size", "atr_stop"):
+                cols[c] = z[f"tr_{c}"]
+        trades = trades_frame(pd.DataFrame(cols, columns=list(TRADE_FIELDS)))
+        return {"start_cash": meta.get("start_cash"), "end_cash": meta.get("end_cash"),
+                "summary": meta.get("summary") or {}, "pnl": pnl, "trades": trades}
+
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
+    pnl = None
+    raw = data.get("pnl", {})
+    if isinstance(raw, dict) and raw:
+        pnl = pd.Series(list(raw.values()), index=pd.to_datetime(list(raw.keys()), utc=True, format="ISO8601"), dtype=float)
+    trades = data.get("trades", [])
+    return {"start_cash": data.get("start_cash"), "end_cash": data.get("end_cash"), "summary": data.get("summary") or {},
+            "pnl": pnl, "trades": trades_frame(trades if isinstance(trades, list) else [])}
+
+
+def export_report_to_csvs(path: str, out_dir: str) -> Dict[str, str]:
+    """Write pnl.csv / trades.csv / summary.csv from a JSON or npz report."""
+    data = load_report(path)
     out = {}
     # PnL CSV
-    pnl = data.get("pnl", {})
-    if isinstance(pnl, dict) and pnl:
-        df_pnl = pd.DataFrame({"timestamp": list(pnl.keys()), "pnl": list(pnl.values())})
-        df_pnl["timestamp"] = pd.to_datetime(df_pnl["timestamp"], utc=True)
-        df_pnl = df_pnl.sort_values("timestamp")
+    pnl = data.get("pnl")
+    if pnl is not None and len(pnl):
+        pnl = pnl.sort_index()
+        df_pnl = pd.DataFrame({"timestamp": pnl.index, "pnl": pnl.to_numpy()})
         fp = pathlib.Path(out_dir) / "pnl.csv"
         fp.parent.mkdir(parents=True, exist_ok=True)
         df_pnl.to_csv(fp, index=False)
         out["pnl"] = str(fp)
     # Trades CSV
-    trades = data.get("trades", [])
-    if isinstance(trades, list) and trades:
-        df_tr = pd.DataFrame(trades)
+    df_tr = data["trades"]
+    if len(df_tr):
         fp = pathlib.Path(out_dir) / "trades.csv"
         fp.parent.mkdir(parents=True, exist_ok=True)
         df_tr.to_csv(fp, index=False)
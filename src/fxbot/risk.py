@@ -3,8 +3,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 
+from .engine import position_size_from_atr, rollover_minutes  # noqa: F401  (re-exported)
+
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
 
 @dataclass
 class RiskConfig:
@@ -13,28 +19,46 @@ class RiskConfig:
     max_concurrent_positions: int = 1
 
 
-def position_size_from_atr(entry_price: float, atr_value: float, atr_k_stop: float,
-                           equity: float, per_trade_risk_pct: float) -> float:
-    risk_jpy = equity * (per_trade_risk_pct / 100.0)
-    stop_distance = atr_k_stop * atr_value
-    if stop_distance <= 0:
-        return 0.0
-    units = risk_jpy / stop_distance
-    return max(0.0, units)
+def trading_day_ids(index: pd.DatetimeIndex, *, rollover: str | int | None = "00:00", tz: str | None = "UTC") -> np.ndarray:
+    """
+    Integer trading-day id per bar, computed once from the int64 timestamps.
+    A day starts at 'rollover' local time in 'tz' (e.g. "17:00" America/New_York
+    for the FX session); the default is UTC midnight. Naive indexes are read as UTC.
+    """
+    idx = pd.DatetimeIndex(index)
+    if tz and tz.upper() != "UTC":
+        if idx.tz is None:
+            idx = idx.tz_localize("UTC")
+        # Local wall clock (DST aware) so the rollover follows the exchange's clock
+        idx = idx.tz_convert(tz).tz_localize(None)
+    ns = idx.as_unit("ns").asi8
+    return (ns - rollover_minutes(rollover) * 60_000_000_000) // NS_PER_DAY
+
+
+def daily_loss_stop_mask(pnl: np.ndarray, day_ids: np.ndarray, loss_limit: float) -> np.ndarray:
+    """
+    Segmented cumulative PnL per trading day (vectorized); True while the day's
+    cumulative PnL stays above -loss_limit. 'day_ids' must be non-decreasing.
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    n = len(pnl)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    day_ids = np.asarray(day_ids)
+    cum = np.cumsum(pnl)
+    starts = np.flatnonzero(np.r_[True, day_ids[1:] != day_ids[:-1]])
+    seg_start = np.repeat(starts, np.diff(np.r_[starts, n]))
+    day_cum = cum - np.r_[0.0, cum][seg_start]
+    return day_cum > -loss_limit
 
 
-def apply_daily_loss_stop(pnl_series: pd.Series, equity_start: float, daily_loss_stop_pct: float) -> pd.Series:
+def apply_daily_loss_stop(pnl_series: pd.Series, equity_start: float, daily_loss_stop_pct: float, *,
+                          rollover: str | int | None = "00:00", tz: Optional[str] = "UTC") -> pd.Series:
     """
     Stop trading for the day if cumulative day PnL <= -threshold.
     Returns a mask of tradable timestamps (True if trading allowed).
     """
-    df = pnl_series.to_frame("pnl").copy()
-    df["date"] = df.index.tz_convert("UTC").date if hasattr(df.index, "tz") else df.index.date
-    tradable = []
-    for d, group in df.groupby("date"):
-        cum = group["pnl"].cumsum()
-        allow = cum > -(equity_start * (daily_loss_stop_pct / 100.0))
-        tradable.append(allow)
-    allow_mask = pd.concat(tradable).sort_index()
-    return allow_mask
-
+    pnl = pnl_series.fillna(0.0).sort_index(kind="stable")
+    ids = trading_day_ids(pnl.index, rollover=rollover, tz=tz)
+    allow = daily_loss_stop_mask(pnl.to_numpy(), ids, equity_start * (daily_loss_stop_pct / 100.0))
+    return pd.Series(allow, index=pnl.index, name="pnl")
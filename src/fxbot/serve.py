@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import pathlib
+import sys
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+
+# Production serving for scripts/webapp.py (the Flask dashboard).
+# Backends, best first: gunicorn (pre-fork workers x gthread threads),
+# waitress (one process, thread pool; also works on Windows), werkzeug
+# (threaded, or forked processes when threads == 1). All of them are optional;
+# the first one importable is used unless a backend is requested.
+
+BACKENDS = ("auto", "gunicorn", "waitress", "werkzeug")
+DEFAULT_APP_PATH = pathlib.Path(__file__).resolve().parents[2] / "scripts" / "webapp.py"
+
+
+def default_workers() -> int:
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def load_webapp(path: str | pathlib.Path | None = None) -> ModuleType:
+    """Import the web app module from its file path (it lives outside the package)."""
+    target = pathlib.Path(path) if path else DEFAULT_APP_PATH
+    if not target.exists():
+        raise FileNotFoundError(f"web app not found: {target}")
+    spec = importlib.util.spec_from_file_location("fxbot_webapp", str(target))
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"failed to load {target}")
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = mod
+    spec.loader.exec_module(mod)  # type: ignore[attr-defined]
+    return mod
+
+
+def _warm(mod: ModuleType, warm: bool) -> None:
+    if warm and hasattr(mod, "warm_csv_cache"):
+        n = mod.warm_csv_cache()
+        print(f"[serve] pid {os.getpid()}: warmed {n} CSV(s)", file=sys.stderr)
+
+
+def _pick_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}")
+    if backend != "auto":
+        return backend
+    candidates = ("waitress", "werkzeug") if os.name == "nt" else ("gunicorn", "waitress", "werkzeug")
+    for name in candidates:
+        if importlib.util.find_spec(name) is not None:
+            return name
+    raise RuntimeError("no WSGI server available; pip install gunicorn (or waitress)")
+
+
+def _serve_gunicorn(opts: Dict[str, Any], app_path: Optional[str], preload: bool, warm: bool) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    holder: Dict[str, ModuleType] = {}
+
+    def _module() -> ModuleType:
+        if "mod" not in holder:
+            holder["mod"] = load_webapp(app_path)
+        return holder["mod"]
+
+    class _App(BaseApplication):
+        def load_config(self) -> None:
+            for k, v in opts.items():
+                if v is not None and k in self.cfg.settings:
+                    self.cfg.set(k, v)
+
+        def load(self):
+            return _module().app
+
+    if preload:
+        # Load and warm once in the master; forked workers share the pages copy-on-write
+        _warm(_module(), warm)
+    elif warm:
+        opts["post_worker_init"] = lambda worker: _warm(_module(), True)
+    _App().run()
+
+
+def serve(
+    *,
+    host: str = "127.0.0.1",
+    port: int = 7860,
+    workers: int | None = None,
+    threads: int | None = None,
+    timeout: int = 120,
+    backend: str = "auto",
+    app_path: str | None = None,
+    preload: bool = True,
+    warm: bool = True,
+    max_requests: int = 0,
+) -> None:
+    """
+    Run the dashboard with a production WSGI server.
+
+    workers:  processes (gunicorn / werkzeug); long walk-forwards no longer block other users.
+    threads:  threads per process (default 4). gunicorn runs gthread workers; threads == 1
+              selects sync workers, which cut the SSE streams (/api/paper/stream,
+              /api/jobs/<id>/stream) at 'timeout'.
+    timeout:  gunicorn: replaces hung workers (sync workers: also aborts any request running
+              longer). waitress uses it as the idle channel timeout; werkzeug has none.
+    preload:  import the app (and warm the CSV cache) before forking.
+    max_requests: recycle a gunicorn worker after N requests (0 = never) to cap memory growth.
+    """
+    name = _pick_backend(backend)
+    workers = int(workers) if workers else default_workers()
+    threads = max(1, int(threads)) if threads else 4
+    if name == "gunicorn" and threads == 1:
+        print(f"[serve] gunicorn sync workers: SSE streams are cut after {timeout}s; use --threads > 1", file=sys.stderr)
+    print(f"[serve] {name} on http://{host}:{port} workers={workers} threads={threads} timeout={timeout}s", file=sys.stderr)
+
+    if name == "gunicorn":
+        opts: Dict[str, Any] = {
+            "bind": f"{host}:{port}",
+            "workers": workers,
+            "threads": threads,
+            "worker_class": "gthread" if threads > 1 else "sync",
+            "timeout": int(timeout),
+            "graceful_timeout": min(int(timeout), 30),
+            "preload_app": bool(preload),
+            "max_requests": int(max_requests),
+            "max_requests_jitter": int(max_requests) // 10 if max_requests else 0,
+            "accesslog": "-",
+        }
+        _serve_gunicorn(opts, app_path, preload, warm)
+        return
+
+    mod = load_webapp(app_path)
+    _warm(mod, warm)
+    if name == "waitress":
+        import waitress
+
+        if workers > 1:
+            print("[serve] waitress is single-process; use --threads for concurrency", file=sys.stderr)
+        waitress.serve(mod.app, host=host, port=int(port), threads=threads, channel_timeout=int(timeout))
+        return
+
+    from werkzeug.serving import run_simple
+
+    if workers > 1 and threads == 1 and os.name != "nt":
+        run_simple(host, int(port), mod.app, processes=workers, threaded=False, use_reloader=False)
+    else:
+        if workers > 1:
+            print("[serve] werkzeug: multiple processes need --threads 1; running threaded", file=sys.stderr)
+        run_simple(host, int(port), mod.app, threaded=True, use_reloader=False)
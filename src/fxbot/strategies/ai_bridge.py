@@ -1,38 +1,240 @@
 from __future__ import annotations
 
-from importlib import import_module
-from typing import Callable
+import hashlib
+import os
+import sys
+import threading
+from importlib import import_module, reload
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 
+from ..cache import LRUCache, file_stamp
+from ..profiling import count, profiled, stage
+
+
+# Scores are cached by (callable path, callable version, data fingerprint).
+# The version is the sha256 of the callable's module source plus an optional
+# `__version__` (function or module; bump it when model weights change). The
+# data fingerprint is built from per-row hashes of the frame, so a cached run
+# over a prefix of the rows can be found again: when the callable declares
+# `fn.lookback = N` (bars of history one score depends on), only the newly
+# appended bars are scored, with N bars of context. On disk each entry is one
+# .npy file (float32 when that is lossless, else float64) under
+# <cache_dir>/<callable key>/<rows>-<prefix digest>.npy; the most recent
+# MAX_ENTRIES per callable key are kept. Callables whose output depends on
+# more than code and data (online APIs, env switches) opt out with
+# `fn.cacheable = False`. "model:<file>[?batch=N&threads=K]" scores with a local
+# model file (ai_model.ModelScorer; its version is the weights' hash).
+
+SCORE_CACHE_ENV = "FXBOT_AI_SCORE_CACHE"
+MODEL_PREFIX = "model:"
+MAX_ENTRIES = 8
+_SCORES = LRUCache(int(os.environ.get("FXBOT_AI_SCORE_MEMO", "16")), name="ai_scores")
+_CALLABLES: Dict[str, Tuple[Any, Callable[[pd.DataFrame], Any], Tuple[Any, str]]] = {}  # path -> (module, fn, (source stamp, version))
+_CALLABLES_LOCK = threading.Lock()
+
+
+def _source_hash(mod: Any) -> str:
+    src = getattr(mod, "__file__", None)
+    if not src or not os.path.exists(src):
+        return "nosource"
+    return hashlib.sha256(Path(src).read_bytes()).hexdigest()[:16]
+
+
+def _module_stamp(mod: Any) -> Any:
+    src = getattr(mod, "__file__", None)
+    return file_stamp(src) if src and os.path.exists(src) else None
+
 
 def _load_callable(path: str) -> Callable[[pd.DataFrame], pd.Series]:
     """
     Load a Python callable specified as 'module.sub:func'.
     The callable must accept a DataFrame and return a Series/array-like scores.
     """
+    return _resolve_callable(path)[0]
+
+
+def _resolve_callable(path: str) -> Tuple[Callable[[pd.DataFrame], Any], str]:
+    """(callable, version) memoized per path; the module is reloaded when its source file changes."""
+    if path.startswith(MODEL_PREFIX):
+        return _resolve_model(path)
     if ":" not in path:
         raise ValueError("callable path must be like 'package.mod:function'")
     mod_path, func_name = path.split(":", 1)
-    mod = import_module(mod_path)
-    fn = getattr(mod, func_name)
-    if not callable(fn):
-        raise TypeError(f"{path} is not callable")
-    return fn  # type: ignore[return-value]
+    with _CALLABLES_LOCK:
+        hit = _CALLABLES.get(path)
+        mod = sys.modules.get(mod_path)
+        if hit is not None and mod is hit[0] and _module_stamp(mod) == hit[2][0]:
+            return hit[1], hit[2][1]
+        mod = import_module(mod_path)
+        if hit is not None and _module_stamp(mod) != hit[2][0]:
+            mod = reload(mod)
+        fn = getattr(mod, func_name)
+        if not callable(fn):
+            raise TypeError(f"{path} is not callable")
+        tag = getattr(fn, "__version__", None) or getattr(mod, "__version__", None)
+        version = _source_hash(mod) + (f"+{tag}" if tag else "")
+        _CALLABLES[path] = (mod, fn, (_module_stamp(mod), version))
+        return fn, version
 
 
+def _resolve_model(path: str) -> Tuple[Callable[[pd.DataFrame], Any], str]:
+    """ModelScorer for "model:<file>[?opts]", reloaded when the model file changes."""
+    from .ai_model import load_scorer
+
+    spec = path[len(MODEL_PREFIX):]
+    stamp = file_stamp(spec.partition("?")[0])
+    with _CALLABLES_LOCK:
+        hit = _CALLABLES.get(path)
+        if hit is not None and hit[2][0] == stamp:
+            return hit[1], hit[2][1]
+        fn = load_scorer(spec)
+        _CALLABLES[path] = (None, fn, (stamp, fn.__version__))
+        return fn, fn.__version__
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(df, index=True, categorize=False).to_numpy()
+
+
+def _digest(rows: np.ndarray) -> str:
+    return hashlib.sha256(rows.tobytes()).hexdigest()[:24]
+
+
+def _entry_dir(cache_dir: str | os.PathLike, callable_path: str, version: str, df: pd.DataFrame) -> Path:
+    layout = repr((callable_path, version, [(str(c), str(t)) for c, t in df.dtypes.items()]))
+    return Path(cache_dir) / hashlib.sha256(layout.encode("utf-8")).hexdigest()[:24]
+
+
+def _entries(d: Path) -> List[Tuple[int, str, Path]]:
+    out = []
+    for p in d.glob("*.npy") if d.is_dir() else ():
+        n, _, digest = p.stem.partition("-")
+        if n.isdigit() and digest:
+            out.append((int(n), digest, p))
+    return out
+
+
+def _store(d: Path, n: int, digest: str, scores: np.ndarray) -> None:
+    d.mkdir(parents=True, exist_ok=True)
+    compact = scores.astype("float32")
+    arr = compact if np.array_equal(compact, scores, equal_nan=True) else scores
+    tmp = d / f".{n}-{digest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, d / f"{n}-{digest}.npy")  # atomic: concurrent workers never see partial files
+    stale = sorted(_entries(d), key=lambda e: e[2].stat().st_mtime_ns, reverse=True)[MAX_ENTRIES:]
+    for _, _, p in stale:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+def _call_scores(fn: Callable[[pd.DataFrame], Any], df: pd.DataFrame) -> np.ndarray:
+    return pd.Series(fn(df), index=df.index).to_numpy(dtype="float64")
+
+
+def score_callable(
+    df: pd.DataFrame,
+    *,
+    callable_path: str,
+    cache_dir: str | os.PathLike | None = None,
+    use_cache: bool = True,
+) -> pd.Series:
+    """
+    Scores of `callable_path` over df (float64 Series on df.index), through the score cache.
+    cache_dir defaults to $FXBOT_AI_SCORE_CACHE; without one only the in-process memo is used.
+    """
+    fn, version = _resolve_callable(callable_path)
+    if not use_cache or not getattr(fn, "cacheable", True):
+        with stage("signals.ai_bridge.score"):
+            return pd.Series(_call_scores(fn, df), index=df.index)
+    cache_dir = cache_dir if cache_dir is not None else (os.environ.get(SCORE_CACHE_ENV) or None)
+    with stage("signals.ai_bridge.fingerprint"):
+        rows = _row_hashes(df)
+        digest = _digest(rows)
+        d = _entry_dir(cache_dir or ".", callable_path, version, df)
+    key = (str(d), len(rows), digest)
+    scores = _SCORES.get(key)
+    if scores is None and cache_dir is not None:
+        scores = _load_cached(d, rows, digest, fn, df)
+    if scores is None:
+        count("ai_scores.full")
+        with stage("signals.ai_bridge.score"):
+            scores = _call_scores(fn, df)
+        if cache_dir is not None:
+            _store(d, len(rows), digest, scores)
+    scores.flags.writeable = False
+    _SCORES.put(key, scores)
+    return pd.Series(scores, index=df.index, copy=False)
+
+
+def _load_cached(d: Path, rows: np.ndarray, digest: str, fn: Callable[[pd.DataFrame], Any],
+                 df: pd.DataFrame) -> Optional[np.ndarray]:
+    """Exact entry, else (when fn declares `lookback`) the longest cached prefix extended by scoring the tail."""
+    entries = _entries(d)
+    n_rows = len(rows)
+    for n, dg, p in entries:
+        if n == n_rows and dg == digest:
+            try:
+                count("ai_scores.disk_hit")
+                return np.load(p).astype("float64")
+            except (OSError, ValueError):
+                break  # truncated/corrupt file: rescore and overwrite
+    lookback = getattr(fn, "lookback", None)
+    if lookback is None:
+        return None
+    lookback = max(0, int(lookback))
+    for n, dg, p in sorted(entries, reverse=True):
+        if not (0 < n < n_rows) or _digest(rows[:n]) != dg:
+            continue
+        try:
+            head = np.load(p).astype("float64")
+        except (OSError, ValueError):
+            continue
+        if len(head) != n:
+            continue
+        count("ai_scores.incremental")
+        count("ai_scores.incremental_rows", n_rows - n)
+        ctx = max(0, n - lookback)
+        with stage("signals.ai_bridge.score_tail"):
+            tail = _call_scores(fn, df.iloc[ctx:])[n - ctx:]
+        scores = np.concatenate([head, tail])
+        _store(d, n_rows, digest, scores)
+        return scores
+    return None
+
+
+def dummy_atr(df: pd.DataFrame) -> pd.Series:
+    """ATR stand-in for frames without an 'atr' column: 14-bar mean of high - low."""
+    return (df["high"] - df["low"]).rolling(14, min_periods=1).mean()
+
+
+def threshold_signals(scores: Any, thresholds: List[float]) -> np.ndarray:
+    """(bars x len(thresholds)) int8 matrix; column j is the signal at thresholds[j] (score >= threshold)."""
+    s = np.asarray(scores, dtype="float64")
+    return (s[:, None] >= np.asarray(thresholds, dtype="float64")[None, :]).astype(np.int8)
+
+
+@profiled("signals.ai_bridge")
 def generate_signals_from_callable(
     df: pd.DataFrame,
     *,
     callable_path: str,
     threshold: float = 0.5,
+    cache_dir: str | os.PathLike | None = None,
+    use_cache: bool = True,
 ) -> pd.DataFrame:
     """
     Use a user-provided callable to produce long/flat signals.
     The callable must return a score per row (0..1 or any real), thresholded to 1/0.
+    Scores go through the score cache (see score_callable).
     """
-    fn = _load_callable(callable_path)
-    scores = fn(df)
-    s = pd.Series(scores, index=df.index)
+    s = score_callable(df, callable_path=callable_path, cache_dir=cache_dir, use_cache=use_cache)
     sig = (s >= threshold).astype(int)
     out = df.copy()
     out["signal"] = sig
@@ -43,6 +245,5 @@ def generate_signals_from_callable(
             raise ValueError(f"input DataFrame missing required column: {c}")
     # Create dummy ATR if absent (no ATR stop when missing)
     if "atr" not in out.columns:
-        out["atr"] = (out["high"] - out["low"]).rolling(14, min_periods=1).mean()
+        out["atr"] = dummy_atr(out)
     return out
-
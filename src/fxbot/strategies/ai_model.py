@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..profiling import count, stage
+
+
+# Local model scorer for the AI bridge: callable path "model:<file>[?batch=N&threads=K]".
+# Features are built in fixed-size row batches (with LOOKBACK rows of context), so
+# memory stays bounded by the batch size whatever the number of bars; each batch is
+# predicted as one array call, optionally on a thread pool (numpy / onnxruntime
+# release the GIL). Every feature is a function of the last LOOKBACK bars only and
+# uses fixed-order window sums, so scores do not depend on the batch size and the
+# bridge's incremental mode is exact. Model formats (by suffix):
+#   .npz            linear/logistic weights: coef, intercept [, mean, scale, link]
+#   .onnx           onnxruntime (CPU); first input gets the float32 feature matrix
+#   .pkl / .joblib  pickled scikit-learn style estimator (predict_proba / decision_function / predict)
+# Only load pickles you trust.
+
+FEATURES_VERSION = "v1"
+FEATURE_NAMES = ("ret_1", "ret_5", "ret_20", "vol_20", "range", "close_pos", "sma_gap_10", "sma_gap_50")
+LOOKBACK = 50
+DEFAULT_BATCH = 65_536
+
+
+def _win_mean(x: np.ndarray, w: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= w:
+        out[w - 1:] = np.lib.stride_tricks.sliding_window_view(x, w).mean(axis=1)
+    return out
+
+
+def _win_std(x: np.ndarray, w: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= w:
+        out[w - 1:] = np.lib.stride_tricks.sliding_window_view(x, w).std(axis=1)
+    return out
+
+
+def _shift_ratio(c: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(len(c), np.nan)
+    if len(c) > k:
+        out[k:] = np.log(c[k:] / c[:-k])
+    return out
+
+
+def build_features(df: pd.DataFrame) -> np.ndarray:
+    """(rows x len(FEATURE_NAMES)) float64 features; rows with less than LOOKBACK bars of history are NaN."""
+    c = pd.to_numeric(df["close"], errors="coerce").to_numpy(dtype="float64")
+    h = pd.to_numeric(df["high"], errors="coerce").to_numpy(dtype="float64")
+    lo = pd.to_numeric(df["low"], errors="coerce").to_numpy(dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r1 = _shift_ratio(c, 1)
+        rng = h - lo
+        X = np.column_stack([
+            r1,
+            _shift_ratio(c, 5),
+            _shift_ratio(c, 20),
+            _win_std(r1, 20),
+            rng / c,
+            np.where(rng > 0, (c - lo) / np.where(rng > 0, rng, 1.0), 0.5),
+            c / _win_mean(c, 10) - 1.0,
+            c / _win_mean(c, 50) - 1.0,
+        ])
+    X[: LOOKBACK - 1] = np.nan
+    return X
+
+
+# -------- model backends: (rows x features) float array -> scores --------
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -60.0, 60.0)))
+
+
+def _load_npz(path: Path) -> Callable[[np.ndarray], np.ndarray]:
+    with np.load(path) as z:
+        coef = np.asarray(z["coef"], dtype="float64").ravel()
+        intercept = float(np.asarray(z["intercept"]).ravel()[0]) if "intercept" in z else 0.0
+        mean = np.asarray(z["mean"], dtype="float64") if "mean" in z else 0.0
+        scale = np.asarray(z["scale"], dtype="float64") if "scale" in z else 1.0
+        link = str(z["link"]) if "link" in z else "logistic"
+    if coef.shape[0] != len(FEATURE_NAMES):
+        raise ValueError(f"{path}: coef has {coef.shape[0]} weights, features are {len(FEATURE_NAMES)}")
+
+    def predict(X: np.ndarray) -> np.ndarray:
+        z = ((X - mean) / scale) @ coef + intercept
+        return _sigmoid(z) if link == "logistic" else z
+
+    return predict
+
+
+def _load_onnx(path: Path, threads: int) -> Callable[[np.ndarray], np.ndarray]:
+    try:
+        import onnxruntime as ort  # type: ignore
+    except ImportError as e:
+        raise RuntimeError("ONNX models need onnxruntime; pip install onnxruntime") from e
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = 1 if threads > 1 else 0  # batches already run in parallel
+    sess = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+    name = sess.get_inputs()[0].name
+
+    def predict(X: np.ndarray) -> np.ndarray:
+        out = sess.run(None, {name: X.astype(np.float32)})[-1]
+        if isinstance(out, list):  # zipmap output of classifiers: [{label: prob}]
+            return np.array([row.get(1, row.get("1", 0.0)) for row in out], dtype="float64")
+        out = np.asarray(out, dtype="float64")
+        return out[:, 1] if out.ndim == 2 and out.shape[1] == 2 else out.reshape(len(X), -1)[:, 0]
+
+    return predict
+
+
+def _load_pickle(path: Path) -> Callable[[np.ndarray], np.ndarray]:
+    try:
+        import joblib  # type: ignore
+
+        model = joblib.load(path)
+    except ImportError:
+        with open(path, "rb") as f:
+            model = pickle.load(f)
+    if hasattr(model, "predict_proba"):
+        return lambda X: np.asarray(model.predict_proba(X), dtype="float64")[:, 1]
+    if hasattr(model, "decision_function"):
+        return lambda X: _sigmoid(np.asarray(model.decision_function(X), dtype="float64").ravel())
+    return lambda X: np.asarray(model.predict(X), dtype="float64").ravel()
+
+
+class ModelScorer:
+    """
+    ai_bridge callable over a local model file: scores = model(build_features(df)).
+    Rows without full feature history score NaN (no signal). Batch latencies of the
+    last call are in .last_stats and in the returned Series' attrs["model"].
+    """
+
+    lookback = LOOKBACK
+
+    def __init__(self, path: str | Path, *, batch_size: int = DEFAULT_BATCH, threads: int = 1):
+        self.path = Path(path)
+        self.batch_size = max(LOOKBACK, int(batch_size))
+        self.threads = max(1, int(threads))
+        digest = hashlib.sha256(self.path.read_bytes()).hexdigest()[:16]
+        # Score cache key: weights + feature definitions (not batch/threads, which do not change scores)
+        self.__version__ = f"{digest}+features-{FEATURES_VERSION}"
+        suffix = self.path.suffix.lower()
+        if suffix == ".npz":
+            self._predict = _load_npz(self.path)
+        elif suffix == ".onnx":
+            self._predict = _load_onnx(self.path, self.threads)
+        elif suffix in (".pkl", ".pickle", ".joblib"):
+            self._predict = _load_pickle(self.path)
+        else:
+            raise ValueError(f"unsupported model file {self.path} (expected .npz, .onnx, .pkl or .joblib)")
+        self.last_stats: Dict[str, Any] = {}
+
+    def _batch(self, df: pd.DataFrame, start: int, stop: int) -> tuple[np.ndarray, float]:
+        t0 = time.perf_counter()
+        ctx = max(0, start - (LOOKBACK - 1))
+        X = build_features(df.iloc[ctx:stop])[start - ctx:]  # the chunk's NaN head falls in the context rows
+        ok = ~np.isnan(X).any(axis=1)
+        out = np.full(stop - start, np.nan)
+        if ok.any():
+            out[ok] = self._predict(X[ok])
+        return out, (time.perf_counter() - t0) * 1000.0
+
+    def __call__(self, df: pd.DataFrame) -> pd.Series:
+        n = len(df)
+        bounds = [(i, min(n, i + self.batch_size)) for i in range(0, n, self.batch_size)]
+        t0 = time.perf_counter()
+        with stage("signals.ai_model.predict"):
+            if self.threads > 1 and len(bounds) > 1:
+                with ThreadPoolExecutor(self.threads) as pool:
+                    parts = list(pool.map(lambda b: self._batch(df, *b), bounds))
+            else:
+                parts = [self._batch(df, a, b) for a, b in bounds]
+        count("ai_model.batches", len(parts))
+        count("ai_model.rows", n)
+        lat = [ms for _, ms in parts]
+        wall = time.perf_counter() - t0
+        self.last_stats = {
+            "rows": n,
+            "batches": len(parts),
+            "batch_size": self.batch_size,
+            "threads": self.threads,
+            "batch_ms": [round(x, 3) for x in lat],
+            "batch_ms_p50": float(np.median(lat)) if lat else 0.0,
+            "batch_ms_max": float(max(lat)) if lat else 0.0,
+            "rows_per_s": n / wall if wall > 0 else 0.0,
+        }
+        scores = np.concatenate([p for p, _ in parts]) if parts else np.zeros(0)
+        s = pd.Series(scores, index=df.index)
+        s.attrs["model"] = self.last_stats
+        return s
+
+
+def load_scorer(spec: str) -> ModelScorer:
+    """ModelScorer from "<file>[?batch=N&threads=K]" (the part after "model:" in a callable path)."""
+    path, _, query = spec.partition("?")
+    opts: Dict[str, str] = dict(kv.split("=", 1) for kv in query.split("&") if "=" in kv)
+    unknown = set(opts) - {"batch", "threads"}
+    if unknown:
+        raise ValueError(f"unknown model option(s): {sorted(unknown)} (batch, threads)")
+    return ModelScorer(path, batch_size=int(opts.get("batch", DEFAULT_BATCH)), threads=int(opts.get("threads", 1)))
+
+
+def fit_logistic(df: pd.DataFrame, out: str | Path, *, horizon: int = 1, l2: float = 1e-3, iters: int = 300) -> Dict[str, Any]:
+    """Fit a small logistic model (next-`horizon`-bar up move) and save it as .npz weights."""
+    X = build_features(df)
+    c = pd.to_numeric(df["close"], errors="coerce").to_numpy(dtype="float64")
+    y = np.full(len(c), np.nan)
+    y[:-horizon] = (c[horizon:] > c[:-horizon]).astype(float)
+    ok = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+    X, y = X[ok], y[ok]
+    mean, scale = X.mean(axis=0), X.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = (X - mean) / scale
+    w, b = np.zeros(Z.shape[1]), 0.0
+    for _ in range(int(iters)):  # Newton-free gradient descent is enough for 8 features
+        p = _sigmoid(Z @ w + b)
+        w -= 0.5 * (Z.T @ (p - y) / len(y) + l2 * w)
+        b -= 0.5 * float(np.mean(p - y))
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(out, coef=w, intercept=np.array([b]), mean=mean, scale=scale, link=np.array("logistic"),
+             features=np.array(FEATURE_NAMES))
+    acc = float(np.mean((_sigmoid(Z @ w + b) >= 0.5) == (y == 1.0))) if len(y) else 0.0
+    return {"model": str(out), "rows": int(len(y)), "train_accuracy": acc}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from ..data.csv_loader import load_ohlcv_csv
+
+    ap = argparse.ArgumentParser(prog="python -m fxbot.strategies.ai_model", description="Local model scorer tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ft = sub.add_parser("fit", help="Fit the built-in logistic model on a CSV and save .npz weights")
+    ft.add_argument("--csv", required=True)
+    ft.add_argument("--out", required=True)
+    ft.add_argument("--horizon", type=int, default=1)
+    sc = sub.add_parser("score", help="Score a CSV with a model file and report per-batch latency")
+    sc.add_argument("--csv", required=True)
+    sc.add_argument("--model", required=True)
+    sc.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    sc.add_argument("--threads", type=int, default=1)
+    sc.add_argument("--out", default=None, help="Optional CSV of timestamp,score")
+    args = ap.parse_args(argv)
+
+    df = load_ohlcv_csv(args.csv)
+    if args.cmd == "fit":
+        print(json.dumps(fit_logistic(df, args.out, horizon=args.horizon)))
+        return
+    scorer = ModelScorer(args.model, batch_size=args.batch, threads=args.threads)
+    s = scorer(df)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        s.rename("score").to_csv(args.out, index_label="timestamp")
+    stats = {k: v for k, v in scorer.last_stats.items() if k != "batch_ms"}
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,44 @@
 from __future__ import annotations
 
+from typing import Any, Callable, Dict, Iterable, Iterator
+
 import pandas as pd
 
 from ..indicators import ema, atr
+from ..profiling import profiled
+from .registry import Param, Strategy, atr_k_param
 
 
+@profiled("signals.momo_atr")
 def generate_signals(df: pd.DataFrame, *, ema_fast: int, ema_slow: int, atr_window: int,
-                     vol_filter_min_atr_pct: float = 0.0) -> pd.DataFrame:
+                     vol_filter_min_atr_pct: float = 0.0, cache: Dict[Any, Any] | None = None) -> pd.DataFrame:
     """
     Returns DataFrame with columns: close, ema_fast, ema_slow, atr, signal
     signal: 1 for long, 0 for flat
+    'cache' (a dict reused across calls on the same df) memoizes EMA/ATR series per span/window.
     """
+    return _signals(df, ema_fast=ema_fast, ema_slow=ema_slow, atr_window=atr_window,
+                    vol_filter_min_atr_pct=vol_filter_min_atr_pct, cache=cache).dropna()
+
+
+def _signals(df: pd.DataFrame, *, ema_fast: int, ema_slow: int, atr_window: int,
+             vol_filter_min_atr_pct: float, state: dict | None = None,
+             cache: Dict[Any, Any] | None = None) -> pd.DataFrame:
+    state = state or {}
+    # Chunked input carries state into the indicators, so only whole-frame calls are memoized
+    cache = {} if cache is None or state else cache
+
+    def cached(key: Any, compute: Callable[[], pd.Series]) -> pd.Series:
+        # Concurrent misses may both compute; the values are identical
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
     out = df.copy()
-    out["ema_fast"] = ema(out["close"], ema_fast)
-    out["ema_slow"] = ema(out["close"], ema_slow)
-    out["atr"] = atr(out["high"], out["low"], out["close"], window=atr_window)
+    out["ema_fast"] = cached(("ema", ema_fast), lambda: ema(out["close"], ema_fast, init=state.get("ema_fast")))
+    out["ema_slow"] = cached(("ema", ema_slow), lambda: ema(out["close"], ema_slow, init=state.get("ema_slow")))
+    out["atr"] = cached(("atr", atr_window), lambda: atr(out["high"], out["low"], out["close"], window=atr_window,
+                                                         prev_close=state.get("close"), init=state.get("atr")))
     out["rel_atr"] = out["atr"] / out["close"].replace(0, pd.NA)
     # momentum condition
     mom = (out["ema_fast"] > out["ema_slow"]).astype(int)
@@ -25,5 +49,41 @@ def generate_signals(df: pd.DataFrame, *, ema_fast: int, ema_slow: int, atr_wind
     else:
         sig = mom
     out["signal"] = sig
-    return out.dropna()
+    return out
+
+
+def generate_signals_stream(chunks: Iterable[pd.DataFrame], *, ema_fast: int, ema_slow: int, atr_window: int,
+                            vol_filter_min_atr_pct: float = 0.0) -> Iterator[pd.DataFrame]:
+    """
+    Chunked variant of generate_signals: EMA/ATR state is carried across chunk
+    boundaries, so the concatenated output equals generate_signals on the whole frame.
+    """
+    state: dict = {}
+    for df in chunks:
+        if len(df) == 0:
+            continue
+        out = _signals(df, ema_fast=ema_fast, ema_slow=ema_slow, atr_window=atr_window,
+                       vol_filter_min_atr_pct=vol_filter_min_atr_pct, state=state)
+        state = {
+            "ema_fast": float(out["ema_fast"].iloc[-1]),
+            "ema_slow": float(out["ema_slow"].iloc[-1]),
+            "atr": float(out["atr"].iloc[-1]),
+            "close": float(out["close"].iloc[-1]),
+        }
+        yield out.dropna()
+
 
+STRATEGY = Strategy(
+    name="momo_atr",
+    params=(
+        Param("ema_fast", int, 20, (10, 20, 30)),
+        Param("ema_slow", int, 60, (50, 80, 120)),
+        Param("atr_window", int, 14, (10, 14, 20)),
+        atr_k_param(),
+        Param("vol_filter_min_atr_pct", float, 0.0, (0.0, 0.01, 0.02), aliases=("atr_min_pct",)),
+    ),
+    signals=lambda df, features, **p: generate_signals(df, cache=features, **p),
+    indicators=lambda p: [f"ema_{p['ema_fast']}", f"ema_{p['ema_slow']}", f"atr_{p['atr_window']}"],
+    valid=lambda p: p["ema_fast"] < p["ema_slow"],
+    description="Long while EMA fast > EMA slow (optional minimum relative ATR); ATR stop",
+)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import importlib
+import itertools
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import pandas as pd
+
+from ..features import FeatureStore, open_features
+
+
+# Strategy registry. A strategy declares its parameters (type, default, default
+# optimization grid) and, per parameter set, the feature-store columns
+# (fxbot.features names such as "ema_20", "atr_14") its signals read. Signals are
+# built from one FeatureStore per frame, so an indicator shared by several
+# strategies or parameter sets is computed once; prefetch() materializes the
+# union for several strategies in one pass before any signals are built.
+#
+# Names resolve to the built-ins below, to strategies added with register(), or,
+# as "module:attr" (like AI callables), to a Strategy object in any importable
+# module. Every strategy has an "atr_k" parameter: the ATR stop multiple passed to
+# the backtest rather than to the signal function. Signal frames keep the input
+# columns and add at least "atr" and "signal" (1 long, 0 flat), as run_backtest
+# expects.
+
+_BUILTIN = {
+    "momo_atr": "fxbot.strategies.momo_atr:STRATEGY",
+    "zscore_revert": "fxbot.strategies.zscore_revert:STRATEGY",
+}
+_REGISTERED: Dict[str, "Strategy"] = {}
+_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Param:
+    name: str
+    cast: Callable[[Any], Any]  # int or float
+    default: Any
+    grid: Tuple[Any, ...]  # default optimization values
+    aliases: Tuple[str, ...] = ()  # other keys accepted in config/UI params
+    signal: bool = True  # False: a backtest parameter (atr_k), not passed to the signal function
+
+
+def atr_k_param(default: float = 2.0, grid: Tuple[float, ...] = (1.5, 2.0, 2.5)) -> Param:
+    return Param("atr_k", float, default, grid, aliases=("atr_k_stop",), signal=False)
+
+
+@dataclass(frozen=True)
+class Strategy:
+    name: str
+    params: Tuple[Param, ...]
+    signals: Callable[..., pd.DataFrame]  # signals(df, features, **signal params)
+    indicators: Callable[[Dict[str, Any]], List[str]]  # feature names read for a resolved parameter set
+    valid: Callable[[Dict[str, Any]], bool] = field(default=lambda p: True)
+    description: str = ""
+
+    def __post_init__(self):
+        if "atr_k" not in {p.name for p in self.params}:
+            raise ValueError(f"strategy {self.name!r} must declare an 'atr_k' parameter (registry.atr_k_param())")
+
+    def resolve(self, params: Mapping[str, Any] | None = None) -> Dict[str, Any]:
+        """Declared parameters in declaration order: given values (or an alias) cast, else defaults. Other keys are ignored."""
+        params = params or {}
+        out: Dict[str, Any] = {}
+        for p in self.params:
+            v = next((params[k] for k in (p.name, *p.aliases) if k in params and params[k] is not None), p.default)
+            out[p.name] = p.cast(v)
+        return out
+
+    def signal_params(self, params: Mapping[str, Any]) -> Dict[str, Any]:
+        return {p.name: params[p.name] for p in self.params if p.signal}
+
+    def grid(self, values: Mapping[str, Sequence[Any]] | None = None) -> List[Dict[str, Any]]:
+        """Valid parameter sets over 'values' (name -> list); undeclared names are ignored, missing/empty ones held at default."""
+        values = values or {}
+        axes = [[p.cast(v) for v in values[p.name]] if values.get(p.name) else [p.default] for p in self.params]
+        names = [p.name for p in self.params]
+        combos = (dict(zip(names, c)) for c in itertools.product(*axes))
+        return [c for c in combos if self.valid(c)]
+
+    def default_grid(self) -> Dict[str, List[Any]]:
+        return {p.name: list(p.grid) for p in self.params}
+
+    def generate(self, df: pd.DataFrame, params: Mapping[str, Any] | None = None, *,
+                 features: FeatureStore | None = None) -> pd.DataFrame:
+        """Signal frame for df; 'features' must be df's own store (default: open_features(df))."""
+        p = self.resolve(params)
+        fs = features if features is not None else open_features(df)
+        return self.signals(df, fs, **self.signal_params(p))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "params": [{"name": p.name, "type": p.cast.__name__, "default": p.default, "grid": list(p.grid),
+                        "aliases": list(p.aliases), "signal": p.signal} for p in self.params],
+            "indicators": self.indicators(self.resolve()),
+        }
+
+
+def register(strategy: Strategy) -> Strategy:
+    with _LOCK:
+        _REGISTERED[strategy.name] = strategy
+    return strategy
+
+
+def _import_attr(path: str) -> Any:
+    mod_name, attr = path.split(":", 1)
+    return getattr(importlib.import_module(mod_name), attr)
+
+
+def get_strategy(name: str | Strategy | None) -> Strategy:
+    """Strategy by name (built-in, registered, or 'module:attr'); None selects momo_atr."""
+    if isinstance(name, Strategy):
+        return name
+    name = name or "momo_atr"
+    with _LOCK:
+        s = _REGISTERED.get(name)
+    if s is not None:
+        return s
+    path = _BUILTIN.get(name, name if ":" in name else None)
+    if path is None:
+        raise ValueError(f"unknown strategy {name!r}; available: {', '.join(names())}")
+    s = _import_attr(path)
+    if not isinstance(s, Strategy):
+        raise ValueError(f"{path} is not a fxbot.strategies.registry.Strategy")
+    with _LOCK:
+        _REGISTERED.setdefault(name, s)
+    return s
+
+
+def names() -> List[str]:
+    with _LOCK:
+        return sorted(set(_BUILTIN) | set(_REGISTERED))
+
+
+def prefetch(features: FeatureStore, runs: Iterable[Tuple[Strategy, Mapping[str, Any] | None]]) -> List[str]:
+    """Compute the union of the indicators of (strategy, params) runs once. Returns the feature names."""
+    wanted: Dict[str, None] = {}
+    for strat, params in runs:
+        wanted.update(dict.fromkeys(strat.indicators(strat.resolve(params))))
+    for n in wanted:
+        features.get(n)
+    return list(wanted)
+
+
+def generate_many(df: pd.DataFrame, runs: Sequence[Tuple[str | Strategy, Mapping[str, Any] | None]], *,
+                  features: FeatureStore | None = None) -> List[pd.DataFrame]:
+    """Signal frames of several strategies/parameter sets over one data pass (shared indicators)."""
+    fs = features if features is not None else open_features(df)
+    resolved = [(get_strategy(s), p) for s, p in runs]
+    prefetch(fs, resolved)
+    return [s.generate(df, p, features=fs) for s, p in resolved]
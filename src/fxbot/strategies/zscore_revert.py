@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from ..features import FeatureStore
+from ..profiling import profiled
+from .registry import Param, Strategy, atr_k_param
+
+
+@profiled("signals.zscore_revert")
+def generate_signals(df: pd.DataFrame, *, z_window: int, z_entry: float, atr_window: int,
+                     cache: FeatureStore | None = None) -> pd.DataFrame:
+    """
+    Mean reversion: long while close is at least z_entry rolling standard deviations
+    below its z_window rolling mean, flat otherwise. Returns df's columns plus z, atr,
+    signal. 'cache' is df's feature store (z_<n> / atr_<n> columns).
+    """
+    fs = cache if cache is not None else FeatureStore(df)
+    out = df.copy()
+    out["z"] = fs.series(f"z_{z_window}")
+    out["atr"] = fs.series(f"atr_{atr_window}")
+    out["signal"] = (out["z"] <= -float(z_entry)).astype(int)
+    return out.dropna()
+
+
+STRATEGY = Strategy(
+    name="zscore_revert",
+    params=(
+        Param("z_window", int, 50, (20, 50, 100)),
+        Param("z_entry", float, 1.5, (1.0, 1.5, 2.0)),
+        Param("atr_window", int, 14, (10, 14, 20)),
+        atr_k_param(),
+    ),
+    signals=lambda df, features, **p: generate_signals(df, cache=features, **p),
+    indicators=lambda p: [f"z_{p['z_window']}", f"atr_{p['atr_window']}"],
+    valid=lambda p: p["z_window"] >= 2 and p["z_entry"] > 0,
+    description="Long while close is z_entry rolling std below its rolling mean; ATR stop",
+)
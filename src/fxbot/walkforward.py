@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, Any, List, Tuple
+from typing import Callable, Dict, Any, List, Tuple
 
+import numpy as np
 import pandas as pd
 
-from .strategies.momo_atr import generate_signals
 from .backtest import run_backtest
+from .features import FeatureStore
 from .report import metrics_from_pnl
-from .optimize import grid_search
+from .optimize import grid_search, threshold_search
+from .profiling import count, profiled
+from .strategies.registry import Strategy, get_strategy
 
 
 @dataclass
@@ -21,17 +24,20 @@ class FoldResult:
     metrics: Dict[str, Any]
 
 
+@profiled("walkforward")
 def walk_forward(
     df: pd.DataFrame,
     *,
     train_bars: int,
     test_bars: int,
     step_bars: int | None,
-    ema_fast_list: List[int],
-    ema_slow_list: List[int],
-    atr_window_list: List[int],
-    atr_k_list: List[float],
-    vol_filter_min_atr_pct_list: List[float] | None,
+    strategy: str | Strategy | None = "momo_atr",
+    grid: Dict[str, List[Any]] | None = None,
+    ema_fast_list: List[int] | None = None,
+    ema_slow_list: List[int] | None = None,
+    atr_window_list: List[int] | None = None,
+    atr_k_list: List[float] | None = None,
+    vol_filter_min_atr_pct_list: List[float] | None = None,
     start_cash: float,
     slippage_pct: float,
     fee_perc_roundturn: float,
@@ -39,11 +45,30 @@ def walk_forward(
     daily_loss_stop_pct: float,
     periods_per_year: int,
     entry_allowed_mask: pd.Series | None = None,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+    progress: Callable[[int, int], None] | None = None,
 ) -> Dict[str, Any]:
+    """
+    Rolling train/test folds: grid search on each train window, then the best
+    parameters are backtested on the following test window with cash rolled forward.
+    'strategy' / 'grid' / *_list are as in optimize.grid_search.
+    progress(done, total) counts grid combinations evaluated over all folds.
+    """
     n = len(df)
     if n < train_bars + test_bars:
         raise ValueError("Not enough data for one fold")
+    strat = get_strategy(strategy)
+    legacy = {"ema_fast": ema_fast_list, "ema_slow": ema_slow_list, "atr_window": atr_window_list,
+              "atr_k": atr_k_list, "vol_filter_min_atr_pct": vol_filter_min_atr_pct_list}
+    grid = {**{k: v for k, v in legacy.items() if v is not None}, **(grid or {})}
     step = step_bars or test_bars
+    num_folds = (n - train_bars - test_bars) // step + 1
+    per_fold = len(strat.grid(grid))
+    fold_progress = None
     i = 0
     folds: List[FoldResult] = []
     combined_pnl_parts: List[pd.Series] = []
@@ -52,31 +77,34 @@ def walk_forward(
     while i + train_bars + test_bars <= n:
         trn = df.iloc[i : i + train_bars]
         tst = df.iloc[i + train_bars : i + train_bars + test_bars]
+        if progress is not None:
+            offset = len(folds) * per_fold
+            fold_progress = lambda done, _total, offset=offset: progress(offset + done, num_folds * per_fold)
 
         top = grid_search(
             trn,
-            ema_fast_list=ema_fast_list,
-            ema_slow_list=ema_slow_list,
-            atr_window_list=atr_window_list,
-            atr_k_list=atr_k_list,
-            vol_filter_min_atr_pct_list=vol_filter_min_atr_pct_list,
+            strategy=strat,
+            grid=grid,
             start_cash=cash,  # use current cash as starting capital reference
             slippage_pct=slippage_pct,
             fee_perc_roundturn=fee_perc_roundturn,
             per_trade_risk_pct=per_trade_risk_pct,
             daily_loss_stop_pct=daily_loss_stop_pct,
+            day_rollover=day_rollover,
+            day_rollover_tz=day_rollover_tz,
+            stop_model=stop_model,
+            intrabar_path=intrabar_path,
+            take_profit_k=take_profit_k,
             periods_per_year=periods_per_year,
             max_dd_limit=None,
             top_n=1,
+            progress=fold_progress,
         )
         if not top:
             break
-        best = top[0]
-        ef, es = int(best["ema_fast"]), int(best["ema_slow"]) 
-        aw, ak = int(best["atr_window"]), float(best["atr_k"]) 
-
-        vmin = float(best.get("vol_filter_min_atr_pct", 0.0))
-        sig_tst = generate_signals(tst, ema_fast=ef, ema_slow=es, atr_window=aw, vol_filter_min_atr_pct=vmin)
+        params = strat.resolve(top[0])
+        ak = float(params["atr_k"])
+        sig_tst = strat.generate(tst, params, features=FeatureStore(tst))
         mask = None
         if entry_allowed_mask is not None:
             # Align blackout mask to test index
@@ -89,6 +117,11 @@ def walk_forward(
             fee_perc_roundturn=fee_perc_roundturn,
             per_trade_risk_pct=per_trade_risk_pct,
             daily_loss_stop_pct=daily_loss_stop_pct,
+            day_rollover=day_rollover,
+            day_rollover_tz=day_rollover_tz,
+            stop_model=stop_model,
+            intrabar_path=intrabar_path,
+            take_profit_k=take_profit_k,
             entry_allowed_mask=mask,
         )
         met = metrics_from_pnl(res["pnl_series"], cash, res["end_cash"], periods_per_year)
@@ -98,15 +131,21 @@ def walk_forward(
                 train_end=str(trn.index[-1]),
                 test_start=str(tst.index[0]),
                 test_end=str(tst.index[-1]),
-                params={"ema_fast": ef, "ema_slow": es, "atr_window": aw, "atr_k": ak, "vol_filter_min_atr_pct": vmin},
+                params=params,
                 metrics=met,
             )
         )
         combined_pnl_parts.append(res["pnl_series"])
         cash = float(res["end_cash"])  # roll forward
+        count("walkforward.folds")
         i += step
 
-    combined_pnl = pd.concat(combined_pnl_parts).sort_index() if combined_pnl_parts else pd.Series(dtype=float)
+    return _summarize(folds, combined_pnl_parts, start_cash, cash, periods_per_year)
+
+
+def _summarize(folds: List[FoldResult], pnl_parts: List[pd.Series], start_cash: float, cash: float,
+               periods_per_year: int) -> Dict[str, Any]:
+    combined_pnl = pd.concat(pnl_parts).sort_index() if pnl_parts else pd.Series(dtype=float)
     summary = metrics_from_pnl(combined_pnl, start_cash, cash, periods_per_year) if len(combined_pnl) else {}
     return {
         "start_cash": start_cash,
@@ -124,3 +163,114 @@ def walk_forward(
             for f in folds
         ],
     }
+
+
+@profiled("walkforward.thresholds")
+def walk_forward_thresholds(
+    df: pd.DataFrame,
+    scores: pd.Series | np.ndarray,
+    *,
+    train_bars: int,
+    test_bars: int,
+    step_bars: int | None,
+    threshold_list: List[float],
+    atr_k_list: List[float],
+    start_cash: float,
+    slippage_pct: float,
+    fee_perc_roundturn: float,
+    per_trade_risk_pct: float,
+    daily_loss_stop_pct: float,
+    periods_per_year: int,
+    entry_allowed_mask: pd.Series | None = None,
+    day_rollover: str | int | None = "00:00",
+    day_rollover_tz: str | None = "UTC",
+    stop_model: str = "close",
+    intrabar_path: str = "worst",
+    take_profit_k: float | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> Dict[str, Any]:
+    """
+    walk_forward for AI-callable strategies: threshold and atr_k are re-tuned on each
+    train window by threshold_search over the row-aligned 'scores' (computed once, e.g.
+    from the score cache), then applied to the following test window. Scores for test
+    bars must not look ahead (the callable is run over the whole history).
+    """
+    from .backtest import run_backtest_matrix
+    from .optimize import _frame_with_atr
+    from .strategies.ai_bridge import threshold_signals
+
+    n = len(df)
+    if n < train_bars + test_bars:
+        raise ValueError("Not enough data for one fold")
+    s = np.asarray(scores, dtype="float64")
+    if len(s) != n:
+        raise ValueError(f"scores must have one value per row ({n}), got {len(s)}")
+    frame = _frame_with_atr(df)
+    step = step_bars or test_bars
+    num_folds = (n - train_bars - test_bars) // step + 1
+    per_fold = len(threshold_list) * len(atr_k_list)
+    costs = dict(
+        slippage_pct=slippage_pct,
+        fee_perc_roundturn=fee_perc_roundturn,
+        per_trade_risk_pct=per_trade_risk_pct,
+        daily_loss_stop_pct=daily_loss_stop_pct,
+        day_rollover=day_rollover,
+        day_rollover_tz=day_rollover_tz,
+        stop_model=stop_model,
+        intrabar_path=intrabar_path,
+        take_profit_k=take_profit_k,
+    )
+    fold_progress = None
+    i = 0
+    folds: List[FoldResult] = []
+    combined_pnl_parts: List[pd.Series] = []
+    cash = start_cash
+
+    while i + train_bars + test_bars <= n:
+        trn = frame.iloc[i : i + train_bars]
+        tst = frame.iloc[i + train_bars : i + train_bars + test_bars]
+        if progress is not None:
+            offset = len(folds) * per_fold
+            fold_progress = lambda done, _total, offset=offset: progress(offset + done, num_folds * per_fold)
+        top = threshold_search(
+            trn,
+            s[i : i + train_bars],
+            threshold_list=threshold_list,
+            atr_k_list=atr_k_list,
+            start_cash=cash,
+            periods_per_year=periods_per_year,
+            top_n=1,
+            progress=fold_progress,
+            **costs,
+        )
+        if not top:
+            break
+        th, ak = float(top[0]["threshold"]), float(top[0]["atr_k"])
+        mask = None
+        if entry_allowed_mask is not None:
+            mask = entry_allowed_mask.reindex(tst.index).fillna(True)
+        res = run_backtest_matrix(
+            tst,
+            threshold_signals(s[i + train_bars : i + train_bars + test_bars], [th]),
+            atr_k_list=[ak],
+            start_cash=cash,
+            entry_allowed_mask=mask,
+            **costs,
+        )[0][0]
+        met = metrics_from_pnl(res["pnl_series"], cash, res["end_cash"], periods_per_year)
+        folds.append(
+            FoldResult(
+                train_start=str(trn.index[0]),
+                train_end=str(trn.index[-1]),
+                test_start=str(tst.index[0]),
+                test_end=str(tst.index[-1]),
+                params={"threshold": th, "atr_k": ak},
+                metrics=met,
+            )
+        )
+        combined_pnl_parts.append(res["pnl_series"])
+        cash = float(res["end_cash"])  # roll forward
+        count("walkforward.folds")
+        i += step
+
+    return _summarize(folds, combined_pnl_parts, start_cash, cash, periods_per_year)